@@ -0,0 +1,96 @@
+import argparse
+from datetime import date
+import time
+
+import numpy as np
+import pandas as pd
+
+from data.util import adjust_prices, _adjust_price_dataframe
+
+
+def make_raw_prices(n_tickers: int=1000, n_years: int=10, seed: int=0):
+    """
+    Synthetic long format prices, dividends and splits as returned by
+    data.util.load_raw_prices: quarterly dividends and one split per ticker
+
+    returns price, dividend and split dataframes
+    """
+    random_state = np.random.RandomState(seed)
+    dates = pd.bdate_range(date(2010, 1, 1), periods=252 * n_years)
+    tickers = np.array(['T%04d-R' % idx for idx in range(n_tickers)])
+
+    returns = random_state.normal(0, .01, (n_tickers, len(dates)))
+    prices = np.round(50 * np.exp(np.cumsum(returns, axis=1)), 2)
+    price = pd.DataFrame({'fsym_id': np.repeat(tickers, len(dates)),
+            'date': np.tile(dates.values, n_tickers), 'price': prices.ravel()})
+
+    dividend_rows = np.arange(0, len(dates), 63)
+    dividend = pd.DataFrame({'fsym_id': np.repeat(tickers, len(dividend_rows)),
+            'dividend_exdate': np.tile(dates.values[dividend_rows], n_tickers),
+            'dividend': np.round(random_state.uniform(.1, 1, n_tickers * len(dividend_rows)), 2)})
+
+    split = pd.DataFrame({'fsym_id': tickers,
+            'split_exdate': dates.values[random_state.randint(0, len(dates), n_tickers)],
+            'split_factor': random_state.choice([.5, 2., 3.], n_tickers)})
+    return price, dividend, split
+
+
+def adjust_one_ticker_at_a_time(price: pd.DataFrame, dividend: pd.DataFrame,
+        split: pd.DataFrame, adjustment_method: str) -> pd.DataFrame:
+    """
+    Reference adjustment, load_adjusted_price applied ticker by ticker
+    """
+    dividends = dict(list(dividend.groupby('fsym_id')))
+    splits = dict(list(split.groupby('fsym_id')))
+    adjusted_prices = []
+    for fsym_id, ticker_price in price.groupby('fsym_id', sort=False):
+        dataframe = _adjust_price_dataframe(
+                ticker_price.drop(columns='fsym_id').reset_index(drop=True),
+                dividends.get(fsym_id, dividend.iloc[:0]).drop(columns='fsym_id'),
+                splits.get(fsym_id, split.iloc[:0]).drop(columns='fsym_id'),
+                adjustment_method)
+        dataframe['fsym_id'] = fsym_id
+        dataframe['adjusted_price'] = dataframe['price'] * dataframe['total_factor']
+        adjusted_prices.append(dataframe.loc[:, ['date', 'fsym_id', 'price',
+                'total_factor', 'adjusted_price']])
+    return pd.concat(adjusted_prices, ignore_index=True)
+
+
+def run(n_tickers: int=1000, n_years: int=10, repeat: int=3) -> dict:
+    """
+    times the vectorized and the per ticker adjustment in both modes
+
+    returns dictionary of mode to best timings in seconds
+    """
+    price, dividend, split = make_raw_prices(n_tickers, n_years)
+    results = {}
+    for adjustment_method in ('f', 'b'):
+        timings = {}
+        for name, function in (('vectorized', adjust_prices),
+                ('per_ticker', adjust_one_ticker_at_a_time)):
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                adjusted = function(price, dividend, split, adjustment_method)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+            timings[name + '_result'] = adjusted
+        if not np.array_equal(timings.pop('vectorized_result')['total_factor'].values,
+                timings.pop('per_ticker_result')['total_factor'].values):
+            raise AssertionError('vectorized adjustment does not match for %s'
+                    % adjustment_method)
+        results[adjustment_method] = timings
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='corporate action adjustment benchmark')
+    parser.add_argument('--tickers', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for adjustment_method, timings in run(args.tickers, args.years, args.repeat).items():
+        print('%s: vectorized %.3fs, per ticker %.3fs, speedup %.1fx' % (
+                adjustment_method, timings['vectorized'], timings['per_ticker'],
+                timings['per_ticker'] / timings['vectorized']))
@@ -0,0 +1,148 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+import pandas as pd
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# imported by numpy and pandas themselves, the engine has no say over them
+THIRD_PARTY_PACKAGES = ['numpy', 'pandas']
+# optional dependencies only the code paths using them may import
+DEFERRED_MODULES = ['pymysql', 'fpdf', 'matplotlib.pyplot', 'concurrent.futures']
+
+# -X importtime only exists from python 3.7, this reproduces its output by
+# timing the loaders of every module imported
+_FALLBACK_SCRIPT = '''
+import importlib.abc, sys, time
+
+stack = []
+
+class TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader):
+        self.loader = loader
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+    def exec_module(self, module):
+        stack.append(0.)
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            cumulative = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+            sys.stderr.write('import time: %%9d | %%10d | %%s%%s\\n' %% (
+                    (cumulative - children) * 1e6, cumulative * 1e6,
+                    '  ' * len(stack), module.__name__))
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+class TimedFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = TimedLoader(spec.loader)
+                return spec
+        return None
+
+sys.meta_path.insert(0, TimedFinder())
+import %s
+'''
+
+
+def parse_import_times(output: str) -> pd.DataFrame:
+    """
+    output: stderr of python -X importtime
+
+    returns one row per imported module, in import order, with the module
+            name, its nesting level, and its self and cumulative import
+            time in seconds
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(),
+                'level': (len(name) - len(name.lstrip()) - 1) // 2,
+                'self': int(self_time) / 1e6, 'cumulative': int(cumulative) / 1e6})
+    return pd.DataFrame(rows, columns=['module', 'level', 'self', 'cumulative'])
+
+
+def measure_import(module: str='core.engine', python: str=sys.executable) -> pd.DataFrame:
+    """
+    imports module in a fresh interpreter, with -X importtime when
+    available and an equivalent timing import hook otherwise
+
+    returns import times, see parse_import_times
+    """
+    version = subprocess.check_output([python, '-c',
+            'import sys; print(sys.version_info >= (3, 7))'], cwd=ROOT_FOLDER)
+    if version.strip() == b'True':
+        command = [python, '-X', 'importtime', '-c', 'import %s' % module]
+    else:
+        command = [python, '-c', _FALLBACK_SCRIPT % module]
+    process = subprocess.run(command, cwd=ROOT_FOLDER, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, check=True)
+    return parse_import_times(process.stderr.decode())
+
+
+def _top_level(import_times: pd.DataFrame, packages: List[str]) -> pd.DataFrame:
+    name = import_times['module'].str.split('.').str[0]
+    return import_times[name.isin(packages)]
+
+
+def summarize_import(import_times: pd.DataFrame, module: str='core.engine') -> Dict:
+    """
+    returns total import time of module, its own time excluding
+            THIRD_PARTY_PACKAGES, and the DEFERRED_MODULES it imported
+    """
+    total = import_times.loc[import_times['module'] == module, 'cumulative'].sum()
+    third_party = _top_level(import_times, THIRD_PARTY_PACKAGES)
+    # only the outermost import of a package carries its cumulative time
+    outermost = third_party[~third_party['module'].str.contains(r'\.')]
+    return {'total': total, 'own': total - outermost['cumulative'].sum(),
+            'deferred_imported': [name for name in DEFERRED_MODULES
+                    if (import_times['module'] == name).any()]}
+
+
+def run(module: str='core.engine', budget: float=.1, repeat: int=3) -> Dict:
+    """
+    budget: maximum own import time, in seconds, of module
+
+    returns summary of the fastest of repeat cold imports, with whether
+            the budget is kept and no deferred module is imported
+    """
+    summaries = [summarize_import(measure_import(module), module) for _ in range(repeat)]
+    summary = min(summaries, key=lambda summary: summary['own'])
+    summary['passed'] = summary['own'] <= budget and not summary['deferred_imported']
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='cold import time benchmark')
+    parser.add_argument('--module', default='core.engine')
+    parser.add_argument('--budget', type=float, default=.1,
+            help='seconds allowed on top of the numpy and pandas imports')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10,
+            help='number of slowest modules listed')
+    args = parser.parse_args()
+
+    if args.top:
+        import_times = measure_import(args.module)
+        print(import_times.sort_values('self', ascending=False).head(args.top)
+                .to_string(index=False))
+    summary = run(args.module, args.budget, args.repeat)
+    print('%s: total %.3fs, own %.3fs (budget %.3fs), deferred modules imported: %s' % (
+            args.module, summary['total'], summary['own'], args.budget,
+            ', '.join(summary['deferred_imported']) or 'none'))
+    sys.exit(0 if summary['passed'] else 1)
@@ -0,0 +1,53 @@
+import argparse
+import multiprocessing
+
+import pandas as pd
+
+from benchmark.suite import make_panels, peak_rss_mb
+from data.data_manager import DataManager
+from data.dtypes import COMPACT_POLICY, DEFAULT_POLICY
+
+
+POLICIES = {'default': DEFAULT_POLICY, 'compact': COMPACT_POLICY}
+
+
+def measure(policy: str, n_tickers: int, n_years: int) -> dict:
+    """
+    builds the synthetic panels and the feed under policy in the calling
+    process
+
+    returns the memory report and the peak resident set size in megabytes
+    """
+    dtype_policy = POLICIES[policy]
+    data_manager = DataManager(dtype_policy=dtype_policy)
+    # panels are generated in the target dtype, the peak is not the float64 copy
+    data_manager.set_dataframes(make_panels(n_tickers, n_years, dtype=dtype_policy.price))
+    data_manager.create_feed()
+    return {'report': data_manager.memory_report(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def run(n_tickers: int=5000, n_years: int=20) -> pd.DataFrame:
+    """
+    measures every policy in its own process, so peak_rss_mb is not
+    inflated by the previous one
+
+    returns one row per policy with the data megabytes and the peak RSS
+    """
+    rows = {}
+    context = multiprocessing.get_context('spawn')
+    for policy in POLICIES:
+        with context.Pool(1) as pool:
+            result = pool.apply(measure, (policy, n_tickers, n_years))
+        rows[policy] = {'data_mb': result['report'].loc['total', 'megabytes'],
+                        'peak_rss_mb': result['peak_rss_mb']}
+        print(result['report'].to_string(), flush=True)
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='market data memory per dtype policy')
+    parser.add_argument('--tickers', type=int, default=5000)
+    parser.add_argument('--years', type=int, default=20)
+    args = parser.parse_args()
+
+    print(run(args.tickers, args.years).to_string())
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.batch_metrics import compute_metrics
+from core.metrics_util import calculate_max_drawdown, calculate_sharpe
+
+
+def make_equity_curves(n_portfolios: int=2000, n_days: int=5000, seed: int=0) -> np.ndarray:
+    """
+    returns dates x portfolios array of synthetic portfolio values
+    """
+    random_state = np.random.RandomState(seed)
+    returns = random_state.normal(.0003, .01, (n_days, n_portfolios))
+    return 100 * np.exp(np.cumsum(returns, axis=0))
+
+
+def compute_one_serie_at_a_time(values: np.ndarray) -> pd.DataFrame:
+    """
+    Reference, core.metrics_util applied portfolio by portfolio
+    """
+    dataframe = pd.DataFrame(values)
+    return pd.DataFrame({
+            'sharpe': [calculate_sharpe(dataframe[col], '1D') for col in dataframe],
+            'max_drawdown': [calculate_max_drawdown(dataframe[col]) for col in dataframe]})
+
+
+def run(n_portfolios: int=2000, n_days: int=5000, repeat: int=3) -> dict:
+    """
+    times the batch metrics against the per serie metrics
+
+    returns dictionary of name to best timing in seconds
+    """
+    values = make_equity_curves(n_portfolios, n_days)
+    timings = {}
+    for name, function in (('batch', compute_metrics),
+            ('per_serie', compute_one_serie_at_a_time)):
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(values)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='batch metrics benchmark')
+    parser.add_argument('--portfolios', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    timings = run(args.portfolios, args.days, args.repeat)
+    print('batch (full metric set) %.3fs, per serie (sharpe and drawdown) %.3fs, '
+            'speedup %.1fx' % (timings['batch'], timings['per_serie'],
+            timings['per_serie'] / timings['batch']))
@@ -0,0 +1,363 @@
+import argparse
+from collections import OrderedDict
+import contextlib
+from datetime import date, datetime
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmark.adjustment import make_raw_prices
+
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICKER_SCALES = [4, 100, 1000, 5000]
+YEAR_SCALES = [2, 10, 20]
+BENCHMARK = 'SYNTH'
+FUNDAMENTAL_FIELDS = ['eps', 'book_value']
+
+
+def make_panels(n_tickers: int=100, n_years: int=10, seed: int=0,
+        fields: List[str]=None, dtype=np.float64) -> Dict[str, pd.DataFrame]:
+    """
+    Synthetic data, same layout as DataManager.DATAFRAMES: a dates x tickers
+    price panel where a tenth of the tickers list during the period, a
+    quarterly (date, fsym_id) fundamental dataframe and a benchmark index
+
+    fields: fundamental fields, FUNDAMENTAL_FIELDS by default
+    dtype: dtype of the price and fundamental values
+
+    returns dictionary of price, fundamental and benchmark dataframes
+    """
+    fields = fields or FUNDAMENTAL_FIELDS
+    random_state = np.random.RandomState(seed)
+    dates = pd.bdate_range(date(2000, 1, 3), periods=252 * n_years)
+    tickers = ['T%04d' % idx for idx in range(n_tickers)]
+
+    returns = random_state.normal(.0002, .015, (len(dates), n_tickers)).astype(dtype)
+    prices = np.cumsum(returns, axis=0, out=returns)
+    prices = np.exp(prices, out=prices)
+    prices *= 50
+    listing_rows = random_state.randint(0, len(dates) // 2, n_tickers)
+    listing_rows[random_state.rand(n_tickers) > .1] = 0
+    prices[np.arange(len(dates))[:, None] < listing_rows] = np.nan
+    price = pd.DataFrame(prices, index=dates, columns=tickers)
+
+    report_dates = dates[::63]
+    index = pd.MultiIndex.from_product([report_dates, tickers], names=['date', 'fsym_id'])
+    fundamental = pd.DataFrame(random_state.lognormal(0, 1, (len(index), len(fields)))
+            .astype(dtype), index=index, columns=fields)
+
+    benchmark = pd.DataFrame({BENCHMARK: 1000 * np.exp(np.cumsum(
+            random_state.normal(.0002, .01, len(dates))))}, index=dates)
+    return {'price': price, 'fundamental': fundamental, 'benchmark': benchmark}
+
+
+def _run_engine(panels: Dict, strategy_class):
+    from core.engine import Engine
+
+    dates = panels['price'].index
+    strategy = strategy_class()
+    engine = Engine(universe=list(panels['price'].columns),
+            start_date=dates[min(100, len(dates) - 2)].date(),
+            end_date=dates[-1].date(), generate_report=False)
+    engine.logger.setLevel(logging.WARNING)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.run(strategy, panels)
+    return time.perf_counter() - start, len(engine.mtm)
+
+
+def bench_engine_simple_macd(panels: Dict):
+    """
+    Engine.run with SimpleMACD, digesting every business date
+    """
+    from strategies.simple_macd import SimpleMACD
+    return _run_engine(panels, SimpleMACD)
+
+
+def bench_engine_equal_weight(panels: Dict):
+    """
+    Engine.run with EqualWeightQuarterly
+    """
+    from strategies.equal_weight_quarterly import EqualWeightQuarterly
+    return _run_engine(panels, EqualWeightQuarterly)
+
+
+def bench_multi_strategy(panels: Dict):
+    """
+    MultiStrategyEngine.run with ten equal weight strategies of different
+    rebalance frequencies sharing one pass over the data
+    """
+    from core.multi_engine import MultiStrategyEngine
+    from strategies.equal_weight_quarterly import EqualWeightQuarterly
+
+    dates = panels['price'].index
+    strategies = [EqualWeightQuarterly(rebalance_freq=freq)
+            for freq in ('W', 'M', 'Q', 'SA', 'Y') * 2]
+    engine = MultiStrategyEngine(universe=list(panels['price'].columns),
+            start_date=dates[min(100, len(dates) - 2)].date(),
+            end_date=dates[-1].date())
+    engine.logger.setLevel(logging.WARNING)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.run(strategies, panels)
+    return time.perf_counter() - start, len(engine.mtm)
+
+
+def bench_get_market_data(panels: Dict):
+    """
+    DataManager.get_market_data on every date, after building the feed
+    """
+    from data.data_manager import DataManager
+
+    data_manager = DataManager()
+    data_manager.DATAFRAMES = panels
+    data_manager.create_feed(window_size=365)
+    dates = panels['price'].index
+    start = time.perf_counter()
+    for as_of_date in dates:
+        data_manager.get_market_data(as_of_date)
+    return time.perf_counter() - start, len(dates)
+
+
+def bench_post_trade(panels: Dict):
+    """
+    Engine.post_trade, the daily mark to market, on every date of a run
+    """
+    from core.engine import Engine
+    from strategies.strategy import Strategy
+
+    dates = panels['price'].index
+    engine = Engine(universe=list(panels['price'].columns), start_date=dates[0].date(),
+            end_date=dates[-1].date(), generate_report=False)
+    engine.initialize(Strategy(), panels)
+    feed = engine.data_manager.feed
+    run_dates = dates[:-1]
+    start = time.perf_counter()
+    for current_date in run_dates:
+        engine.current_date = current_date
+        feed.seek(current_date)
+        engine.post_trade()
+    return time.perf_counter() - start, len(run_dates)
+
+
+def bench_calendar(panels: Dict):
+    """
+    Calendar construction from the price index and a month end query of
+    every date
+    """
+    from core.calendar import Calendar
+
+    dates = panels['price'].index
+    start = time.perf_counter()
+    Calendar(dates).is_month_end_business_date(dates)
+    return time.perf_counter() - start, len(dates)
+
+
+def bench_metrics(panels: Dict):
+    """
+    core.metrics_util sharpe, max drawdown and information ratio of every
+    price serie, one serie at a time. Days are serie days
+    """
+    from core.metrics_util import calculate_information_ratio, \
+            calculate_max_drawdown, calculate_sharpe
+
+    price = panels['price']
+    curves = pd.concat([price, panels['benchmark']], axis=1)
+    start = time.perf_counter()
+    for ticker in price.columns:
+        calculate_sharpe(price[ticker], '1D')
+        calculate_max_drawdown(price[ticker])
+        calculate_information_ratio(curves, '1D', ticker, BENCHMARK)
+    return time.perf_counter() - start, price.size
+
+
+def bench_batch_metrics(panels: Dict):
+    """
+    core.batch_metrics over every price serie at once. Days are serie days
+    """
+    from core.batch_metrics import compute_metrics
+
+    price = panels['price']
+    start = time.perf_counter()
+    compute_metrics(price, benchmark=panels['benchmark'])
+    return time.perf_counter() - start, price.size
+
+
+def bench_cache_load(panels: Dict):
+    """
+    PriceCache.get_adjusted_prices of a fully cached range: store read,
+    adjustment and pivot. Days are ticker days
+    """
+    from data.cache import PriceCache
+
+    n_tickers = panels['price'].shape[1]
+    n_years = panels['price'].shape[0] // 252
+    price, dividend, split = make_raw_prices(n_tickers, n_years)
+    tickers = list(price['fsym_id'].unique())
+    start_date, end_date = price['date'].min().date(), price['date'].max().date()
+    folder = tempfile.mkdtemp(prefix='backtester_benchmark_')
+    try:
+        cache = PriceCache(folder)
+        cache._store(tickers, price, dividend, split, start_date, end_date)
+        start = time.perf_counter()
+        cache.get_adjusted_prices(tickers, start_date, end_date)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return elapsed, len(price)
+
+
+CASES = OrderedDict([
+    ('engine_simple_macd', bench_engine_simple_macd),
+    ('engine_equal_weight', bench_engine_equal_weight),
+    ('multi_strategy', bench_multi_strategy),
+    ('get_market_data', bench_get_market_data),
+    ('post_trade', bench_post_trade),
+    ('calendar', bench_calendar),
+    ('metrics', bench_metrics),
+    ('batch_metrics', bench_batch_metrics),
+    ('cache_load', bench_cache_load),
+])
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def run_case(case: str, n_tickers: int, n_years: int, seed: int=0) -> Dict:
+    """
+    runs one case in the calling process, peak_rss_mb is the peak of the
+    whole process, synthetic data included
+
+    returns result of the case
+    """
+    panels = make_panels(n_tickers, n_years, seed)
+    seconds, days = CASES[case](panels)
+    days = int(days)
+    return {'case': case, 'tickers': n_tickers, 'years': n_years,
+            'status': 'ok', 'seconds': seconds, 'days': days,
+            'days_per_second': days / seconds if seconds else None,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def _run_case_process(case: str, n_tickers: int, n_years: int, timeout: float) -> Dict:
+    command = [sys.executable, '-m', 'benchmark.suite', '--child', '--cases', case,
+            '--tickers', str(n_tickers), '--years', str(n_years)]
+    failed = {'case': case, 'tickers': n_tickers, 'years': n_years, 'seconds': None,
+            'days': None, 'days_per_second': None, 'peak_rss_mb': None}
+    try:
+        process = subprocess.run(command, cwd=ROOT_FOLDER, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return dict(failed, status='timeout')
+    if process.returncode != 0:
+        return dict(failed, status='error',
+                error=(process.stderr.decode().strip().splitlines() or [''])[-1])
+    return json.loads(process.stdout.decode().strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT_FOLDER,
+                stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases: List[str]=None, tickers: List[int]=None, years: List[int]=None,
+        output: str=None, timeout: float=None, progress=None) -> Dict:
+    """
+    Runs every case at every scale, each in a fresh interpreter so the peak
+    RSS and caches of a case do not leak into the next one
+
+    cases: names of CASES to run, all by default
+    tickers, years: scales to run, TICKER_SCALES and YEAR_SCALES by default
+    output: optional path of the JSON file the results are written to
+    timeout: seconds after which a case is stopped and recorded as timeout
+    progress: optional callable receiving each result
+
+    returns dictionary with the commit, environment and list of results
+    """
+    results = []
+    for n_tickers in tickers or TICKER_SCALES:
+        for n_years in years or YEAR_SCALES:
+            for case in cases or list(CASES):
+                result = _run_case_process(case, n_tickers, n_years, timeout)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+
+    report = {'commit': _git_commit(), 'created': datetime.now().isoformat(),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'platform': platform.platform(),
+            'results': results}
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(report, output_file, indent=1)
+    return report
+
+
+def compare(baseline: str, current: str) -> pd.DataFrame:
+    """
+    baseline, current: JSON files written by run, e.g. on two commits
+
+    returns one row per case and scale run in both, with the seconds and
+            peak RSS of each and the speedup of current over baseline
+    """
+    frames = []
+    for file_path in (baseline, current):
+        with open(file_path) as result_file:
+            frames.append(pd.DataFrame(json.load(result_file)['results']).set_index(
+                    ['case', 'tickers', 'years'])[['seconds', 'peak_rss_mb']])
+    joined = frames[0].join(frames[1], how='inner', lsuffix='_baseline', rsuffix='_current')
+    joined['speedup'] = joined['seconds_baseline'] / joined['seconds_current']
+    return joined
+
+
+def _format(result: Dict) -> str:
+    if result['status'] != 'ok':
+        return '%-20s %5d tickers %2d years: %s' % (result['case'], result['tickers'],
+                result['years'], result['status'])
+    return '%-20s %5d tickers %2d years: %8.3fs %12.0f days/s %8.1f MB' % (
+            result['case'], result['tickers'], result['years'], result['seconds'],
+            result['days_per_second'] or 0, result['peak_rss_mb'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='synthetic data benchmark suite')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=None)
+    parser.add_argument('--tickers', nargs='+', type=int, default=[4, 100])
+    parser.add_argument('--years', nargs='+', type=int, default=[2, 10])
+    parser.add_argument('--full', action='store_true',
+            help='run every scale of TICKER_SCALES and YEAR_SCALES')
+    parser.add_argument('--output', default=None, help='JSON file to write')
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+            help='compare two JSON files instead of running')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.cases[0], args.tickers[0], args.years[0])))
+    elif args.compare:
+        print(compare(*args.compare).to_string())
+    else:
+        run(args.cases, None if args.full else args.tickers,
+                None if args.full else args.years, output=args.output,
+                timeout=args.timeout,
+                progress=lambda result: print(_format(result), flush=True))
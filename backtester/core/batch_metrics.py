@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+
+from core.metrics_util import ANNUALIZATION_FACTOR, DEFAULT_RISK_FREE_RATE
+
+
+METRICS = ['annualized_return', 'volatility', 'sharpe', 'sortino', 'max_drawdown',
+           'calmar', 'information_ratio', 'turnover', 'hit_rate']
+ROLLING_METRICS = ['return', 'volatility', 'sharpe', 'sortino', 'hit_rate']
+
+
+def _compounding_periods(periodicity: str) -> float:
+    period_unit = periodicity[-1].upper()
+    periods = int(periodicity[:-1])
+    return ANNUALIZATION_FACTOR[period_unit] / periods
+
+
+def _as_2d(values):
+    """
+    returns values as a float 2-D array of dates x portfolios, with the
+    row and column labels when a dataframe or serie was passed. float32
+    values are kept as is, sums are accumulated in float64
+    """
+    index = columns = None
+    if isinstance(values, pd.Series):
+        values = values.to_frame()
+    if isinstance(values, pd.DataFrame):
+        index, columns = values.index, values.columns
+        values = values.values
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        values = values.astype(np.float64, copy=False)
+    if values.ndim == 1:
+        values = values[:, None]
+    if columns is None:
+        columns = pd.RangeIndex(values.shape[1])
+    return values, index, columns
+
+
+class _Returns:
+    """
+    Log returns of a dates x portfolios array and the masked sums every
+    metric is derived from, computed once
+    """
+
+    def __init__(self, values: np.ndarray, is_return: bool):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if is_return:
+                self.returns = values
+            else:
+                self.returns = np.log(values[1:] / values[:-1])
+        self.valid = ~np.isnan(self.returns)
+        self.complete = bool(self.valid.all())
+        self.filled = self.returns if self.complete else np.where(self.valid, self.returns, 0.)
+        self.count = self.valid.sum(axis=0)
+
+        # a single scratch array is reused, the arrays can be large
+        scratch = np.empty_like(self.filled)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.mean = self.filled.sum(axis=0, dtype=np.float64) / self.count
+            np.subtract(self.returns, self.mean, out=scratch)
+            if not self.complete:
+                scratch[~self.valid] = 0.
+            self.std = np.sqrt(np.einsum('ij,ij->j', scratch, scratch,
+                    dtype=np.float64) / (self.count - 1))
+            np.minimum(self.filled, 0., out=scratch)
+            self.downside_std = np.sqrt(np.einsum('ij,ij->j', scratch, scratch,
+                    dtype=np.float64) / self.count)
+            self.hit_rate = np.count_nonzero(self.filled > 0, axis=0) / self.count
+
+
+def _max_drawdown(values: np.ndarray) -> np.ndarray:
+    drawdown = np.fmax.accumulate(values, axis=0)
+    with np.errstate(invalid='ignore'):
+        np.divide(values, drawdown, out=drawdown)
+    if np.isnan(drawdown).any():
+        drawdown[np.isnan(drawdown)] = np.inf
+    max_drawdown = drawdown.min(axis=0) - 1
+    max_drawdown[np.isinf(max_drawdown)] = np.nan
+    return max_drawdown
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator == 0, np.nan, numerator / denominator)
+
+
+def compute_metrics(values, periodicity: str='1D', benchmark=None,
+        traded_value=None, is_return: bool=False,
+        risk_free_rate: float=DEFAULT_RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    Computes the metric set of many portfolios at once, sharpe, max drawdown
+    and information ratio follow core.metrics_util.
+
+        values: pd.DataFrame or 2-D array of dates x portfolios, portfolio
+                values or log returns. NaN marks dates a portfolio has no
+                value for
+   periodicity: the periodicity of values, e.g. "1D", "1W", "1M"
+     benchmark: optional benchmark values (or log returns), 1-D over the
+                same dates, or one column per portfolio
+  traded_value: optional dates x portfolios absolute value traded at each
+                date, turnover is left NaN if not provided
+     is_return: whether values are already log returns
+risk_free_rate: annual rate sharpe and sortino are measured against
+
+    returns one row per portfolio with the columns of METRICS. turnover is
+            the annualized value traded over the mean portfolio value,
+            calmar the annualized return over the absolute max drawdown
+    """
+    values, _, columns = _as_2d(values)
+    compounding_periods = _compounding_periods(periodicity)
+    returns = _Returns(values, is_return)
+
+    annualized_mean = (1 + returns.mean) ** compounding_periods - 1
+    volatility = returns.std * np.sqrt(compounding_periods)
+    with np.errstate(invalid='ignore', over='ignore'):
+        annualized_return = np.exp(returns.mean * compounding_periods) - 1
+    if is_return:
+        # the curve starts at 1 before the first return, a drawdown can
+        # begin on the first date
+        curve = np.ones((values.shape[0] + 1, values.shape[1]))
+        np.cumsum(returns.filled, axis=0, dtype=np.float64, out=curve[1:])
+        np.exp(curve[1:], out=curve[1:])
+    else:
+        curve = values
+    max_drawdown = _max_drawdown(curve)
+
+    result = {
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'sharpe': _ratio(annualized_mean - risk_free_rate, volatility),
+        'sortino': _ratio(annualized_mean - risk_free_rate,
+                returns.downside_std * np.sqrt(compounding_periods)),
+        'max_drawdown': max_drawdown,
+        'calmar': _ratio(annualized_return, np.abs(max_drawdown)),
+        'information_ratio': np.full(values.shape[1], np.nan),
+        'turnover': np.full(values.shape[1], np.nan),
+        'hit_rate': returns.hit_rate,
+    }
+
+    if benchmark is not None:
+        benchmark, _, _ = _as_2d(benchmark)
+        active = _Returns(returns.returns - _Returns(benchmark, is_return).returns,
+                is_return=True)
+        result['information_ratio'] = _ratio(
+                (1 + active.mean) ** compounding_periods - 1,
+                active.std * np.sqrt(compounding_periods))
+
+    if traded_value is not None and not is_return:
+        traded_value, _, _ = _as_2d(traded_value)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_value = np.nanmean(values, axis=0)
+            result['turnover'] = np.nansum(np.abs(traded_value[1:]), axis=0) \
+                    / mean_value * compounding_periods / returns.count
+
+    return pd.DataFrame(result, index=columns, columns=METRICS)
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    cumulative = np.cumsum(values, axis=0, dtype=np.float64)
+    result = cumulative.copy()
+    result[window:] -= cumulative[:-window]
+    return result
+
+
+def compute_rolling_metrics(values, window: int, periodicity: str='1D',
+        is_return: bool=False, risk_free_rate: float=DEFAULT_RISK_FREE_RATE,
+        min_periods: int=None) -> pd.DataFrame:
+    """
+    Computes trailing window metrics of many portfolios at once, with
+    running sums so the cost does not depend on the window size.
+
+         values: pd.DataFrame or 2-D array of dates x portfolios, portfolio
+                 values or log returns
+         window: number of returns in each window
+    min_periods: number of valid returns a window needs, defaults to window
+
+    returns dataframe indexed by date, with (metric, portfolio) columns for
+            the metrics of ROLLING_METRICS. return is the annualized return,
+            the first date of values has no return when values are not
+            returns and is NaN
+    """
+    values, index, columns = _as_2d(values)
+    compounding_periods = _compounding_periods(periodicity)
+    min_periods = window if min_periods is None else min_periods
+    returns = _Returns(values, is_return)
+
+    # centering on the overall mean keeps the running sums of squares precise
+    centered = np.where(returns.valid, returns.returns - np.nan_to_num(returns.mean), 0.)
+    count = _rolling_sum(returns.valid.astype(np.float64), window)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mean = _rolling_sum(centered, window) / count
+        variance = (_rolling_sum(centered * centered, window) - count * mean * mean) \
+                / (count - 1)
+        mean += np.nan_to_num(returns.mean)
+        std = np.sqrt(np.maximum(variance, 0.))
+        downside = np.minimum(returns.filled, 0.)
+        downside_std = np.sqrt(_rolling_sum(downside * downside, window) / count)
+        hit_rate = _rolling_sum((returns.filled > 0).astype(np.float64), window) / count
+
+        annualized_mean = (1 + mean) ** compounding_periods - 1
+        volatility = std * np.sqrt(compounding_periods)
+        metrics = {
+            'return': np.exp(mean * compounding_periods) - 1,
+            'volatility': volatility,
+            'sharpe': _ratio(annualized_mean - risk_free_rate, volatility),
+            'sortino': _ratio(annualized_mean - risk_free_rate,
+                    downside_std * np.sqrt(compounding_periods)),
+            'hit_rate': hit_rate,
+        }
+
+    offset = values.shape[0] - returns.returns.shape[0]
+    result = np.full((values.shape[0], len(ROLLING_METRICS) * values.shape[1]), np.nan)
+    for idx, name in enumerate(ROLLING_METRICS):
+        metric = metrics[name]
+        metric[count < max(min_periods, 1)] = np.nan
+        result[offset:, idx * values.shape[1]:(idx + 1) * values.shape[1]] = metric
+
+    return pd.DataFrame(result, index=index,
+            columns=pd.MultiIndex.from_product([ROLLING_METRICS, columns]))
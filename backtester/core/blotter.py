@@ -0,0 +1,115 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from core.trade import Trade
+
+
+class Blotter:
+    """
+    Append only record of the fills of a backtest, kept as columns of
+    ticker ids, date indexes, quantities and prices in preallocated arrays
+    that double when full. A fill costs 24 bytes instead of a Trade object,
+    Trade objects are only built when the blotter is iterated.
+    """
+
+    def __init__(self, tickers: List[str], dates: pd.DatetimeIndex, size: int=1024):
+        """
+        tickers: ticker of each ticker id, normally the price columns
+        dates: date of each date index, normally the price index
+        size: initial capacity in number of fills
+        """
+        self.tickers = pd.Index(tickers)
+        self.dates = pd.DatetimeIndex(dates)
+        size = max(size, 1)
+        self.ticker_ids = np.empty(size, dtype=np.int32)
+        self.date_indexes = np.empty(size, dtype=np.int32)
+        self.quantities = np.empty(size, dtype=np.float64)
+        self.prices = np.empty(size, dtype=np.float64)
+        self.count = 0
+
+
+    def _reserve(self, size: int) -> None:
+        capacity = self.ticker_ids.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self.ticker_ids = np.resize(self.ticker_ids, capacity)
+        self.date_indexes = np.resize(self.date_indexes, capacity)
+        self.quantities = np.resize(self.quantities, capacity)
+        self.prices = np.resize(self.prices, capacity)
+
+
+    def append(self, ticker_id: int, date_index: int, quantity: float, price: float) -> None:
+        self._reserve(self.count + 1)
+        idx = self.count
+        self.ticker_ids[idx] = ticker_id
+        self.date_indexes[idx] = date_index
+        self.quantities[idx] = quantity
+        self.prices[idx] = price
+        self.count += 1
+
+
+    def extend(self, ticker_ids: np.ndarray, date_indexes, quantities: np.ndarray,
+            prices: np.ndarray) -> None:
+        """
+        Appends several fills, date_indexes can be a single date index
+        shared by all fills
+        """
+        size = len(ticker_ids)
+        self._reserve(self.count + size)
+        rows = slice(self.count, self.count + size)
+        self.ticker_ids[rows] = ticker_ids
+        self.date_indexes[rows] = date_indexes
+        self.quantities[rows] = quantities
+        self.prices[rows] = prices
+        self.count += size
+
+
+    def rebase(self, dates: pd.DatetimeIndex) -> None:
+        """
+        Expresses the date indexes of the fills against dates instead, e.g. 
+        the price index of data extended past the end of the backtest
+        """
+        dates = pd.DatetimeIndex(dates)
+        rows = slice(0, self.count)
+        positions = dates.get_indexer(self.dates[self.date_indexes[rows]])
+        if (positions < 0).any():
+            raise ValueError('Trade dates are missing from dates')
+        self.date_indexes[rows] = positions
+        self.dates = dates
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def __getitem__(self, idx: int) -> Trade:
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError('blotter index %d out of range' % idx)
+        return Trade(ticker=self.tickers[self.ticker_ids[idx]],
+                price=self.prices[idx], quantity=self.quantities[idx],
+                trade_date=self.dates[self.date_indexes[idx]])
+
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self[idx]
+
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        returns one row per fill with trade_date, ticker, quantity and price
+        columns, in order of execution
+        """
+        rows = slice(0, self.count)
+        return pd.DataFrame({
+                'trade_date': self.dates[self.date_indexes[rows]],
+                'ticker': self.tickers[self.ticker_ids[rows]],
+                'quantity': self.quantities[rows],
+                'price': self.prices[rows]},
+                columns=['trade_date', 'ticker', 'quantity', 'price'])
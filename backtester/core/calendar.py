@@ -1,39 +1,174 @@
-from datetime import timedelta
-
+import numpy as np
 import pandas as pd
+from pandas.tseries.holiday import get_calendar
 
 class Calendar:
+    """
+    Sorted business dates held as an int64 array of nanoseconds. Period end
+    flags are precomputed as boolean masks, so every query is a binary
+    search plus an array read. Queries accept a single date and return a
+    scalar, or an array-like of dates and return an array.
+    """
 
-    def __init__(self, calendar, *args, **kwargs):
+    def __init__(self, calendar, holiday_calendar=None, *args, **kwargs):
         """
         calendar: Pandas.DatetimeIndex
+        holiday_calendar: optional pandas holiday calendar, or its name as
+                registered with pandas.tseries.holiday, e.g.
+                'USFederalHolidayCalendar'. Its holidays are removed from
+                calendar
+        """
+        calendar = pd.DatetimeIndex(calendar).normalize().unique().sort_values()
+        if holiday_calendar is not None and calendar.shape[0]:
+            if isinstance(holiday_calendar, str):
+                holiday_calendar = get_calendar(holiday_calendar)
+            holidays = holiday_calendar.holidays(start=calendar[0], end=calendar[-1])
+            calendar = calendar[~calendar.isin(holidays)]
+        self.calendar = calendar
+        self.dates = calendar.values.view('i8')
+
+        # the next business date of the last one is unknown, so it is never
+        # flagged as a period end
+        weeks = (self.dates // (24 * 3600 * 10 ** 9) + 3) // 7  # monday based
+        months = calendar.year.values * 12 + calendar.month.values - 1
+        self.week_end = self._period_end(weeks)
+        self.month_end = self._period_end(months)
+        self.quarter_end = self._period_end(months // 3)
+        self.semiannual_end = self._period_end(months // 6) & \
+                (calendar.month.values == 6)
+        self.year_end = self._period_end(calendar.year.values)
+
+    @classmethod
+    def from_holidays(cls, start_date, end_date, holiday_calendar='USFederalHolidayCalendar',
+            weekmask: str='Mon Tue Wed Thu Fri'):
+        """
+        Builds the calendar of the business dates between start and end date
+        (inclusive) from a holiday calendar instead of a price history
+        """
+        if isinstance(holiday_calendar, str):
+            holiday_calendar = get_calendar(holiday_calendar)
+        return cls(pd.date_range(start=start_date, end=end_date,
+                freq=pd.offsets.CustomBusinessDay(calendar=holiday_calendar,
+                weekmask=weekmask)))
+
+    @staticmethod
+    def _period_end(periods: np.ndarray) -> np.ndarray:
+        mask = np.zeros(periods.shape[0], dtype=bool)
+        mask[:-1] = periods[1:] != periods[:-1]
+        return mask
+
+    @staticmethod
+    def _to_values(dates):
+        """
+        returns the int64 nanoseconds of dates and whether a scalar was passed
+        """
+        if np.ndim(dates) == 0 and not isinstance(dates, (pd.Index, np.ndarray)):
+            return np.array([pd.Timestamp(dates).value], dtype=np.int64), True
+        return pd.DatetimeIndex(dates).values.view('i8'), False
+
+    def searchsorted(self, dates, roll: str=None):
         """
-        self.calendar = calendar.sort_values()
-        self._next_business_date_lookup = {self.calendar[i]: self.calendar[i + 1] 
-                for i in range(self.calendar.shape[0] - 1)}
+        dates: date or array-like of dates, business dates or not
+        roll: None to return the position the dates would be inserted at,
+              'forward' for the position of the first business date on or
+              after each date, 'backward' for the last one on or before it.
+              Positions out of the calendar are -1 or the calendar length
+
+        returns position or array of positions in the calendar
+        """
+        values, scalar = self._to_values(dates)
+        if roll is None or roll == 'forward':
+            positions = np.searchsorted(self.dates, values, side='left')
+        elif roll == 'backward':
+            positions = np.searchsorted(self.dates, values, side='right') - 1
+        else:
+            raise ValueError('Unrecognized roll %s' % roll)
+        return int(positions[0]) if scalar else positions
+
+    def roll(self, dates, roll: str='forward'):
+        """
+        returns the business date on or after (forward), or on or before
+        (backward) each of dates
+        """
+        positions = self.searchsorted(dates, roll=roll)
+        scalar = np.ndim(positions) == 0
+        positions = np.atleast_1d(positions)
+        if ((positions < 0) | (positions >= self.dates.shape[0])).any():
+            raise ValueError('Calendar dose NOT cover provided dates %s' % dates)
+        if scalar:
+            return self.calendar[positions[0]]
+        return self.calendar[positions]
+
+    def _positions(self, dates):
+        """
+        returns the positions of business dates, raises ValueError for
+        dates not in the calendar
+        """
+        values, scalar = self._to_values(dates)
+        positions = np.searchsorted(self.dates, values).clip(max=max(self.dates.shape[0] - 1, 0))
+        if self.dates.shape[0] == 0 or (self.dates[positions] != values).any():
+            raise ValueError('Calendar dose NOT cover provided date %s' % dates)
+        return (int(positions[0]) if scalar else positions), scalar
 
     def is_business_date(self, date):
-        return date in self._next_business_date_lookup
+        values, scalar = self._to_values(date)
+        if self.dates.shape[0] == 0:
+            result = np.zeros(values.shape[0], dtype=bool)
+        else:
+            positions = np.searchsorted(self.dates, values).clip(max=self.dates.shape[0] - 1)
+            result = self.dates[positions] == values
+        return bool(result[0]) if scalar else result
 
     def next_business_date(self, current_date):
         """
-        Returns the subsequent business date after current date
+        Returns the subsequent business date after current date, which
+        does not need to be a business date itself
         """
-        if not current_date in self._next_business_date_lookup:
+        values, scalar = self._to_values(current_date)
+        positions = np.searchsorted(self.dates, values, side='right')
+        if (positions >= self.dates.shape[0]).any() or (positions == 0).any():
             raise ValueError('Calendar dose NOT cover provided current date %s' % current_date)
-        return self._next_business_date_lookup[current_date]
+        if scalar:
+            return self.calendar[positions[0]]
+        return self.calendar[positions]
+
+    def previous_business_date(self, current_date):
+        """
+        Returns the business date preceding current date, which does not
+        need to be a business date itself
+        """
+        values, scalar = self._to_values(current_date)
+        positions = np.searchsorted(self.dates, values, side='left') - 1
+        if (positions < 0).any() or (positions >= self.dates.shape[0] - 1).any():
+            raise ValueError('Calendar dose NOT cover provided current date %s' % current_date)
+        if scalar:
+            return self.calendar[positions[0]]
+        return self.calendar[positions]
+
+    def count_business_dates(self, start_date, end_date):
+        """
+        Returns the number of business dates from start date (inclusive)
+        to end date (exclusive)
+        """
+        start = self.searchsorted(start_date)
+        end = self.searchsorted(end_date)
+        return max(int(end - start), 0)
+
+    def _is_period_end(self, date, mask):
+        positions, scalar = self._positions(date)
+        return bool(mask[positions]) if scalar else mask[positions]
 
     def is_week_end_business_date(self, date):
-        return self.next_business_date(date).isoweekday() < date.isoweekday()
+        return self._is_period_end(date, self.week_end)
 
     def is_month_end_business_date(self, date):
-        return self.next_business_date(date).month != date.month
+        return self._is_period_end(date, self.month_end)
 
     def is_quarter_end_business_date(self, date):
-        return self.next_business_date(date).month != date.month and date.month in (3, 6, 9, 12)
+        return self._is_period_end(date, self.quarter_end)
 
     def is_semiannual_end_business_date(self, date):
-        return self.next_business_date(date).month != date.month and date.month == 6
+        return self._is_period_end(date, self.semiannual_end)
 
     def is_year_end_business_date(self, date):
-        return self.next_business_date(date).year > date.year
\ No newline at end of file
+        return self._is_period_end(date, self.year_end)
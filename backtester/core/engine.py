@@ -1,98 +1,234 @@
-from collections import defaultdict
 from datetime import date, timedelta
 from hashlib import sha256
 import logging
+import os
+import tempfile
 import time
-from typing import List, Dict, NewType
+from typing import List, Dict
 
+import numpy as np
 import pandas as pd
 
+from core.blotter import Blotter
 from core.calendar import Calendar
+from core.ledger import Ledger
+from core.matching import OrderBook
 from core.order import Order
+from core.profiling import RunStats, timed
 from core.report import Report
-from core.trade import Trade
+from core.scheduler import Scheduler
 from core.util import get_logger
+from core.vectorized import simulate_targets
 from core.metrics_util import calculate_information_ratio, \
         calculate_max_drawdown, calculate_sharpe
 
 from data.data_manager import DataManager
 from strategies.strategy import Strategy
 
-Order = NewType('Order', Order)
-Trade = NewType('Trade', Trade)
-
 
 class Engine:
 
     def __init__(self, universe: List[str], start_date: date, 
         end_date: date=None, initial_cash: float=1000000.0, 
-        calendar=None, logger=None, *args, **kwargs):
+        calendar=None, logger=None, generate_report: bool=False, 
+        max_fill_quantity: float=None, report: Report=None, 
+        report_executor=None, profile: bool=False, trace: bool=False, 
+        dtype_policy=None, checkpoint_path: str=None, 
+        checkpoint_freq: int=None, *args, **kwargs):
+        """
+        generate_report: submits the report of the run when it completes, 
+                the run does not wait for it, see report_future
+        report: core.report.Report generating the report, defaults to a PDF 
+                report saved into the report folder
+        report_executor: executor the report is generated in, defaults to
+                core.report.get_report_executor
+        max_fill_quantity: maximum number of shares of a ticker filled per 
+                day and per side for limit orders, see core.matching.OrderBook
+        profile: time every phase of a run, per call and per simulated day,
+                into stats, a core.profiling.RunStats
+        trace: also record every phase call as a trace event, see
+                core.profiling.RunStats.export_chrome_trace. Implies profile
+        dtype_policy: data.dtypes.DtypePolicy market data is held in, e.g.
+                data.dtypes.COMPACT_POLICY for float32 prices. The ledger
+                keeps positions, cash and MTM in float64
+        checkpoint_path: file run saves a checkpoint of the engine into
+                once it completes, see save_checkpoint
+        checkpoint_freq: also save the checkpoint every checkpoint_freq 
+                business dates of the run, so that a crashed run can be 
+                resumed from it
+        """
 
         self.universe = sorted(universe)
         self.initial_cash = initial_cash
         self.start_date = start_date
         self.end_date = end_date or date.today()
         self.current_date = None
-        self.data_manager = DataManager()
-        self.position = defaultdict(int)
+        self.data_manager = DataManager(dtype_policy=dtype_policy)
+        self.ledger = None
+        self.scheduler = None
+        self.order_book = None
+        self.max_fill_quantity = max_fill_quantity
         self.orders = {}
-        self.trades = []
+        self.blotter = None
         self.calendar = calendar
+        # a calendar derived from the data is rebuilt when the data is extended
+        self.calendar_provided = calendar is not None
+        self.generate_report = generate_report
+        self.report = report
+        self.report_executor = report_executor
+        self.report_future = None
+        self.profile = profile or trace
+        self.trace = trace
+        self.stats = None
+        self.strategy = None
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_freq = checkpoint_freq
         self.logger = logger or get_logger('backtester engine', logging.INFO)
 
 
+    @staticmethod
+    def get_data_start_date(start_date: date, strategy) -> date:
+        # make sure the number of dates earlier than backtest start 
+        # date is enough to cover the strategy's required data window
+        date_buffer = strategy.data_window_size * int(7 / 5) + 20
+        return start_date - timedelta(days=date_buffer)
+
+
     def initialize(self, strategy, data: Dict[str, pd.DataFrame]=None):
         
+        self.load_data(strategy, data)
+        self.reset_run(strategy)
+
+
+    def load_data(self, strategy, data: Dict[str, pd.DataFrame]=None) -> None:
+        """
+        Sets the data of the run up, from data or else from the database, 
+        and creates the feed of the data manager
+        """
+        self.stats = RunStats(per_day=True, trace=self.trace) if self.profile else None
+        self.data_manager.stats = self.stats
+        self.strategy = strategy
         if data is None:
-            # make sure the number of dates earlier than backtest start 
-            # date is enough to cover the strategy's required data window
-            date_buffer = strategy.data_window_size * int(7 / 5) + 20
-            data_start_date = self.start_date - timedelta(days=date_buffer)
+            data_start_date = Engine.get_data_start_date(self.start_date, strategy)
             self.data_manager.setup(start_date=data_start_date, strategy=strategy, 
                     end_date=self.end_date, universe=self.universe)
         else:
-            self.data_manager.DATAFRAMES = data
+            self.data_manager.set_dataframes(data)
+        with timed(self.stats, 'create_feed'):
+            self.data_manager.create_feed(window_size=strategy.data_window_size)
 
+
+    def reset_run(self, strategy) -> None:
+        """
+        Resets the state of a run over the feed of the data manager: start 
+        date, indicators, schedule, ledger, blotter and orders
+        """
+        feed = self.data_manager.feed
         if self.calendar is None:
             self.calendar = Calendar(self.data_manager.DATAFRAMES['price'].index)
         
-        self.current_date = pd.Timestamp(self.start_date)
-        while not self.calendar.is_business_date(self.current_date):
-            self.current_date += pd.offsets.BDay()
+        self.current_date = self.calendar.roll(self.start_date, roll='forward')
             
-        self.position = defaultdict(int)
-        self.cash = self.initial_cash
-        self.trades = []
+        # indicators start from the history preceding the backtest
+        strategy.reset_indicators(feed.columns)
+        if strategy.indicators:
+            with timed(self.stats, 'warm_up_indicators'):
+                for row in range(feed.dates.searchsorted(self.current_date)):
+                    strategy.update_indicators(feed.price_values[row])
+
+        self.scheduler = Scheduler(self.calendar, strategy.rebalance_freq)
+        run_length = self.calendar.count_business_dates(self.current_date, self.end_date)
+        self.ledger = Ledger(tickers=feed.columns, initial_cash=self.initial_cash, 
+                size=run_length)
+        self.blotter = Blotter(feed.columns, feed.dates)
+        # pending holds market orders, limit orders rest in the order book
         self.orders = {'pending': [], 'filled': [], 'cancelled': []}
-        self.mtm = pd.Series()
+        self.order_book = OrderBook(feed.columns, max_fill_quantity=self.max_fill_quantity)
+        self.mtm = None
+
+
+    @property
+    def trades(self) -> Blotter:
+        """
+        fills of the run, iterating the blotter yields core.trade.Trade objects
+        """
+        return self.blotter if self.blotter is not None else []
+
+
+    @property
+    def cash(self) -> float:
+        return self.ledger.cash
+
+
+    @property
+    def position(self) -> Dict[str, float]:
+        return self.ledger.get_position()
+
+
+    def submit_orders(self, orders: List[Order]) -> None:
+        if not orders:
+            return
+        try:
+            execution_date = self.calendar.next_business_date(self.current_date).date()
+        except ValueError:
+            # placed on the last date of the calendar, never executed
+            execution_date = None
+        for order in orders:
+            order.order_date = execution_date
+            if order.order_type == 'lmt':
+                self.order_book.add(order)
+            else:
+                self.orders['pending'].append(order)
 
 
     def execute_trades(self):
-        unfilled_order = []
+        pending_orders = []
         for order in self.orders['pending']:
-            if order.order_type == 'mkt':
-                price = self.data_manager.get_ticker_price_for_date(
-                        ticker=order.ticker, as_of_date=self.current_date)
-                trade = order.fill(price=price, trade_date=self.current_date)
-                self.trades.append(trade)
-                self.orders['filled'].append(order)
-                self.position[order.ticker] += order.quantity
-                self.cash -= trade.price * trade.quantity
-            elif order.order_type == 'lmt':
-                raise NotImplementedError('limit order is NOT implemented yet')
-        self.orders['pending'] = unfilled_order
+            if order.status == 'cancelled':
+                self.orders['cancelled'].append(order)
+            else:
+                pending_orders.append(order)
+        self.orders['pending'] = []
+
+        if pending_orders:
+            # market orders are netted per ticker and filled against the
+            # price row of the day, each fill is still recorded as a trade
+            feed = self.data_manager.feed
+            columns = np.fromiter((feed.column_index[order.ticker] for order in 
+                    pending_orders), dtype=np.int64, count=len(pending_orders))
+            quantities = np.fromiter((order.quantity for order in pending_orders),
+                    dtype=np.float64, count=len(pending_orders))
+            prices = feed.current_prices()[columns]
+            self.ledger.add_many(columns, quantities, prices)
+            self.blotter.extend(columns, feed.cursor, quantities, prices)
+            for order, price in zip(pending_orders, prices.tolist()):
+                order.apply_fill(price=price, trade_date=self.current_date)
+            self.orders['filled'].extend(pending_orders)
+
+        self.orders['cancelled'].extend(self.order_book.expire(self.current_date))
+        feed = self.data_manager.feed
+        trades, filled_orders = self.order_book.match(feed.current_prices(),
+                self.current_date)
+        for trade in trades:
+            self.blotter.append(feed.column_index[trade.ticker], feed.cursor,
+                    trade.quantity, trade.price)
+            self.ledger.add(ticker=trade.ticker, quantity=trade.quantity, 
+                    price=trade.price)
+        self.orders['filled'].extend(filled_orders)
+        self.orders['cancelled'].extend(self.order_book.pop_cancelled())
 
 
     def post_trade(self):
-        mtm = self.cash
-        prices = self.data_manager.get_prices_for_date(self.current_date)
-        for ticker, quantity in self.position.items():
-            mtm  += prices[ticker] * quantity if quantity else 0
-        mtm = pd.Series([round(mtm, 4)], index=[self.current_date])
-        self.mtm = pd.concat([self.mtm, mtm])
+        prices = self.data_manager.feed.current_prices()
+        self.ledger.mark_to_market(self.current_date, prices)
        
 
     def post_run(self, strategy):
+        if self.order_book is not None:
+            # cancelled orders deep in the book are only dropped lazily
+            self.order_book.drop_cancelled()
+            self.orders['cancelled'].extend(self.order_book.pop_cancelled())
+        self.mtm = self.ledger.get_mtm()
         self.max_drawdown = calculate_max_drawdown(
                 time_serie=self.mtm, is_return=False)
         self.sharpe = calculate_sharpe(time_series=self.mtm, 
@@ -114,7 +250,117 @@ class Engine:
 
         self.logger.info('completed backtest run')
         self.run_duration = time.time() - self.run_start_time
-        Report().generate_report(self)
+        if self.generate_report:
+            report = self.report or Report()
+            self.report_future = report.submit(self.get_results(), 
+                    executor=self.report_executor)
+
+
+    def get_results(self) -> Dict:
+        """
+        returns the printable fields, trades, mtm and total return trend of
+        the run, the input of core.report.Report. See core.report.save_results
+        to generate the report later
+        """
+        return {
+            'fields': {field: value for field, value in vars(self).items()
+                    if type(value) in Report.printable_types()},
+            'trades': self.blotter.to_dataframe(),
+            'mtm': self.mtm,
+            'total_return_trend': self.total_return_trend,
+        }
+
+
+    # state of a run saved into a checkpoint, the data is loaded again on resume
+    CHECKPOINT_FIELDS = ['universe', 'initial_cash', 'start_date', 'end_date', 
+            'current_date', 'calendar', 'calendar_provided', 'max_fill_quantity', 
+            'ledger', 'blotter', 'orders', 'order_book', 'strategy', 'profile', 
+            'trace', 'checkpoint_path', 'checkpoint_freq']
+    CHECKPOINT_VERSION = 1
+
+
+    def save_checkpoint(self, file_path: str=None) -> str:
+        """
+        Saves the state of the run as of current_date, the next business date
+        to simulate: ledger, trades, pending and resting orders, calendar 
+        position and the strategy with its indicators, which therefore has 
+        to be picklable. The file is replaced atomically, a crash while 
+        saving leaves the previous checkpoint intact.
+
+        file_path: defaults to checkpoint_path
+
+        returns the path of the checkpoint
+        """
+        file_path = file_path or self.checkpoint_path
+        if file_path is None:
+            raise ValueError('No checkpoint path provided')
+        checkpoint = {field: getattr(self, field) for field in self.CHECKPOINT_FIELDS}
+        checkpoint['version'] = self.CHECKPOINT_VERSION
+        checkpoint['dtype_policy'] = self.data_manager.dtype_policy
+        folder = os.path.dirname(os.path.abspath(file_path))
+        handle, temp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        os.close(handle)
+        try:
+            pd.to_pickle(checkpoint, temp_path)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return file_path
+
+
+    @classmethod
+    def load_checkpoint(cls, file_path: str, logger=None, **kwargs) -> 'Engine':
+        """
+        Restores an engine from a checkpoint, see resume to carry on the run
+
+        kwargs: constructor parameters, they take precedence over the 
+                checkpointed ones, e.g. checkpoint_path or generate_report
+
+        returns the engine
+        """
+        checkpoint = pd.read_pickle(file_path)
+        if checkpoint.get('version') != cls.CHECKPOINT_VERSION:
+            raise ValueError('Unsupported checkpoint version %s' % checkpoint.get('version'))
+        parameters = {'universe': checkpoint['universe'], 'logger': logger,
+                'start_date': checkpoint['start_date'], 
+                'dtype_policy': checkpoint['dtype_policy']}
+        parameters.update(kwargs)
+        engine = cls(**parameters)
+        for field in cls.CHECKPOINT_FIELDS:
+            if field not in kwargs:
+                setattr(engine, field, checkpoint[field])
+        return engine
+
+
+    def resume(self, data: Dict[str, pd.DataFrame]=None, end_date: date=None):
+        """
+        Carries on a run restored by load_checkpoint from its current date,
+        e.g. after a crash or to extend a completed run by the newly 
+        available days, with the same results as a run from the start date.
+
+        data: same as in run, it has to cover the dates of the trades 
+              already done. If not provided, data is built from the SQL 
+              database from the start date
+        end_date: new end date of the run, defaults to the checkpointed one
+        """
+        self.run_start_time = time.time()
+        if end_date is not None:
+            self.end_date = end_date
+        strategy = self.strategy
+        self.logger.info('resume backtest run from %s', self.current_date.date())
+        self.load_data(strategy, data)
+
+        feed = self.data_manager.feed
+        if not feed.columns.equals(self.ledger.tickers):
+            raise ValueError('Tickers of the data differ from the checkpoint')
+        if not self.calendar_provided:
+            self.calendar = Calendar(self.data_manager.DATAFRAMES['price'].index)
+        self.blotter.rebase(feed.dates)
+        self.scheduler = Scheduler(self.calendar, strategy.rebalance_freq)
+        self.run_days(strategy)
+        with timed(self.stats, 'post_run'):
+            self.post_run(strategy)
 
 
     def run(self, strategy, data: Dict[str, pd.DataFrame]=None):
@@ -124,27 +370,121 @@ class Engine:
              needs. dictionary should at the minimum contain price dataframe stored
              under 'price' key. If multi-indexed fundamental dataframe is
              also provided, store under 'fundamental' key. This is optional.
+             The strategy then also receives the point in time values of 
+             each field under 'fundamental_panel', see 
+             data.feed.point_in_time_panels
              If data is not provided, data will be built from SQL database.
         """
         
         self.run_start_time = time.time()
         self.logger.info('start backtest run')
         self.initialize(strategy, data)
+        self.run_days(strategy)
+        with timed(self.stats, 'post_run'):
+            self.post_run(strategy)
 
+
+    def run_days(self, strategy) -> None:
+        """
+        Simulates the business dates from current_date until end_date, 
+        saving checkpoints along the way when checkpoint_path is set
+        """
+        stats = self.stats
+        seek = self.data_manager.feed.seek
+        update_indicators = strategy.update_indicators
+        execute_trades, post_trade = self.execute_trades, self.post_trade
+        get_market_data = self.data_manager.get_market_data
+        digest, submit_orders = strategy.digest, self.submit_orders
+        if stats is not None:
+            # phases are only wrapped when profiling, a plain run calls them directly
+            seek = stats.wrap('seek', seek)
+            update_indicators = stats.wrap('update_indicators', update_indicators)
+            execute_trades = stats.wrap('execute_trades', execute_trades)
+            post_trade = stats.wrap('post_trade', post_trade)
+            get_market_data = stats.wrap('get_market_data', get_market_data)
+            digest = stats.wrap('digest', digest)
+            submit_orders = stats.wrap('submit_orders', submit_orders)
+
+        checkpoint_freq = self.checkpoint_freq if self.checkpoint_path else None
+        days_run = 0
         while self.current_date.date() < self.end_date:
 
-            # fill any pending orders before passing data into strategy for digestion
-            self.execute_trades()
-            self.post_trade()
+            if stats is not None:
+                stats.start_day(self.current_date)
+            seek(self.current_date)
+            if strategy.indicators:
+                update_indicators(self.data_manager.feed.current_prices())
 
-            data = self.data_manager.get_market_data(as_of_date=self.current_date)
-            new_orders = strategy.digest(data=data, cash=self.cash,
-                current_date=self.current_date, position=self.position)
-            self.orders['pending'].extend(new_orders)
+            # fill any pending orders before passing data into strategy for digestion
+            execute_trades()
+            post_trade()
 
-            # TODO: optimize based on strategy rebalancing frequency
+            # only build the market data snapshot on rebalance dates
+            if self.scheduler.is_rebalance_date(self.current_date):
+                data = get_market_data(as_of_date=self.current_date)
+                new_orders = digest(data=data, cash=self.cash,
+                    current_date=self.current_date, position=self.position)
+                submit_orders(new_orders)
             
             #self.logger.info('run strategy for %s', self.current_date.date())
             self.current_date = self.calendar.next_business_date(self.current_date)
 
-        self.post_run(strategy)
\ No newline at end of file
+            if checkpoint_freq:
+                days_run += 1
+                if days_run % checkpoint_freq == 0:
+                    with timed(stats, 'checkpoint'):
+                        self.save_checkpoint()
+
+        if self.checkpoint_path is not None:
+            self.save_checkpoint()
+
+
+    def run_vectorized(self, strategy, data: Dict[str, pd.DataFrame]=None):
+        """
+        Runs a target based strategy without the daily order loop. The 
+        strategy must implement Strategy.generate_targets, holdings, trades,
+        cash and mtm of the whole period are then computed with array 
+        operations and yield the same results as run.
+
+        strategy: strategy object that implements Strategy.generate_targets
+        data: same as in run
+        """
+
+        self.run_start_time = time.time()
+        self.logger.info('start vectorized backtest run')
+        self.initialize(strategy, data)
+
+        run_dates = self.calendar.calendar[self.calendar.searchsorted(self.current_date): 
+                self.calendar.searchsorted(self.end_date)]
+        feed = self.data_manager.feed
+        price_rows = feed.rows_for_dates(run_dates)
+        prices = feed.price_values[price_rows]
+        rebalance_rows = np.flatnonzero(self.scheduler.is_rebalance_dates(run_dates))
+
+        data = dict(self.data_manager.DATAFRAMES)
+        if feed.fundamental_panels:
+            data['fundamental_panel'] = feed.get_fundamental_panels()
+        with timed(self.stats, 'generate_targets'):
+            targets = strategy.generate_targets(data=data, 
+                    rebalance_dates=run_dates[rebalance_rows])
+            targets = targets.reindex(index=run_dates[rebalance_rows], columns=feed.columns)
+        with timed(self.stats, 'simulate_targets'):
+            mtm, fill_rows, quantities, positions, cash = simulate_targets(
+                    prices=prices, rebalance_rows=rebalance_rows, 
+                    targets=targets.values.astype(np.float64), 
+                    initial_cash=self.initial_cash, target_type=strategy.target_type)
+
+        for fill_row, row_quantities in zip(fill_rows, quantities):
+            columns = np.flatnonzero(~np.isnan(row_quantities))
+            self.blotter.extend(columns, price_rows[fill_row], 
+                    row_quantities[columns], prices[fill_row, columns])
+
+        self.ledger.positions[:] = positions
+        self.ledger.cash = cash
+        self.ledger.mtm_values = mtm
+        self.ledger.mtm_dates = run_dates.values
+        self.ledger.mtm_count = mtm.shape[0]
+        if run_dates.shape[0]:
+            self.current_date = run_dates[-1]
+        with timed(self.stats, 'post_run'):
+            self.post_run(strategy)
@@ -0,0 +1,311 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class Indicator:
+    """
+    Stateful indicator computed for all tickers at once. The engine feeds
+    one price row per business date through update, so maintaining the
+    indicator costs O(number of tickers) per date instead of recomputing it
+    over the whole history. value holds the indicator of the latest row
+    and previous the one of the row before.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.columns = None
+        self.value = None
+        self.previous = None
+
+
+    def reset(self, columns: List[str]) -> None:
+        """
+        columns: tickers of the price rows passed to update
+        """
+        self.columns = pd.Index(columns)
+        size = len(self.columns)
+        self.value = np.full(size, np.nan)
+        self.previous = np.full(size, np.nan)
+        self._reset(size)
+
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        """
+        values: price row aligned with columns, nan where there is no price
+
+        returns the indicator value of the row
+        """
+        self.previous = self.value
+        self.value = self._update(np.asarray(values, dtype=np.float64))
+        return self.value
+
+
+    def get_value(self) -> pd.Series:
+        return pd.Series(self.value, index=self.columns)
+
+
+    def _reset(self, size: int) -> None:
+        raise NotImplementedError('This is an interface class. _reset method is NOT implemented')
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        raise NotImplementedError('This is an interface class. _update method is NOT implemented')
+
+
+class EMA(Indicator):
+    """
+    Exponential moving average, same as pandas ewm(...).mean() with
+    ignore_na=False. Exactly one of span, com and alpha is expected.
+    """
+
+    def __init__(self, span: float=None, com: float=None, alpha: float=None,
+            adjust: bool=False, min_periods: int=0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # same arithmetic as pandas so that both yield identical floats
+        if span is not None:
+            com = (span - 1) / 2.
+        elif alpha is not None:
+            com = 1. / alpha - 1.
+        elif com is None:
+            raise ValueError('one of span, com or alpha must be provided')
+        alpha = 1. / (1. + com)
+        self.old_weight_factor = 1. - alpha
+        self.new_weight = 1. if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+
+
+    def _reset(self, size: int) -> None:
+        self.average = np.full(size, np.nan)
+        self.old_weight = np.ones(size)
+        self.count = np.zeros(size, dtype=np.int64)
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        observed = values == values
+        self.count += observed
+        started = self.average == self.average
+        self.old_weight[started] *= self.old_weight_factor
+
+        changed = started & observed & (self.average != values)
+        old_weight = self.old_weight[changed]
+        self.average[changed] = (old_weight * self.average[changed] +
+                self.new_weight * values[changed]) / (old_weight + self.new_weight)
+        updated = started & observed
+        if self.adjust:
+            self.old_weight[updated] += self.new_weight
+        else:
+            self.old_weight[updated] = 1.
+
+        first = ~started & observed
+        self.average[first] = values[first]
+        return np.where(self.count >= self.min_periods, self.average, np.nan)
+
+
+class MACD(Indicator):
+    """
+    Moving average convergence divergence. macd is the fast minus the slow
+    EMA of prices, signal the EMA of macd, and value the difference of
+    macd and signal, whose sign change is the usual crossover signal.
+    """
+
+    def __init__(self, fast: int=12, slow: int=26, signal: int=9, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fast = EMA(span=fast)
+        self.slow = EMA(span=slow)
+        self.signal_ema = EMA(span=signal)
+        self.macd = None
+        self.signal = None
+
+
+    def _reset(self, size: int) -> None:
+        for ema in (self.fast, self.slow, self.signal_ema):
+            ema.reset(self.columns)
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        self.macd = self.fast.update(values) - self.slow.update(values)
+        self.signal = self.signal_ema.update(self.macd)
+        return self.macd - self.signal
+
+
+class _RollingWindow(Indicator):
+    """
+    Keeps the last window rows in a ring buffer, with the count of
+    observed values of each ticker over the window
+    """
+
+    def __init__(self, window: int, min_periods: int=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+
+
+    def _reset(self, size: int) -> None:
+        self.buffer = np.full((self.window, size), np.nan)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.rows = 0
+
+
+    def _push(self, values: np.ndarray) -> np.ndarray:
+        """
+        stores values in the ring buffer and returns the row it replaces
+        """
+        slot = self.rows % self.window
+        removed = self.buffer[slot].copy()
+        self.buffer[slot] = values
+        self.rows += 1
+        self.count += (values == values).astype(np.int64) - (removed == removed)
+        return removed
+
+
+class RollingMean(_RollingWindow):
+    """
+    Rolling mean over the last window rows, same as pandas
+    rolling(window, min_periods).mean()
+    """
+
+    def _reset(self, size: int) -> None:
+        super()._reset(size)
+        self.mean = np.zeros(size)
+        self.sum_of_squares = np.zeros(size)
+
+
+    def _update_moments(self, values: np.ndarray) -> None:
+        previous_count = self.count.astype(np.float64)
+        removed = self._push(values)
+        if self.rows % self.window == 0:
+            # recomputed from the buffer once per window to stop the
+            # rounding errors of the running updates from accumulating
+            count = np.maximum(self.count, 1)
+            self.mean = np.nansum(self.buffer, axis=0) / count
+            deviation = np.nan_to_num(self.buffer - self.mean)
+            self.sum_of_squares = (deviation * deviation).sum(axis=0)
+            return
+
+        # Welford updates, as in the pandas rolling variance: the dropped 
+        # row is taken out of the moments, then the new row is added
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dropped = removed == removed
+            count = previous_count - dropped
+            delta = removed - self.mean
+            self.mean = np.where(dropped, self.mean - delta / count, self.mean)
+            self.sum_of_squares = np.where(dropped, self.sum_of_squares -
+                    (count + 1) * delta * delta / count, self.sum_of_squares)
+            emptied = dropped & (count == 0)
+            self.mean[emptied], self.sum_of_squares[emptied] = 0., 0.
+
+            added = values == values
+            count = count + added
+            delta = values - self.mean
+            self.mean = np.where(added, self.mean + delta / count, self.mean)
+            self.sum_of_squares = np.where(added, self.sum_of_squares +
+                    (count - 1) * delta * delta / count, self.sum_of_squares)
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        self._update_moments(values)
+        return np.where(self.count >= max(self.min_periods, 1), self.mean, np.nan)
+
+
+class RollingStd(RollingMean):
+    """
+    Rolling standard deviation over the last window rows, same as pandas
+    rolling(window, min_periods).std(ddof)
+    """
+
+    def __init__(self, window: int, min_periods: int=None, ddof: int=1, *args, **kwargs):
+        super().__init__(window, min_periods, *args, **kwargs)
+        self.ddof = ddof
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        self._update_moments(values)
+        count = self.count
+        valid = (count >= max(self.min_periods, 1)) & (count > self.ddof)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.maximum(self.sum_of_squares / (count - self.ddof), 0.)
+        variance[count == 1] = 0.
+        return np.where(valid, np.sqrt(variance), np.nan)
+
+
+class _RollingExtremum(_RollingWindow):
+    """
+    Rolling maximum or minimum in O(1) amortized per row, using the
+    van Herk/Gil-Werman split of the rows into blocks of window rows: the
+    extremum of a window is the extremum of the suffix of the block it
+    starts in and of the prefix of the block it ends in. Suffixes are
+    computed once per completed block.
+    """
+
+    reduce = None
+
+    def _reset(self, size: int) -> None:
+        super()._reset(size)
+        self.prefix = np.full(size, np.nan)
+        self.suffixes = np.full((self.window, size), np.nan)
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        position = self.rows % self.window
+        self._push(values)
+        reduce = type(self).reduce
+        self.prefix = values.copy() if position == 0 else reduce(self.prefix, values)
+
+        if position == self.window - 1:
+            # the buffer holds exactly the completed block, in order
+            self.suffixes = reduce.accumulate(self.buffer[::-1], axis=0)[::-1]
+            extremum = self.prefix
+        else:
+            extremum = reduce(self.suffixes[position + 1], self.prefix)
+        return np.where(self.count >= max(self.min_periods, 1), extremum, np.nan)
+
+
+class RollingMax(_RollingExtremum):
+    """
+    Rolling maximum over the last window rows, same as pandas
+    rolling(window, min_periods).max()
+    """
+
+    reduce = np.fmax
+
+
+class RollingMin(_RollingExtremum):
+    """
+    Rolling minimum over the last window rows, same as pandas
+    rolling(window, min_periods).min()
+    """
+
+    reduce = np.fmin
+
+
+class RSI(Indicator):
+    """
+    Relative strength index with Wilder smoothing, the average gains and
+    losses being pandas ewm(alpha=1 / period, adjust=False) of the price
+    changes
+    """
+
+    def __init__(self, period: int=14, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.period = period
+        self.gain = EMA(alpha=1. / period)
+        self.loss = EMA(alpha=1. / period)
+
+
+    def _reset(self, size: int) -> None:
+        self.last_values = np.full(size, np.nan)
+        self.gain.reset(self.columns)
+        self.loss.reset(self.columns)
+
+
+    def _update(self, values: np.ndarray) -> np.ndarray:
+        change = values - self.last_values
+        self.last_values = values
+        average_gain = self.gain.update(np.where(change > 0, change,
+                np.where(change == change, 0., np.nan)))
+        average_loss = self.loss.update(np.where(change < 0, -change,
+                np.where(change == change, 0., np.nan)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 100. - 100. / (1. + average_gain / average_loss)
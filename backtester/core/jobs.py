@@ -0,0 +1,435 @@
+import argparse
+from collections import OrderedDict
+from datetime import date
+from hashlib import sha256
+import importlib
+import json
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import time
+import traceback
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.sweep import expand_grid, make_task, run_task
+from core.util import get_logger
+from data.data_manager import DataManager
+
+
+JOB_STATUSES = ['pending', 'running', 'done', 'failed']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT UNIQUE NOT NULL,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    claimed_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, job_id);
+CREATE TABLE IF NOT EXISTS results (
+    job_id INTEGER PRIMARY KEY REFERENCES jobs (job_id),
+    worker TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    metrics TEXT NOT NULL,
+    mtm BLOB
+);
+"""
+
+
+def strategy_path(strategy_class) -> str:
+    return '%s.%s' % (strategy_class.__module__, strategy_class.__qualname__)
+
+
+def load_strategy_class(path: str):
+    """
+    returns the strategy class of a dotted path, e.g.
+            strategies.simple_macd.SimpleMACD
+    """
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def resolve_universe(universe, universe_slice: List[int]=None) -> List[str]:
+    """
+    universe: list of tickers, or name of a list of security_universe,
+              e.g. top_1000_usa
+    universe_slice: optional [start, stop] positions of the tickers kept
+
+    returns list of tickers
+    """
+    if isinstance(universe, str):
+        universe = getattr(importlib.import_module('security_universe'), universe)
+    universe = list(universe)
+    if universe_slice is not None:
+        universe = universe[universe_slice[0]: universe_slice[1]]
+    return universe
+
+
+def make_job(strategy_class, params: Dict, universe, start_date: date, end_date: date,
+        universe_slice: List[int]=None, initial_cash: float=1000000.0,
+        seed: int=None) -> Dict:
+    """
+    Job spec, a JSON serializable description of one backtest
+
+    strategy_class: Strategy subclass or its dotted path
+    params: keyword arguments of the strategy, JSON serializable
+    universe, universe_slice: see resolve_universe, a list name keeps the
+                              spec small
+
+    returns dictionary of the job spec
+    """
+    if not isinstance(strategy_class, str):
+        strategy_class = strategy_path(strategy_class)
+    return {'strategy': strategy_class, 'params': params, 'universe': universe,
+            'universe_slice': None if universe_slice is None else list(universe_slice),
+            'start_date': pd.Timestamp(start_date).date().isoformat(),
+            'end_date': pd.Timestamp(end_date).date().isoformat(),
+            'initial_cash': initial_cash, 'seed': seed}
+
+
+def expand_jobs(strategy_class, param_grid: Dict[str, List], universe,
+        date_ranges: List[Tuple[date, date]], n_slices: int=1, **kwargs) -> List[Dict]:
+    """
+    returns the job specs of every parameter set, see core.sweep.expand_grid,
+            date range and slice of the universe, in that nesting order
+    """
+    size = len(resolve_universe(universe))
+    bounds = np.linspace(0, size, n_slices + 1).round().astype(int).tolist()
+    slices = [None] if n_slices == 1 else list(zip(bounds[:-1], bounds[1:]))
+    return [make_job(strategy_class, params, universe, start_date, end_date,
+            universe_slice=universe_slice, **kwargs)
+            for params in expand_grid(param_grid)
+            for start_date, end_date in date_ranges
+            for universe_slice in slices]
+
+
+def job_key(spec: Dict) -> str:
+    return sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class JobQueue:
+    """
+    Queue of backtest jobs and store of their results in a SQLite file,
+    e.g. on a directory shared by the worker nodes. Submitting is
+    idempotent, a spec already queued is not added again. A job is claimed
+    by one worker at a time in an immediate transaction, jobs whose worker
+    failed or did not report back within the lease are retried until they
+    ran max_attempts times.
+    """
+
+    def __init__(self, database_path: str, lease_seconds: float=3600., timeout: float=60.):
+        """
+        database_path: SQLite file of the queue, created if needed
+        lease_seconds: time a worker has to complete a claimed job before
+                       it is handed to another worker
+        timeout: seconds to wait for a lock held by another worker
+        """
+        self.database_path = database_path
+        self.lease_seconds = lease_seconds
+        self.timeout = timeout
+        self._conn = None
+        self.connection().executescript(SCHEMA)
+
+
+    def connection(self) -> sqlite3.Connection:
+        # transactions are managed explicitly, see _transaction
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.database_path, timeout=self.timeout,
+                    isolation_level=None)
+        return self._conn
+
+
+    def _transaction(self) -> sqlite3.Connection:
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+    def submit(self, specs: List[Dict], max_attempts: int=3) -> List[int]:
+        """
+        returns the job id of each spec, the existing one for specs
+                already submitted
+        """
+        conn = self._transaction()
+        try:
+            job_ids = []
+            for spec in specs:
+                key = job_key(spec)
+                conn.execute('INSERT OR IGNORE INTO jobs (job_key, spec, max_attempts) '
+                        'VALUES (?, ?, ?)', (key, json.dumps(spec, sort_keys=True), max_attempts))
+                job_ids.append(conn.execute('SELECT job_id FROM jobs WHERE job_key = ?',
+                        (key,)).fetchone()[0])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return job_ids
+
+
+    def claim(self, worker: str) -> Tuple[int, Dict]:
+        """
+        Claims the oldest pending job, or a running one whose lease expired
+
+        returns job id and spec, None when there is no job to claim
+        """
+        now = time.time()
+        conn = self._transaction()
+        try:
+            # a job out of attempts is failed instead of claimed again
+            conn.execute("UPDATE jobs SET status = 'failed', error = "
+                    "coalesce(error, 'lease expired') WHERE status = 'running' AND "
+                    "claimed_at < ? AND attempts >= max_attempts", (now - self.lease_seconds,))
+            row = conn.execute("SELECT job_id, spec FROM jobs WHERE status = 'pending' "
+                    "OR (status = 'running' AND claimed_at < ?) ORDER BY job_id LIMIT 1",
+                    (now - self.lease_seconds,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', worker = ?, "
+                        "claimed_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                        (worker, now, row[0]))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return None if row is None else (row[0], json.loads(row[1]))
+
+
+    def complete(self, job_id: int, worker: str, metrics: Dict, mtm: pd.Series=None) -> bool:
+        """
+        Stores the result of a job claimed by worker
+
+        returns False if the job was handed to another worker meanwhile,
+                the result is then dropped
+        """
+        conn = self._transaction()
+        try:
+            updated = conn.execute("UPDATE jobs SET status = 'done', error = NULL "
+                    "WHERE job_id = ? AND worker = ? AND status = 'running'",
+                    (job_id, worker)).rowcount
+            if updated:
+                conn.execute('INSERT OR REPLACE INTO results (job_id, worker, finished_at, '
+                        'metrics, mtm) VALUES (?, ?, ?, ?, ?)', (job_id, worker, time.time(),
+                        json.dumps(metrics), None if mtm is None else pickle.dumps(mtm)))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return bool(updated)
+
+
+    def fail(self, job_id: int, worker: str, error: str) -> None:
+        """
+        Records the error of a job claimed by worker, the job is pending
+        again until it ran max_attempts times
+        """
+        conn = self._transaction()
+        try:
+            conn.execute("UPDATE jobs SET error = ?, status = CASE WHEN attempts < "
+                    "max_attempts THEN 'pending' ELSE 'failed' END WHERE job_id = ? "
+                    "AND worker = ? AND status = 'running'", (error, job_id, worker))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+
+    def status(self) -> pd.Series:
+        """
+        returns the number of jobs per status
+        """
+        counts = dict(self.connection().execute(
+                'SELECT status, count(*) FROM jobs GROUP BY status').fetchall())
+        return pd.Series([counts.get(status, 0) for status in JOB_STATUSES],
+                index=JOB_STATUSES)
+
+
+    def jobs(self) -> pd.DataFrame:
+        """
+        returns one row per job with its status, attempts, worker and error
+        """
+        return pd.read_sql_query('SELECT job_id, status, attempts, max_attempts, '
+                'worker, error, spec FROM jobs ORDER BY job_id',
+                self.connection()).set_index('job_id')
+
+
+    def results(self) -> pd.DataFrame:
+        """
+        returns one row per completed job, indexed by job id, with the
+                strategy, universe and dates of its spec, the strategy
+                parameters, then the metrics of the run and its worker
+        """
+        rows = self.connection().execute('SELECT jobs.job_id, spec, results.worker, '
+                'metrics FROM results JOIN jobs ON jobs.job_id = results.job_id '
+                'ORDER BY jobs.job_id').fetchall()
+        records = []
+        for job_id, spec, worker, metrics in rows:
+            spec = json.loads(spec)
+            record = OrderedDict([('job_id', job_id), ('strategy', spec['strategy']),
+                    ('universe', spec['universe'] if isinstance(spec['universe'], str)
+                            else len(spec['universe'])),
+                    ('universe_slice', spec['universe_slice']),
+                    ('start_date', spec['start_date']), ('end_date', spec['end_date'])])
+            record.update(spec['params'])
+            record['worker'] = worker
+            record.update(json.loads(metrics))
+            records.append(record)
+        # parameters of different strategies are merged, in order of appearance
+        columns = ['job_id', 'strategy', 'universe', 'universe_slice', 'start_date',
+                'end_date']
+        for record in records:
+            columns.extend(name for name in record if name not in columns)
+        return pd.DataFrame(records, columns=columns).set_index('job_id')
+
+
+    def get_mtm(self, job_id: int) -> pd.Series:
+        """
+        returns the portfolio value serie of a completed job
+        """
+        row = self.connection().execute('SELECT mtm FROM results WHERE job_id = ?',
+                (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            raise KeyError('No result for job %s' % job_id)
+        return pickle.loads(row[0])
+
+
+class Worker:
+    """
+    Runs jobs of a JobQueue one after the other. The worker keeps one
+    DataManager, with its price and fundamental caches and database
+    connections, and the dataframes of its last data loads across jobs, so
+    a job over a universe and period already loaded does not load it again.
+    """
+
+    def __init__(self, queue: JobQueue, worker_id: str=None,
+            data_manager: DataManager=None, load_data: Callable=None,
+            cache_size: int=4, logger=None):
+        """
+        worker_id: name of the worker in the queue, host and process id by
+                   default
+        load_data: callable(universe, start_date, end_date, strategy)
+                   returning the dataframes of a job, same layout as
+                   DataManager.DATAFRAMES. Loads through data_manager by
+                   default
+        cache_size: number of data loads kept in memory
+        """
+        self.queue = queue
+        self.worker_id = worker_id or '%s:%d' % (socket.gethostname(), os.getpid())
+        self.data_manager = data_manager or DataManager()
+        self.load_data = load_data or self._load_from_data_manager
+        self.cache_size = cache_size
+        self.data_cache = OrderedDict()
+        self.logger = logger or get_logger('backtester worker', logging.INFO)
+
+
+    def _load_from_data_manager(self, universe: List[str], start_date: date,
+            end_date: date, strategy) -> Dict[str, pd.DataFrame]:
+        self.data_manager.setup(start_date=start_date, end_date=end_date,
+                universe=universe, strategy=strategy)
+        return dict(self.data_manager.DATAFRAMES)
+
+
+    def get_data(self, universe: List[str], start_date: date, end_date: date,
+            strategy) -> Dict[str, pd.DataFrame]:
+        """
+        returns the dataframes covering the data window of strategy before
+                start_date up to end_date, from memory when a previous load
+                of the same universe, fields and benchmark covers them
+        """
+        key = (tuple(universe), tuple(sorted(strategy.required_fields())), strategy.benchmark)
+        data_start_date = Engine.get_data_start_date(start_date, strategy)
+        entry = self.data_cache.get(key)
+        if entry is not None and entry[0] <= data_start_date and entry[1] >= end_date:
+            self.data_cache.move_to_end(key)
+            return entry[2]
+        if entry is not None:
+            # the next job will likely fall within the union of both periods
+            data_start_date, end_date = min(entry[0], data_start_date), max(entry[1], end_date)
+        data = self.load_data(universe, data_start_date, end_date, strategy)
+        self.data_cache[key] = (data_start_date, end_date, data)
+        self.data_cache.move_to_end(key)
+        while len(self.data_cache) > self.cache_size:
+            self.data_cache.popitem(last=False)
+        return data
+
+
+    def run_job(self, spec: Dict) -> Dict:
+        """
+        returns the result of a job spec, see core.sweep.run_task
+        """
+        strategy_class = load_strategy_class(spec['strategy'])
+        universe = resolve_universe(spec['universe'], spec['universe_slice'])
+        start_date = pd.Timestamp(spec['start_date']).date()
+        end_date = pd.Timestamp(spec['end_date']).date()
+        data = self.get_data(universe, start_date, end_date, strategy_class(**spec['params']))
+        if data.get('benchmark') is not None:
+            # the engine adds the portfolio value to the benchmark dataframe
+            data = dict(data, benchmark=data['benchmark'].copy())
+        task = make_task(strategy_class, spec['params'], start_date, end_date,
+                initial_cash=spec['initial_cash'], seed=spec['seed'], return_mtm=True)
+        return run_task(task, data)
+
+
+    def run(self, max_jobs: int=None, wait: bool=False, poll_interval: float=5.) -> int:
+        """
+        Claims and runs jobs until the queue has none left to claim
+
+        max_jobs: stop after this many jobs
+        wait: keep polling the queue every poll_interval seconds instead of
+              stopping when it is empty
+
+        returns the number of jobs run
+        """
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            claimed = self.queue.claim(self.worker_id)
+            if claimed is None:
+                if not wait:
+                    break
+                time.sleep(poll_interval)
+                continue
+            job_id, spec = claimed
+            count += 1
+            try:
+                result = self.run_job(spec)
+            except Exception:
+                self.logger.warning('job %s failed', job_id)
+                self.queue.fail(job_id, self.worker_id, traceback.format_exc())
+                continue
+            mtm = result.pop('mtm')
+            metrics = {name: None if value is None or value != value else float(value)
+                    for name, value in result.items()}
+            if not self.queue.complete(job_id, self.worker_id, metrics, mtm):
+                self.logger.warning('job %s was handed to another worker', job_id)
+        return count
+
+
+if __name__ == '__main__':
+    # run as python -m core.jobs, core/calendar.py would shadow the calendar module
+    parser = argparse.ArgumentParser(description='backtest job queue')
+    parser.add_argument('command', choices=['work', 'status'])
+    parser.add_argument('queue', help='SQLite file of the queue')
+    parser.add_argument('--wait', action='store_true',
+            help='keep polling for new jobs once the queue is empty')
+    parser.add_argument('--max-jobs', type=int)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == 'work':
+        Worker(queue).run(max_jobs=args.max_jobs, wait=args.wait)
+    print(queue.status().to_string())
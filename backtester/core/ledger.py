@@ -0,0 +1,82 @@
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class Ledger:
+    """
+    Portfolio book of the engine. Positions are kept in a dense vector
+    aligned with the price columns so that marking the portfolio to market
+    is a single dot product against the price row of the day. Daily MTM
+    values are written into a preallocated buffer and only turned into a
+    pandas Series once the run is over. Prices can be float32 under a
+    compact data.dtypes.DtypePolicy, positions, cash and MTM stay float64.
+    """
+
+    def __init__(self, tickers: List[str], initial_cash: float,
+            size: int=0, *args, **kwargs):
+        """
+        tickers: columns of the price dataframe, positions are aligned to them
+        initial_cash: cash available at the start of the backtest
+        size: expected number of MTM observations, normally the number of
+              business dates of the backtest period
+        """
+        self.tickers = pd.Index(tickers)
+        self.ticker_index = {ticker: idx for idx, ticker in enumerate(self.tickers)}
+        self.positions = np.zeros(len(self.tickers), dtype=np.float64)
+        self.cash = initial_cash
+        self.mtm_values = np.empty(max(size, 1), dtype=np.float64)
+        self.mtm_dates = np.empty(max(size, 1), dtype='datetime64[ns]')
+        self.mtm_count = 0
+
+
+    def add(self, ticker: str, quantity: float, price: float) -> None:
+        self.positions[self.ticker_index[ticker]] += quantity
+        self.cash -= price * quantity
+
+
+    def add_many(self, columns: np.ndarray, quantities: np.ndarray,
+            prices: np.ndarray) -> None:
+        """
+        Books several fills at once, quantities of the same ticker are netted
+
+        columns: position of the ticker of each fill in tickers
+        quantities: quantity of each fill
+        prices: price of each fill
+        """
+        self.positions += np.bincount(columns, weights=quantities,
+                minlength=self.positions.shape[0])
+        self.cash -= np.dot(prices, quantities)
+
+
+    def get_position(self) -> Dict[str, float]:
+        """
+        returns dictionary of ticker to quantity for all non-zero positions
+        """
+        held = np.flatnonzero(self.positions)
+        return {self.tickers[idx]: self.positions[idx] for idx in held}
+
+
+    def mark_to_market(self, as_of_date: date, prices: np.ndarray) -> float:
+        """
+        as_of_date: date the MTM value is recorded for
+        prices: price row aligned with the ledger tickers
+        """
+        # prices of tickers we do not hold can be nan (not listed yet)
+        held_prices = np.where(self.positions != 0, prices, 0)
+        mtm = round(self.cash + np.dot(self.positions, held_prices), 4)
+
+        if self.mtm_count == self.mtm_values.shape[0]:
+            self.mtm_values = np.resize(self.mtm_values, 2 * self.mtm_count)
+            self.mtm_dates = np.resize(self.mtm_dates, 2 * self.mtm_count)
+        self.mtm_values[self.mtm_count] = mtm
+        self.mtm_dates[self.mtm_count] = np.datetime64(pd.Timestamp(as_of_date), 'ns')
+        self.mtm_count += 1
+        return mtm
+
+
+    def get_mtm(self) -> pd.Series:
+        return pd.Series(self.mtm_values[: self.mtm_count].copy(),
+                index=pd.DatetimeIndex(self.mtm_dates[: self.mtm_count]))
@@ -0,0 +1,184 @@
+from datetime import date
+import heapq
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.order import Order
+from core.trade import Trade
+
+
+class OrderBook:
+    """
+    Resting limit orders of the backtest, indexed per ticker. Buy orders
+    sit in a max heap and sell orders in a min heap of limit prices, ties
+    filled in order of arrival. The best bid and ask of every ticker are
+    mirrored in arrays so the tickers whose best order crosses the day's
+    price are found with one vectorized comparison, and only the orders
+    that fill are then touched.
+
+    Cancelled and expired orders are dropped lazily, when they reach the
+    top of their heap. The cancelled orders dropped are kept until they
+    are collected with pop_cancelled.
+    """
+
+    def __init__(self, columns: List[str], max_fill_quantity: float=None):
+        """
+        columns: tickers of the price rows passed to match
+        max_fill_quantity: maximum number of shares filled per ticker, per
+                side and per day, orders beyond it are partially filled and
+                keep resting. Unlimited if not provided
+        """
+        self.columns = pd.Index(columns)
+        self.column_index = {ticker: idx for idx, ticker in enumerate(self.columns)}
+        self.max_fill_quantity = np.inf if max_fill_quantity is None else max_fill_quantity
+        self._bids = [[] for _ in range(len(self.columns))]
+        self._asks = [[] for _ in range(len(self.columns))]
+        self.best_bid = np.full(len(self.columns), -np.inf)
+        self.best_ask = np.full(len(self.columns), np.inf)
+        self._expiries = []
+        self._cancelled = []
+        self._sequence = 0
+
+
+    def __len__(self) -> int:
+        """
+        returns the number of resting orders, including the cancelled ones
+        not dropped yet
+        """
+        return sum(len(heap) for heaps in (self._bids, self._asks) for heap in heaps)
+
+
+    def add(self, order: Order) -> None:
+        if order.order_type != 'lmt':
+            raise ValueError('only limit orders rest in the order book, got %s'
+                    % order.order_type)
+        idx = self.column_index[order.ticker]
+        self._sequence += 1
+        if order.quantity > 0:
+            heapq.heappush(self._bids[idx], (-order.price, self._sequence, order))
+            self.best_bid[idx] = max(self.best_bid[idx], order.price)
+        else:
+            heapq.heappush(self._asks[idx], (order.price, self._sequence, order))
+            self.best_ask[idx] = min(self.best_ask[idx], order.price)
+        if order.expiry_date is not None:
+            heapq.heappush(self._expiries,
+                    (pd.Timestamp(order.expiry_date), self._sequence, order))
+
+
+    def cancel(self, order: Order) -> None:
+        order.cancel()
+        idx = self.column_index[order.ticker]
+        # a cancelled best order no longer sets the best bid or ask
+        if order.quantity > 0:
+            self.best_bid[idx] = self._drop_inactive(self._bids[idx], True)
+        else:
+            self.best_ask[idx] = self._drop_inactive(self._asks[idx], False)
+
+
+    def drop_cancelled(self) -> None:
+        """
+        Drops every cancelled order from the book, not only the ones on top
+        of their heap. Costs a pass over all resting orders
+        """
+        for heaps, buy in ((self._bids, True), (self._asks, False)):
+            best = self.best_bid if buy else self.best_ask
+            for idx, heap in enumerate(heaps):
+                cancelled = [order for _, _, order in heap if order.status == 'cancelled']
+                if cancelled:
+                    self._cancelled.extend(cancelled)
+                    heap[:] = [entry for entry in heap if entry[2].status != 'cancelled']
+                    heapq.heapify(heap)
+                    best[idx] = self._drop_inactive(heap, buy)
+
+
+    def pop_cancelled(self) -> List[Order]:
+        """
+        returns the cancelled orders dropped from the book since the last
+        call, the ones still resting are returned once they are dropped
+        """
+        cancelled, self._cancelled = self._cancelled, []
+        return cancelled
+
+
+    def expire(self, as_of_date: date) -> List[Order]:
+        """
+        Expires the pending orders whose expiry date is before as_of_date
+
+        returns the expired orders
+        """
+        as_of_date = pd.Timestamp(as_of_date)
+        expired = []
+        while self._expiries and self._expiries[0][0] < as_of_date:
+            order = heapq.heappop(self._expiries)[2]
+            if order.status == 'pending':
+                order.expire()
+                expired.append(order)
+        return expired
+
+
+    def match(self, prices: np.ndarray, trade_date: date) -> Tuple[List[Trade], List[Order]]:
+        """
+        Fills the orders crossed by the day's prices: buy orders limited at
+        or above the price and sell orders limited at or below it, at the
+        day's price.
+
+        prices: price row aligned with columns, nan where there is no price
+        trade_date: date of the fills
+
+        returns the trades and the orders completely filled
+        """
+        with np.errstate(invalid='ignore'):
+            crossed = np.flatnonzero((self.best_bid >= prices) | (self.best_ask <= prices))
+
+        trades, filled = [], []
+        for idx in crossed:
+            price = prices[idx]
+            self.best_bid[idx] = self._fill(self._bids[idx], True, price,
+                    trade_date, trades, filled)
+            self.best_ask[idx] = self._fill(self._asks[idx], False, price,
+                    trade_date, trades, filled)
+        return trades, filled
+
+
+    def _fill(self, heap: list, buy: bool, price: float, trade_date: date,
+            trades: List[Trade], filled: List[Order]) -> float:
+        """
+        heap: bid heap keyed by negated limit prices, or ask heap
+
+        returns the new best limit price of the heap
+        """
+        capacity = self.max_fill_quantity
+        while heap:
+            key, _, order = heap[0]
+            if order.status != 'pending':
+                self._drop_inactive(heap, buy)
+                continue
+            limit = -key if buy else key
+            if capacity <= 0 or (limit < price if buy else limit > price):
+                break
+            quantity = min(abs(order.remaining_quantity), capacity)
+            capacity -= quantity
+            trades.append(order.fill(price=price, trade_date=trade_date,
+                    quantity=quantity if buy else -quantity))
+            if order.status == 'filled':
+                heapq.heappop(heap)
+                filled.append(order)
+        return self._drop_inactive(heap, buy)
+
+
+    def _drop_inactive(self, heap: list, buy: bool) -> float:
+        """
+        Pops the orders no longer pending from the top of heap, keeping the
+        cancelled ones for pop_cancelled
+
+        returns the new best limit price of the heap
+        """
+        while heap and heap[0][2].status != 'pending':
+            order = heapq.heappop(heap)[2]
+            if order.status == 'cancelled':
+                self._cancelled.append(order)
+        if not heap:
+            return -np.inf if buy else np.inf
+        return -heap[0][0] if buy else heap[0][0]
@@ -0,0 +1,196 @@
+from collections import OrderedDict
+from datetime import date
+import logging
+import time
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from core.batch_metrics import compute_metrics
+from core.calendar import Calendar
+from core.engine import Engine
+from core.util import get_logger
+from data.data_manager import DataManager
+
+
+class _CombinedRequirements:
+    """
+    The part of a strategy DataManager.setup reads, merged over strategies
+    """
+
+    def __init__(self, strategies: List):
+        benchmarks = {strategy.benchmark for strategy in strategies} - {None}
+        if len(benchmarks) > 1:
+            raise ValueError('Strategies use different benchmarks %s, provide '
+                    'the data instead' % sorted(benchmarks))
+        self.benchmark = benchmarks.pop() if benchmarks else None
+        self.fields = sorted(set().union(*(strategy.required_fields()
+                for strategy in strategies)))
+
+
+    def required_fields(self) -> List[str]:
+        return self.fields
+
+
+class MultiStrategyEngine:
+    """
+    Runs several strategies in a single pass over the data. Each strategy
+    trades its own sub-ledger, an Engine holding its share of the capital,
+    while the market data is loaded once and every day's snapshot is built
+    once per distinct data window size and handed to all strategies due to
+    rebalance. Strategies must not modify the data they are handed, it is
+    shared with the other strategies.
+    """
+
+    def __init__(self, universe: List[str], start_date: date,
+        end_date: date=None, initial_cash: float=1000000.0,
+        calendar=None, logger=None, max_fill_quantity: float=None,
+        dtype_policy=None, *args, **kwargs):
+        """
+        initial_cash: capital of all the strategies, split according to the
+                allocations given to run
+        other parameters: see core.engine.Engine
+        """
+        self.universe = sorted(universe)
+        self.start_date = start_date
+        self.end_date = end_date or date.today()
+        self.initial_cash = initial_cash
+        self.calendar = calendar
+        self.max_fill_quantity = max_fill_quantity
+        self.data_manager = DataManager(dtype_policy=dtype_policy)
+        self.engines = OrderedDict()
+        self.mtm = None
+        self.metrics = None
+        self.logger = logger or get_logger('backtester engine', logging.INFO)
+
+
+    @staticmethod
+    def get_allocations(names: List[str], allocations=None) -> Dict[str, float]:
+        """
+        names: names of the strategies
+        allocations: dictionary of name to fraction of the initial cash, or
+                list of fractions in strategy order. None splits the cash
+                equally. Fractions summing to less than one leave the rest
+                as cash of the aggregate portfolio
+
+        returns dictionary of name to fraction of the initial cash
+        """
+        if allocations is None:
+            return OrderedDict((name, 1. / len(names)) for name in names)
+        if not isinstance(allocations, dict):
+            allocations = dict(zip(names, allocations))
+        if set(allocations) != set(names):
+            raise ValueError('Allocations must be given for strategies %s' % names)
+        if any(fraction < 0 for fraction in allocations.values()) or \
+                sum(allocations.values()) > 1 + 1e-12:
+            raise ValueError('Allocations must be positive and sum to at most one')
+        return OrderedDict((name, allocations[name]) for name in names)
+
+
+    def initialize(self, strategies: Dict, data: Dict[str, pd.DataFrame]=None,
+            allocations=None):
+        largest = max(strategies.values(), key=lambda s: s.data_window_size)
+        if data is None:
+            # the loaded history covers the largest window
+            data_start_date = Engine.get_data_start_date(self.start_date, largest)
+            self.data_manager.setup(start_date=data_start_date, 
+                    strategy=_CombinedRequirements(list(strategies.values())),
+                    end_date=self.end_date, universe=self.universe)
+        else:
+            self.data_manager.set_dataframes(data)
+        self.data_manager.create_feed(window_size=largest.data_window_size)
+        if self.calendar is None:
+            self.calendar = Calendar(self.data_manager.DATAFRAMES['price'].index)
+
+        # one feed per distinct window size, all over the same arrays
+        data_managers = {}
+        for strategy in strategies.values():
+            if strategy.data_window_size not in data_managers:
+                data_managers[strategy.data_window_size] = \
+                        self.data_manager.with_window_size(strategy.data_window_size)
+
+        logger = self.logger.getChild('strategy')
+        logger.setLevel(logging.WARNING)
+        self.engines = OrderedDict()
+        for name, fraction in self.get_allocations(list(strategies), allocations).items():
+            strategy = strategies[name]
+            engine = Engine(universe=self.universe, start_date=self.start_date,
+                    end_date=self.end_date, initial_cash=self.initial_cash * fraction,
+                    calendar=self.calendar, logger=logger, generate_report=False,
+                    max_fill_quantity=self.max_fill_quantity)
+            engine.data_manager = data_managers[strategy.data_window_size]
+            engine.reset_run(strategy)
+            self.engines[name] = engine
+        self.feeds = [data_manager.feed for data_manager in data_managers.values()]
+        self.current_date = self.calendar.roll(self.start_date, roll='forward')
+
+
+    def run(self, strategies: Union[List, Dict], data: Dict[str, pd.DataFrame]=None,
+            allocations=None):
+        """
+        strategies: list of objects implementing Strategy, or dictionary of
+             name to strategy. Listed strategies are named after their class
+             and position, e.g. SimpleMACD_0
+        data: same as in core.engine.Engine.run. If not provided it is built
+             from the SQL database with the fields required by any of the
+             strategies, which then have to share their benchmark
+        allocations: fraction of the initial cash of each strategy, see
+             get_allocations
+
+        Results of each strategy are held by its Engine in engines. mtm has
+        one portfolio value column per strategy followed by their total,
+        metrics has the core.batch_metrics.METRICS of every column of mtm.
+        """
+        self.run_start_time = time.time()
+        self.logger.info('start multi strategy backtest run')
+        if not isinstance(strategies, dict):
+            strategies = OrderedDict(('%s_%d' % (type(strategy).__name__, idx), strategy)
+                    for idx, strategy in enumerate(strategies))
+        if not strategies:
+            raise ValueError('No strategy to run')
+        self.initialize(strategies, data, allocations)
+
+        sleeves = [(engine, strategies[name], engine.data_manager.feed)
+                for name, engine in self.engines.items()]
+        feeds, prices_feed = self.feeds, self.feeds[0]
+        while self.current_date.date() < self.end_date:
+
+            for feed in feeds:
+                feed.seek(self.current_date)
+            prices = prices_feed.current_prices()
+            for engine, strategy, _ in sleeves:
+                engine.current_date = self.current_date
+                if strategy.indicators:
+                    strategy.update_indicators(prices)
+                engine.execute_trades()
+                engine.post_trade()
+
+            # the snapshot of a window size is built at most once a day
+            snapshots = {}
+            for engine, strategy, feed in sleeves:
+                if engine.scheduler.is_rebalance_date(self.current_date):
+                    data = snapshots.get(feed.window_size)
+                    if data is None:
+                        data = snapshots[feed.window_size] = feed.get_market_data()
+                    new_orders = strategy.digest(data=data, cash=engine.cash,
+                        current_date=self.current_date, position=engine.position)
+                    engine.submit_orders(new_orders)
+
+            self.current_date = self.calendar.next_business_date(self.current_date)
+
+        self.post_run(strategies)
+
+
+    def post_run(self, strategies: Dict):
+        mtm = OrderedDict()
+        for name, engine in self.engines.items():
+            engine.run_start_time = self.run_start_time
+            engine.post_run(strategies[name])
+            mtm[name] = engine.ledger.get_mtm()
+        self.mtm = pd.DataFrame(mtm)
+        unallocated = self.initial_cash - sum(engine.initial_cash
+                for engine in self.engines.values())
+        self.mtm['total'] = self.mtm.sum(axis=1) + unallocated
+        self.metrics = compute_metrics(self.mtm)
+        self.run_duration = time.time() - self.run_start_time
+        self.logger.info('completed multi strategy backtest run')
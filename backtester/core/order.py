@@ -1,35 +1,70 @@
 from datetime import date
 
-import pandas as pd
-
 from core.trade import Trade
 
 class Order:
 
+    __slots__ = ('ticker', 'order_type', 'quantity', 'filled_quantity', 'price',
+                 'order_date', 'expiry_date', 'trade_date', 'status')
+
     def __init__(self, ticker: str, quantity: int, order_date: date, 
-                order_type='mkt', price: float=None):
+                order_type='mkt', price: float=None, expiry_date: date=None):
         """
+        order_date: date the order is placed on, the engine moves it to the 
+                next business date of its calendar, when the order is 
+                first executed
         order_type: accepts one of ['lmt', 'mkt'] order type
-        price: when order_type is 'mkt', price is ignored
+        price: limit price, when order_type is 'mkt', price is ignored
+        expiry_date: last date a limit order can be filled on, the order
+                rests until filled or cancelled if not provided
         """
+        if order_type == 'lmt' and price is None:
+            raise ValueError('limit order on %s requires a price' % ticker)
         self.ticker = ticker
         self.order_type = order_type
         self.quantity = quantity    # use negative value to represent short
+        self.filled_quantity = 0
         self.price = price if order_type == 'lmt' else None
-        self.order_date = self._next_business_date(order_date)
+        self.order_date = order_date
+        self.expiry_date = expiry_date
         self.trade_date = None
         self.status = 'pending'
 
 
-    def _next_business_date(self, current_business_date: date):
-        return (current_business_date + pd.offsets.BDay()).date()
+    @property
+    def remaining_quantity(self):
+        return self.quantity - self.filled_quantity
 
 
-    def fill(self, price, trade_date) -> Trade:
+    def apply_fill(self, price, trade_date, quantity=None):
+        """
+        Updates the order state for a fill without creating the Trade, used
+        by the engine which books fills in its blotter
+
+        quantity: quantity filled, with the sign of the order quantity. The
+                whole remaining quantity is filled if not provided, the order
+                stays pending after a partial fill
+
+        returns the quantity filled
+        """
+        if quantity is None:
+            quantity = self.remaining_quantity
         self.trade_date = trade_date
-        self.price = price
-        self.status = 'filled'
-        return Trade(price=self.price, quantity=self.quantity, 
+        # a limit order keeps its limit price across partial fills
+        if self.order_type != 'lmt':
+            self.price = price
+        self.filled_quantity += quantity
+        if self.filled_quantity == self.quantity:
+            self.status = 'filled'
+        return quantity
+
+
+    def fill(self, price, trade_date, quantity=None) -> Trade:
+        """
+        same as apply_fill, returns the Trade of the fill
+        """
+        quantity = self.apply_fill(price, trade_date, quantity)
+        return Trade(price=price, quantity=quantity, 
                     ticker=self.ticker, trade_date=trade_date)
 
 
@@ -37,5 +72,13 @@ class Order:
         self.status = 'cancelled'
 
 
+    def expire(self) -> None:
+        self.status = 'expired'
+
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
     def __str__(self):
-        return ', '.join('%s: %s' % (key, val) for key, val in vars(self).items())
\ No newline at end of file
+        return ', '.join('%s: %s' % (key, val) for key, val in self.to_dict().items())
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+
+class _NullPhase:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def timed(stats, name: str):
+    """
+    returns a context manager timing its block as phase name of stats, a
+    shared no-op one when stats is None
+    """
+    return _NULL_PHASE if stats is None else stats.phase(name)
+
+
+class _Phase:
+
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+class RunStats:
+    """
+    Call counts and cumulative time of the phases of a run, optionally
+    broken down per simulated day and recorded as trace events. The engine
+    only creates one when profiling is enabled, so a run without profiling
+    does not pay for it.
+    """
+
+    def __init__(self, per_day: bool=True, trace: bool=False):
+        """
+        per_day: also accumulate the time of every phase per simulated day
+        trace: record one event per phase call, see export_chrome_trace
+        """
+        self.per_day = per_day
+        self.trace = trace
+        self.counts = OrderedDict()
+        self.totals = OrderedDict()
+        self.maxima = OrderedDict()
+        self.days = []
+        self.day_totals = []
+        self.events = []
+        self.origin = time.perf_counter()
+
+
+    def add(self, name: str, start: float, end: float) -> None:
+        """
+        records a call of phase name from start to end, in perf_counter seconds
+        """
+        elapsed = end - start
+        if name in self.counts:
+            self.counts[name] += 1
+            self.totals[name] += elapsed
+            if elapsed > self.maxima[name]:
+                self.maxima[name] = elapsed
+        else:
+            self.counts[name] = 1
+            self.totals[name] = elapsed
+            self.maxima[name] = elapsed
+        if self.per_day and self.day_totals:
+            day = self.day_totals[-1]
+            day[name] = day.get(name, 0.) + elapsed
+        if self.trace:
+            self.events.append((name, start, elapsed))
+
+
+    def phase(self, name: str) -> _Phase:
+        """
+        returns a context manager timing its block as phase name
+        """
+        return _Phase(self, name)
+
+
+    def wrap(self, name: str, function: Callable) -> Callable:
+        """
+        returns function timed as phase name on every call
+        """
+        add = self.add
+        perf_counter = time.perf_counter
+
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(name, start, perf_counter())
+        return timed_function
+
+
+    def start_day(self, current_date) -> None:
+        """
+        starts the per day breakdown of current_date, phases recorded until
+        the next call are attributed to it
+        """
+        if self.per_day:
+            self.days.append(current_date)
+            self.day_totals.append({})
+
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        returns one row per phase, in order of first call, with the number
+        of calls, total, mean and maximum seconds
+        """
+        summary = pd.DataFrame({'calls': pd.Series(self.counts),
+                'total': pd.Series(self.totals), 'max': pd.Series(self.maxima)},
+                index=list(self.counts), columns=['calls', 'total', 'max'])
+        summary.insert(2, 'mean', summary['total'] / summary['calls'])
+        return summary
+
+
+    def per_day_dataframe(self) -> pd.DataFrame:
+        """
+        returns simulated days x phases seconds spent
+        """
+        return pd.DataFrame(self.day_totals, index=pd.DatetimeIndex(self.days, name='date'),
+                columns=list(self.counts)).fillna(0.)
+
+
+    def export_chrome_trace(self, file_path: str) -> None:
+        """
+        writes the recorded events as Chrome trace event JSON, which
+        chrome://tracing and Perfetto open
+        """
+        pid, tid = os.getpid(), threading.get_ident()
+        events = [{'name': name, 'cat': 'backtester', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - self.origin) * 1e6, 'dur': elapsed * 1e6}
+                for name, start, elapsed in self.events]
+        with open(file_path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+
+
+    @classmethod
+    def combine(cls, stats: List['RunStats']) -> pd.DataFrame:
+        """
+        returns the phase summary of several runs, e.g. of a sweep, with the
+        calls and total seconds summed and the maximum over runs
+        """
+        summaries = [item.to_dataframe() for item in stats]
+        if not summaries:
+            return pd.DataFrame(columns=['calls', 'total', 'mean', 'max'])
+        combined = pd.concat(summaries).groupby(level=0, sort=False).agg(
+                {'calls': 'sum', 'total': 'sum', 'max': 'max'})
+        combined.insert(2, 'mean', combined['total'] / combined['calls'])
+        return combined
+
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        returns total seconds of every phase keyed by phase name
+        """
+        return dict(self.totals)
@@ -1,67 +1,212 @@
-import os
 from datetime import date, datetime
+import json
+import os
+import tempfile
+import threading
+from typing import Dict
 
-from fpdf import FPDF
-import matplotlib.pyplot as plt
 import numpy as np
-from pandas.plotting import register_matplotlib_converters
 import pandas as pd
 
 
+_REPORT_EXECUTOR = None
+_REPORT_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_report_executor():
+    """
+    returns the single worker thread executor reports are submitted to by
+    default, so a run never waits for its report
+    """
+    # concurrent.futures imports multiprocessing, only paid for by reports
+    from concurrent.futures import ThreadPoolExecutor
+
+    global _REPORT_EXECUTOR
+    with _REPORT_EXECUTOR_LOCK:
+        if _REPORT_EXECUTOR is None:
+            _REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+    return _REPORT_EXECUTOR
+
+
+def save_results(results: Dict, file_path: str) -> None:
+    """
+    saves the results of Engine.get_results, a report can then be
+    generated later, or in another process, with load_results
+    """
+    pd.to_pickle(results, file_path)
+
+
+def load_results(file_path: str) -> Dict:
+    return pd.read_pickle(file_path)
+
+
+def summarize_trades(trades: pd.DataFrame) -> pd.DataFrame:
+    """
+    trades: one row per fill with ticker, quantity and price columns, see
+            core.blotter.Blotter.to_dataframe
+
+    returns one row per ticker with the number of fills, quantity bought,
+            quantity sold, net quantity, value traded and volume weighted
+            average price
+    """
+    columns = ['trades', 'bought', 'sold', 'net_quantity', 'traded_value', 'vwap']
+    if trades.shape[0] == 0:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='ticker'))
+    quantity = trades['quantity'].values
+    traded = pd.DataFrame({
+            'ticker': trades['ticker'].values,
+            'trades': 1,
+            'bought': np.where(quantity > 0, quantity, 0.),
+            'sold': np.where(quantity < 0, -quantity, 0.),
+            'net_quantity': quantity,
+            'traded_value': np.abs(quantity * trades['price'].values),
+            'traded_quantity': np.abs(quantity)})
+    summary = traded.groupby('ticker').sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['vwap'] = summary['traded_value'] / summary['traded_quantity']
+    return summary.loc[:, columns]
+
+
 class Report:
+    """
+    Builds the report of a run from the results of Engine.get_results, a
+    PDF with a chart, or a JSON or HTML summary which is much faster.
+    Matplotlib and fpdf are only imported when a PDF is generated.
+    """
 
     @staticmethod
     def printable_types():
         return {int, float, str, np.float64, date, datetime, pd.Timestamp}
 
-    def __init__(self):
+    def __init__(self, folder: str=None, max_trade_rows: int=500,
+            report_format: str='pdf'):
+        """
+        folder: folder reports are saved into, defaults to the report folder
+                of the backtester database
+        max_trade_rows: number of fills listed in the PDF after the per ticker
+                trade summary, the remaining fills are only counted
+        report_format: one of 'pdf', 'json' or 'html'
+        """
         self.row_width = 20
         self.row_height = 10
+        self.table_row_height = 6
         self.font_family = 'Arial'
         self.font_size = 10
-        
+        self.folder = folder
+        self.max_trade_rows = max_trade_rows
+        self.report_format = report_format
+
 
     def generate_report_dir(self):
-        dir_path = os.path.join(os.path.expanduser('~'), 'backtester_database', 'report')
-        if not os.path.isdir(dir_path):
-            try:
-                os.mkdir(dir_path)
-            except:
-                raise PermissionError('Unable to create reporting folder')
+        dir_path = self.folder or os.path.join(os.path.expanduser('~'),
+                'backtester_database', 'report')
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+        except OSError:
+            raise PermissionError('Unable to create reporting folder')
         return dir_path
-    
 
-    def generate_report(self, backtest_engine):
+
+    def get_file_path(self, extension: str) -> str:
+        """
+        returns a report file path unique across processes and threads
+        """
+        prefix = datetime.now().strftime('%Y%m%d_%H%M%S_')
+        file_descriptor, file_path = tempfile.mkstemp(suffix='.' + extension,
+                prefix=prefix, dir=self.generate_report_dir())
+        os.close(file_descriptor)
+        return file_path
+
+
+    def submit(self, results: Dict, executor=None):
+        """
+        Generates the report in the background
+
+        results: dictionary returned by Engine.get_results
+        executor: executor running the report, a process pool executor keeps
+                the report from competing with the run for the GIL. Defaults
+                to get_report_executor
+
+        returns future of the report file path
+        """
+        executor = executor or get_report_executor()
+        return executor.submit(self.generate, results)
+
+
+    def generate(self, results: Dict) -> str:
         """
-        backtest_engine: core.engine.Engine object
+        generates the report of results in report_format, returns its path
+        """
+        if self.report_format == 'pdf':
+            return self.generate_report(results)
+        if self.report_format in ('json', 'html'):
+            return self.generate_summary(results, self.report_format)
+        raise ValueError('Unrecognized report format %s' % self.report_format)
+
+
+    def generate_report(self, results: Dict) -> str:
+        """
+        results: dictionary returned by Engine.get_results, an Engine after
+                its run is also accepted
         saves the PDF backtest report into report folder
+
+        returns the PDF file path
         """
+        from fpdf import FPDF
+
+        if not isinstance(results, dict):
+            results = results.get_results()
         report = FPDF()
         report.add_page()
         report.set_font(self.font_family, size=self.font_size)
 
-        for field, value in vars(backtest_engine).items():
-            if type(value) in Report.printable_types():
-                report = self.print_row(report, field, value)
-        
-        report = self.print_list(report, backtest_engine.trades, 'Trades')
-        report = self.generate_plot(report, backtest_engine.total_return_trend, 'Total Return Chart')
-        folder_path = self.generate_report_dir()
-        file_name = str(datetime.now()) + '.pdf'
-        full_file_name = os.path.join(folder_path, file_name)
+        for field, value in results['fields'].items():
+            report = self.print_row(report, field, value)
+
+        report = self.print_trades(report, results['trades'], 'Trades')
+        report = self.generate_plot(report, results['total_return_trend'],
+                'Total Return Chart')
+        full_file_name = self.get_file_path('pdf')
         report.output(full_file_name)
+        return full_file_name
 
 
     def generate_plot(self, report, dataframe, plot_title):
+        # the object oriented API keeps pyplot global state out of reports
+        # generated in worker threads
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from pandas.plotting import register_matplotlib_converters
+
         report.cell(self.row_width, self.row_height, txt=plot_title, ln=1)
         register_matplotlib_converters()
-        dataframe.plot()
-        folder_path = self.generate_report_dir()
-        pic_path = os.path.join(folder_path, 'chart.png')
-        plt.savefig(pic_path)
-        report.image(pic_path, w=200)
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        dataframe.plot(ax=figure.add_subplot(1, 1, 1))
+        pic_path = self.get_file_path('png')
+        try:
+            figure.savefig(pic_path)
+            report.image(pic_path, w=200)
+        finally:
+            os.remove(pic_path)
         return report
-    
+
+
+    def print_trades(self, report, trades: pd.DataFrame, section_header):
+        """
+        prints the per ticker trade summary followed by the first
+        max_trade_rows fills
+        """
+        report.cell(self.row_width, self.row_height, txt=section_header, ln=1)
+        report = self.print_row(report, 'number of trades', trades.shape[0])
+        report = self.print_dataframe(report,
+                summarize_trades(trades).reset_index().round(4))
+
+        listed = trades.iloc[:self.max_trade_rows]
+        report.cell(self.row_width, self.row_height,
+                txt='First %d of %d trades' % (listed.shape[0], trades.shape[0]), ln=1)
+        return self.print_dataframe(report, listed)
+
 
     def print_list(self, report, item_list, section_header):
         report.cell(self.row_width, self.row_height, txt=section_header, ln=1)
@@ -69,7 +214,8 @@ class Report:
             if type(item) in Report.printable_types():
                 report.cell(self.row_width, self.row_height, txt=str(item), ln=1)
             else:
-                report = self.print_dict(report, vars(item))
+                report = self.print_dict(report, item.to_dict()
+                        if hasattr(item, 'to_dict') else vars(item))
         return report
 
 
@@ -85,13 +231,59 @@ class Report:
 
 
     def print_dataframe(self, report, dataframe):
+        width = (report.w - report.l_margin - report.r_margin) / max(dataframe.shape[1], 1)
         for col_name in dataframe.columns:
-            report.cell(self.row_width, self.row_height, txt=col_name, border=1)
-        
-        report.ln(self.row_height)  
-        for row_idx in range(dataframe.shape[0]):
-            for col_idx in range(dataframe.shape[1]):
-                report.cell(self.row_width, self.row_height, 
-                    txt=str(dataframe.iloc[row_idx, col_idx], border=1))
-            report.ln(self.row_width)
-        return report 
\ No newline at end of file
+            report.cell(width, self.table_row_height, txt=str(col_name), border=1)
+
+        report.ln(self.table_row_height)
+        for row in dataframe.itertuples(index=False):
+            for value in row:
+                report.cell(width, self.table_row_height, txt=str(value), border=1)
+            report.ln(self.table_row_height)
+        return report
+
+
+    def get_summary(self, results: Dict) -> Dict:
+        """
+        returns the fields, per ticker trade summary and return trend of
+        results as JSON serializable values
+        """
+        trend = results['total_return_trend']
+        if isinstance(trend, pd.Series):
+            trend = trend.to_frame()
+        summary = summarize_trades(results['trades'])
+        return {
+            'fields': {field: value if isinstance(value, (int, float, str)) else str(value)
+                    for field, value in results['fields'].items()},
+            'number_of_trades': int(results['trades'].shape[0]),
+            'trade_summary': {ticker: row.to_dict() for ticker, row in summary.iterrows()},
+            'total_return_trend': {
+                    'dates': [str(idx.date()) for idx in pd.DatetimeIndex(trend.index)],
+                    'values': {str(col): trend[col].tolist() for col in trend.columns}},
+        }
+
+
+    def generate_summary(self, results: Dict, report_format: str='json') -> str:
+        """
+        saves the JSON or HTML summary of results into report folder
+
+        returns the summary file path
+        """
+        if not isinstance(results, dict):
+            results = results.get_results()
+        summary = self.get_summary(results)
+        file_path = self.get_file_path(report_format)
+        with open(file_path, 'w') as file:
+            if report_format == 'json':
+                json.dump(summary, file, default=str)
+            else:
+                fields = pd.Series(summary['fields'], name='value').to_frame()
+                trend = pd.DataFrame(summary['total_return_trend']['values'],
+                        index=summary['total_return_trend']['dates'])
+                file.write('<html><body>\n<h2>Backtest</h2>\n%s\n'
+                        '<h2>Trades (%d)</h2>\n%s\n<h2>Total Return</h2>\n%s\n'
+                        '</body></html>\n' % (fields.to_html(),
+                        summary['number_of_trades'],
+                        summarize_trades(results['trades']).to_html(),
+                        trend.iloc[-1:].to_html()))
+        return file_path
@@ -0,0 +1,75 @@
+from datetime import date
+from typing import Callable, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from core.calendar import Calendar
+
+
+class Scheduler:
+    """
+    Decides on which business dates the engine builds the market data
+    snapshot and calls Strategy.digest. Mark to market still happens on
+    every business date regardless of the schedule.
+    """
+
+    PERIOD_END_PREDICATES = {
+        'W': 'is_week_end_business_date',
+        'M': 'is_month_end_business_date',
+        'Q': 'is_quarter_end_business_date',
+        'SA': 'is_semiannual_end_business_date',
+        'Y': 'is_year_end_business_date',
+    }
+
+    def __init__(self, calendar: Calendar,
+            rebalance_freq: Union[str, Iterable[date], Callable]=None):
+        """
+        calendar: core.calendar.Calendar of the backtest
+        rebalance_freq: None or 'D' to rebalance on every business date,
+                 one of 'W', 'M', 'Q', 'SA', 'Y' to rebalance on the last
+                 business date of each week, month, quarter, half year or
+                 year, a collection of dates for a custom schedule, or a
+                 callable taking the current date and returning a bool
+        """
+        self.calendar = calendar
+        self.rebalance_freq = rebalance_freq
+
+        self._vectorized = False
+        if rebalance_freq is None or rebalance_freq == 'D':
+            self._predicate = None
+        elif isinstance(rebalance_freq, str):
+            frequency = rebalance_freq.upper()
+            if frequency not in Scheduler.PERIOD_END_PREDICATES:
+                raise ValueError('Unrecognized rebalance frequency %s' % rebalance_freq)
+            self._predicate = getattr(calendar, Scheduler.PERIOD_END_PREDICATES[frequency])
+            # calendar predicates also accept arrays of dates
+            self._vectorized = True
+        elif callable(rebalance_freq):
+            self._predicate = rebalance_freq
+        else:
+            schedule = frozenset(pd.Timestamp(d) for d in rebalance_freq)
+            self._predicate = lambda current_date: current_date in schedule
+
+
+    def is_rebalance_date(self, current_date: pd.Timestamp) -> bool:
+        if self._predicate is None:
+            return True
+        try:
+            return bool(self._predicate(current_date))
+        except ValueError:
+            # the date is not covered by the calendar
+            return False
+
+
+    def is_rebalance_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """
+        dates: business dates of the calendar
+
+        returns boolean array flagging the rebalance dates
+        """
+        if self._predicate is None:
+            return np.ones(len(dates), dtype=bool)
+        if self._vectorized:
+            return self._predicate(pd.DatetimeIndex(dates))
+        return np.array([self.is_rebalance_date(d) for d in dates], dtype=bool)
@@ -0,0 +1,232 @@
+from contextlib import contextmanager
+from datetime import date
+from itertools import product
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.multi_engine import _CombinedRequirements
+from data.data_manager import DataManager
+from data.dtypes import DtypePolicy
+
+
+SHARED_MEMORY_FOLDER = '/dev/shm'
+
+# dataframes of the sweep, rebuilt once per worker process from shared memory
+_WORKER_DATA = None
+
+
+def expand_grid(param_grid: Dict[str, List]) -> List[Dict]:
+    """
+    param_grid: dictionary of strategy parameter name to the list of values
+                to try, e.g. {'data_window_size': [100, 200], 'benchmark': [None]}
+
+    returns the list of all parameter combinations, in grid order
+    """
+    names = list(param_grid.keys())
+    return [dict(zip(names, values)) for values in
+            product(*(param_grid[name] for name in names))]
+
+
+def share_dataframes(dataframes: Dict[str, pd.DataFrame], folder: str) -> Dict:
+    """
+    Dumps the values of each dataframe into a .npy file under folder so that
+    worker processes can memory map them instead of receiving a pickled copy.
+    Indexes and columns are kept in the returned spec, which is small enough
+    to be sent to every worker.
+    """
+    spec = {}
+    for name, dataframe in dataframes.items():
+        if dataframe is None or dataframe.empty or \
+                len(set(dataframe.dtypes)) > 1 or dataframe.dtypes[0] == object:
+            spec[name] = ('frame', dataframe)
+            continue
+        file_path = os.path.join(folder, name + '.npy')
+        np.save(file_path, np.ascontiguousarray(dataframe.values))
+        spec[name] = ('shared', file_path, dataframe.index, dataframe.columns)
+    return spec
+
+
+def attach_dataframes(spec: Dict) -> Dict[str, pd.DataFrame]:
+    dataframes = {}
+    for name, item in spec.items():
+        if item[0] == 'frame':
+            dataframes[name] = item[1]
+            continue
+        _, file_path, index, columns = item
+        # copy-on-write mapping, pages are shared between workers as long
+        # as nobody writes into them
+        values = np.load(file_path, mmap_mode='c')
+        dataframes[name] = pd.DataFrame(values, index=index, columns=columns, copy=False)
+    return dataframes
+
+
+def _initialize_worker(spec: Dict) -> None:
+    global _WORKER_DATA
+    _WORKER_DATA = attach_dataframes(spec)
+
+
+def _run_task(task: Dict) -> Dict:
+    return run_task(task, _WORKER_DATA)
+
+
+def run_task(task: Dict, data: Dict[str, pd.DataFrame]) -> Dict:
+    """
+    Runs the backtest of a task, see make_task, over the tickers of data
+
+    returns sharpe, max_drawdown, information_ratio, run_duration and
+            final_value of the run, plus stats and mtm when requested
+    """
+    if task['seed'] is not None:
+        random.seed(task['seed'])
+        np.random.seed(task['seed'])
+
+    engine = Engine(universe=list(data['price'].columns),
+            start_date=task['start_date'], end_date=task['end_date'],
+            initial_cash=task['initial_cash'], generate_report=False,
+            profile=task['profile'], dtype_policy=task['dtype_policy'])
+    engine.logger.setLevel(logging.WARNING)
+    strategy = task['strategy_class'](**task['params'])
+    if task['vectorized']:
+        engine.run_vectorized(strategy, data)
+    else:
+        engine.run(strategy, data)
+
+    information_ratio = engine.information_ratio
+    if isinstance(information_ratio, str):
+        information_ratio = np.nan
+    result = {'sharpe': engine.sharpe, 'max_drawdown': engine.max_drawdown,
+            'information_ratio': information_ratio,
+            'run_duration': engine.run_duration,
+            'final_value': engine.mtm.iloc[-1] if engine.mtm.ndim == 1
+                    else engine.mtm['portfolio value'].iloc[-1]}
+    if task['profile']:
+        result['stats'] = engine.stats
+    if task['return_mtm']:
+        result['mtm'] = engine.mtm if engine.mtm.ndim == 1 \
+                else engine.mtm['portfolio value']
+    return result
+
+
+def make_task(strategy_class, params: Dict, start_date: date, end_date: date,
+        initial_cash: float=1000000.0, vectorized: bool=False, profile: bool=False,
+        dtype_policy: DtypePolicy=None, seed: int=None, return_mtm: bool=False) -> Dict:
+    """
+    returns the task of one backtest run by a task_pool, return_mtm adds
+    the portfolio value serie of the run to its result under mtm
+    """
+    return {'strategy_class': strategy_class, 'params': params,
+            'start_date': start_date, 'end_date': end_date,
+            'initial_cash': initial_cash, 'vectorized': vectorized,
+            'profile': profile, 'dtype_policy': dtype_policy,
+            # random.seed rejects numpy integers on recent Python versions
+            'seed': None if seed is None else int(seed), 'return_mtm': return_mtm}
+
+
+@contextmanager
+def task_pool(data: Dict[str, pd.DataFrame], n_workers: int=None,
+        start_method: str=None) -> Callable:
+    """
+    Starts the worker processes of a sweep once, with data shared through
+    memory mapped files, so that several batches of runs can be sent to
+    them. n_workers 1 runs the tasks in the calling process.
+
+    yields a function mapping a list of tasks, see make_task, and a
+           chunksize to the list of their results, in task order
+    """
+    global _WORKER_DATA
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        _initialize_worker({name: ('frame', df) for name, df in data.items()})
+        try:
+            yield lambda tasks, chunksize=1: [_run_task(task) for task in tasks]
+        finally:
+            # the caller's dataframes are not kept alive past the sweep
+            _WORKER_DATA = None
+        return
+
+    shared_folder = SHARED_MEMORY_FOLDER if os.path.isdir(SHARED_MEMORY_FOLDER) else None
+    folder = tempfile.mkdtemp(prefix='backtester_sweep_', dir=shared_folder)
+    try:
+        spec = share_dataframes(data, folder)
+        context = multiprocessing.get_context(start_method)
+        with context.Pool(processes=n_workers, initializer=_initialize_worker,
+                initargs=(spec,)) as pool:
+            yield lambda tasks, chunksize=1: list(
+                    pool.imap(_run_task, tasks, chunksize=chunksize))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def load_sweep_data(strategy_class, param_grid: Dict[str, List],
+        universe: List[str], start_date: date, end_date: date) -> Dict[str, pd.DataFrame]:
+    """
+    Loads the data of a sweep once, covering the largest data window and
+    the fields required across the parameter grid. Raises a ValueError if
+    the grid uses more than one benchmark
+    """
+    strategies = [strategy_class(**params) for params in expand_grid(param_grid)]
+    largest = max(strategies, key=lambda s: s.data_window_size)
+    data_manager = DataManager()
+    data_manager.setup(start_date=Engine.get_data_start_date(start_date, largest),
+            end_date=end_date, universe=universe,
+            strategy=_CombinedRequirements(strategies))
+    return data_manager.DATAFRAMES
+
+
+def run_parameter_sweep(strategy_class, param_grid: Dict[str, List],
+        start_date: date, end_date: date, universe: List[str]=None,
+        data: Dict[str, pd.DataFrame]=None, initial_cash: float=1000000.0,
+        n_workers: int=None, chunksize: int=1, seed: int=None,
+        vectorized: bool=False, start_method: str=None,
+        profile: bool=False, dtype_policy: DtypePolicy=None) -> pd.DataFrame:
+    """
+    Runs one backtest per parameter combination over a process pool.
+
+    strategy_class: Strategy subclass, instantiated with each parameter set
+        param_grid: dictionary of parameter name to list of values to try
+          universe: list of tickers, only needed when data is not provided
+              data: dictionary of dataframes, same layout as Engine.run. If
+                    not provided it is loaded once from the database
+         n_workers: number of worker processes, defaults to the number of
+                    cores. 1 runs the sweep in the calling process
+         chunksize: number of parameter sets sent to a worker at once
+              seed: when provided, random and numpy.random are seeded with
+                    seed + position of the parameter set in the grid before
+                    each run, so results do not depend on scheduling
+        vectorized: use Engine.run_vectorized instead of Engine.run
+      start_method: multiprocessing start method, platform default if None
+           profile: profile every run, see Engine. The core.profiling.RunStats
+                    of each run is returned in a stats column, 
+                    RunStats.combine(results['stats']) aggregates them
+      dtype_policy: data.dtypes.DtypePolicy of every run, data is cast once
+                    before it is shared with the workers
+
+    returns one row per parameter set, in grid order, with the parameters
+            followed by sharpe, max_drawdown, information_ratio,
+            run_duration and final_value
+    """
+    grid = expand_grid(param_grid)
+    if data is None:
+        data = load_sweep_data(strategy_class, param_grid, universe,
+                start_date, end_date)
+    if dtype_policy is not None:
+        data = dtype_policy.apply(data)
+
+    tasks = [make_task(strategy_class, params, start_date, end_date,
+              initial_cash=initial_cash, vectorized=vectorized, profile=profile,
+              dtype_policy=dtype_policy, seed=None if seed is None else seed + idx)
+              for idx, params in enumerate(grid)]
+
+    with task_pool(data, n_workers, start_method) as run_tasks:
+        results = run_tasks(tasks, chunksize)
+
+    return pd.concat([pd.DataFrame(grid), pd.DataFrame(results)], axis=1)
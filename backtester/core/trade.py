@@ -2,11 +2,16 @@ from datetime import date
 
 class Trade:
 
+    __slots__ = ('ticker', 'price', 'quantity', 'trade_date')
+
     def __init__(self, ticker: str, price: float, quantity: int, trade_date: date, *args, **kwargs):
         self.price = price
         self.ticker = ticker
         self.quantity = quantity
         self.trade_date = trade_date
 
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
     def __str__(self):
-        return ', '.join('%s: %s' % (key, val) for key, val in vars(self).items())
\ No newline at end of file
+        return ', '.join('%s: %s' % (key, val) for key, val in self.to_dict().items())
@@ -0,0 +1,72 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def simulate_targets(prices: np.ndarray, rebalance_rows: np.ndarray,
+        targets: np.ndarray, initial_cash: float, target_type: str='weight') \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]:
+    """
+    Simulates a target based strategy over a whole backtest period with the
+    same timing as Engine.run: targets decided on a rebalance date are
+    turned into market orders that fill at the price of the next row.
+
+           prices: (dates x tickers) array of prices of the backtest period
+   rebalance_rows: sorted row positions of the rebalance dates
+          targets: (rebalance dates x tickers) array of target weights of
+                   the portfolio value or target number of shares. nan
+                   leaves the position of that ticker untouched
+      target_type: 'weight' or 'shares'
+
+    returns mtm of every row, rows on which trades filled, (fill rows x
+            tickers) array of traded quantities with nan where nothing
+            traded, final positions and final cash
+    """
+
+    if not target_type in ('weight', 'shares'):
+        raise ValueError('Unrecognized target type %s' % target_type)
+
+    n_rows, n_tickers = prices.shape
+    positions = np.zeros(n_tickers, dtype=np.float64)
+    cash = float(initial_cash)
+
+    # trades are the only events changing the portfolio, the holdings between
+    # two fills are constant so they are only tracked on fill rows
+    fill_rows, fill_quantities, fill_positions, fill_cash = [], [], [], []
+    for rebalance_row, target in zip(rebalance_rows, targets):
+        fill_row = rebalance_row + 1
+        if fill_row >= n_rows:
+            break
+        row_prices = prices[rebalance_row]
+        if target_type == 'weight':
+            held_prices = np.where(positions != 0, row_prices, 0)
+            portfolio_value = cash + np.dot(positions, held_prices)
+            target_shares = target * portfolio_value / row_prices
+        else:
+            target_shares = target
+
+        ordered = ~np.isnan(target_shares)
+        quantities = np.where(ordered, target_shares - positions, np.nan)
+        traded = np.where(ordered, quantities, 0)
+        positions = positions + traded
+        cash -= np.dot(np.where(ordered, prices[fill_row], 0), traded)
+
+        fill_rows.append(fill_row)
+        fill_quantities.append(quantities)
+        fill_positions.append(positions)
+        fill_cash.append(cash)
+
+    fill_rows = np.asarray(fill_rows, dtype=np.int64)
+    segment_positions = np.vstack([np.zeros((1, n_tickers))] +
+            [p.reshape(1, -1) for p in fill_positions])
+    segment_cash = np.asarray([initial_cash] + fill_cash, dtype=np.float64)
+
+    # map every row onto the portfolio that was held at the end of that row
+    segment = np.searchsorted(fill_rows, np.arange(n_rows), side='right')
+    holdings = segment_positions[segment]
+    held_prices = np.where(holdings != 0, prices, 0)
+    mtm = np.round(segment_cash[segment] + np.einsum('ij,ij->i', holdings, held_prices), 4)
+
+    quantities = np.vstack(fill_quantities) if fill_quantities \
+            else np.empty((0, n_tickers))
+    return mtm, fill_rows, quantities, segment_positions[-1], segment_cash[-1]
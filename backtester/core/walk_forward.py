@@ -0,0 +1,140 @@
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from core.batch_metrics import compute_metrics
+from core.calendar import Calendar
+from core.sweep import expand_grid, load_sweep_data, make_task, task_pool
+from data.dtypes import DtypePolicy
+
+
+def walk_forward_windows(dates: pd.DatetimeIndex, in_sample: int, out_of_sample: int,
+        step: int=None, anchored: bool=False) -> pd.DataFrame:
+    """
+    dates: business dates of the walk forward
+    in_sample: number of business dates parameters are optimized on
+    out_of_sample: number of business dates the optimized parameters are
+                   then evaluated on
+    step: number of business dates between two windows, defaults to
+          out_of_sample so that out of sample windows follow each other
+    anchored: in sample windows all start from the first date and grow
+
+    returns one row per window with the in_sample_start, in_sample_end,
+            out_of_sample_start and out_of_sample_end dates. End dates are
+            excluded, as the Engine end date, and the out of sample window
+            starts on the in sample end date
+    """
+    if in_sample < 1 or out_of_sample < 1:
+        raise ValueError('in_sample and out_of_sample must be at least one business date')
+    step = step or out_of_sample
+    dates = pd.DatetimeIndex(dates)
+    # the last window end date must still be a business date of dates
+    starts = np.arange(0, dates.shape[0] - in_sample - out_of_sample, step)
+    in_sample_ends = starts + in_sample
+    return pd.DataFrame({
+            'in_sample_start': dates[np.zeros_like(starts) if anchored else starts],
+            'in_sample_end': dates[in_sample_ends],
+            'out_of_sample_start': dates[in_sample_ends],
+            'out_of_sample_end': dates[in_sample_ends + out_of_sample]},
+            columns=['in_sample_start', 'in_sample_end', 'out_of_sample_start',
+            'out_of_sample_end'])
+
+
+def stitch_equity_curves(segments: List[pd.Series], initial_cash: float) -> pd.Series:
+    """
+    Chains the portfolio value series of consecutive runs, each starting
+    from initial_cash, into one equity curve compounding their returns
+
+    returns portfolio value serie over the dates of all segments
+    """
+    returns = []
+    for segment in segments:
+        previous = segment.shift(1)
+        previous.iloc[0] = initial_cash
+        returns.append(segment / previous)
+    growth = pd.concat(returns)
+    return initial_cash * growth.cumprod()
+
+
+def run_walk_forward(strategy_class, param_grid: Dict[str, List],
+        start_date: date, end_date: date, in_sample: int, out_of_sample: int,
+        step: int=None, anchored: bool=False, objective: str='sharpe',
+        universe: List[str]=None, data: Dict[str, pd.DataFrame]=None,
+        initial_cash: float=1000000.0, n_workers: int=None, chunksize: int=1,
+        seed: int=None, vectorized: bool=False, start_method: str=None,
+        dtype_policy: DtypePolicy=None) -> Dict:
+    """
+    Walk forward optimization: on every window the parameter set maximizing
+    objective over the in sample dates is run over the following out of
+    sample dates. Data is loaded and shared with the workers once, every
+    window is a slice of the same calendar. All in sample runs are sent to
+    the pool at once, then all out of sample runs.
+
+    in_sample, out_of_sample, step, anchored: see walk_forward_windows, the
+                    windows cover the business dates from start_date to
+                    end_date
+    objective: column of the run_parameter_sweep results to maximize, e.g.
+               sharpe, information_ratio or final_value
+    other parameters: see core.sweep.run_parameter_sweep
+
+    returns dictionary with
+            windows: one row per window with its dates, the chosen parameters,
+                     their in sample objective and out of sample sharpe,
+                     max_drawdown and final_value
+            in_sample: every in sample run, one row per window and parameter set
+            mtm: out of sample portfolio values stitched into one equity curve
+            metrics: core.batch_metrics.METRICS of the stitched curve
+    """
+    grid = expand_grid(param_grid)
+    if data is None:
+        data = load_sweep_data(strategy_class, param_grid, universe,
+                start_date, end_date)
+    if dtype_policy is not None:
+        data = dtype_policy.apply(data)
+
+    calendar = Calendar(data['price'].index)
+    dates = calendar.calendar[calendar.searchsorted(start_date):
+            calendar.searchsorted(end_date, roll='backward') + 1]
+    windows = walk_forward_windows(dates, in_sample, out_of_sample, step, anchored)
+    if windows.empty:
+        raise ValueError('No walk forward window fits between %s and %s' % (start_date, end_date))
+
+    def task(params, start, end, idx, return_mtm=False):
+        return make_task(strategy_class, params, start.date(), end.date(),
+                initial_cash=initial_cash, vectorized=vectorized,
+                dtype_policy=dtype_policy, return_mtm=return_mtm,
+                seed=None if seed is None else seed + int(idx))
+
+    with task_pool(data, n_workers, start_method) as run_tasks:
+        in_sample_tasks = [task(params, window.in_sample_start, window.in_sample_end, idx)
+                for window in windows.itertuples() for idx, params in enumerate(grid)]
+        in_sample_results = pd.concat([
+                pd.DataFrame({'window': np.repeat(windows.index.values, len(grid)),
+                        'param_set': np.tile(np.arange(len(grid)), len(windows))},
+                        columns=['window', 'param_set']),
+                pd.DataFrame(grid * len(windows)),
+                pd.DataFrame(run_tasks(in_sample_tasks, chunksize))], axis=1)
+
+        # a window where the objective is undefined for every set keeps the first one
+        scores = in_sample_results[objective].values.astype(float).reshape(
+                len(windows), len(grid))
+        best = np.where(np.isnan(scores), -np.inf, scores).argmax(axis=1)
+        out_of_sample_tasks = [task(grid[best[row]], window.out_of_sample_start,
+                window.out_of_sample_end, best[row], return_mtm=True)
+                for row, window in enumerate(windows.itertuples())]
+        out_of_sample_results = run_tasks(out_of_sample_tasks, 1)
+
+    parameters = pd.DataFrame([grid[idx] for idx in best], index=windows.index)
+    windows = pd.concat([windows, parameters], axis=1)
+    windows['in_sample_%s' % objective] = scores[np.arange(len(windows)), best]
+    for column in ('sharpe', 'max_drawdown', 'final_value'):
+        windows['out_of_sample_%s' % column] = [result[column]
+                for result in out_of_sample_results]
+
+    mtm = stitch_equity_curves([result['mtm'] for result in out_of_sample_results],
+            initial_cash)
+    metrics = compute_metrics(mtm.values).iloc[0]
+    return {'windows': windows, 'in_sample': in_sample_results,
+            'mtm': mtm, 'metrics': metrics}
@@ -0,0 +1,317 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import json
+import logging
+from os import path, makedirs, replace
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from core.util import get_logger
+from data.config import FUNDAMENTAL_PUBLISH_DELAY
+from data.connection import ConnectionPool
+from data.store import is_stored, read_frame, write_frame
+from data.util import load_raw_prices, load_fundamental_dataframe, \
+    pivot_adjusted_prices, adjust_prices
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks on this platform, concurrent processes must not
+    # share a cache folder
+    fcntl = None
+
+
+COVERAGE_FILE = 'coverage.json'
+
+
+@contextmanager
+def _file_lock(lock_path: str, shared: bool=False):
+    """
+    Advisory lock on lock_path, held across processes. Writers take it
+    exclusive, readers shared so that they never see a store folder being
+    swapped by write_frame
+    """
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_coverage(folder: str) -> dict:
+    file_path = path.join(folder, COVERAGE_FILE)
+    if not path.isfile(file_path):
+        return {}
+    with open(file_path) as coverage_file:
+        return json.load(coverage_file)
+
+
+def _write_coverage(folder: str, coverage: dict) -> None:
+    file_path = path.join(folder, COVERAGE_FILE)
+    with open(file_path + '.tmp', 'w') as coverage_file:
+        json.dump(coverage, coverage_file)
+    replace(file_path + '.tmp', file_path)
+
+
+def _update_coverage(folder: str, update: Callable[[dict], None]) -> dict:
+    """
+    Applies update to the coverage stored in folder and writes it back.
+    The coverage is re-read under a lock so that entries written meanwhile
+    by other processes are kept. returns the updated coverage
+    """
+    with _file_lock(path.join(folder, COVERAGE_FILE + '.lock')):
+        coverage = _read_coverage(folder)
+        update(coverage)
+        _write_coverage(folder, coverage)
+    return coverage
+
+
+def _merge_frames(existing: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    dataframe = pd.concat([existing, new])
+    dataframe = dataframe[~dataframe.index.duplicated(keep='last')]
+    return dataframe.sort_index()
+
+
+class PriceCache:
+    """
+    Incremental cache of unadjusted prices, dividends and splits, stored
+    per ticker in the columnar store. The cache tracks the date range stored
+    for every ticker and only fetches the missing leading or trailing ranges
+    and the missing tickers from the database. Adjustment is applied when a
+    panel is assembled, so it is always relative to the requested range.
+    """
+
+    def __init__(self, folder: str, connection_pool: ConnectionPool=None,
+            chunk_size: int=100, max_workers: int=4, logger=None):
+        """
+        folder: root folder of the per ticker stores
+        connection_pool, chunk_size, max_workers: see data.util.load_raw_prices
+        """
+        self.folder = folder
+        if not path.isdir(folder):
+            makedirs(folder)
+        self.connection_pool = connection_pool
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.logger = logger or get_logger('PriceCache', logging.WARNING)
+        # ticker -> [first date, last date] stored, as iso strings
+        self.coverage = _read_coverage(folder)
+
+
+    def _ticker_folder(self, ticker: str) -> str:
+        return path.join(self.folder, ticker)
+
+
+    def missing_ranges(self, tickers: List[str], start_date: date,
+            end_date: date) -> Dict[Tuple[date, date], List[str]]:
+        """
+        returns the date ranges to fetch, with the list of tickers missing
+        each range. Fetched ranges always extend the stored range so that
+        what is stored for a ticker stays contiguous
+        """
+        missing = {}
+        for ticker in tickers:
+            if ticker not in self.coverage:
+                ranges = [(start_date, end_date)]
+            else:
+                stored_start, stored_end = (date(*map(int, d.split('-')))
+                        for d in self.coverage[ticker])
+                ranges = []
+                if start_date < stored_start:
+                    ranges.append((start_date, stored_start - timedelta(days=1)))
+                if end_date > stored_end:
+                    ranges.append((stored_end + timedelta(days=1), end_date))
+            for date_range in ranges:
+                missing.setdefault(date_range, []).append(ticker)
+        return missing
+
+
+    def update(self, tickers: List[str], start_date: date, end_date: date,
+            progress: Callable=None) -> None:
+        """
+        Fetches whatever is missing for tickers to cover start to end date
+        """
+        for (range_start, range_end), range_tickers in \
+                self.missing_ranges(tickers, start_date, end_date).items():
+            self.logger.info('fetching %d tickers from %s to %s',
+                    len(range_tickers), range_start, range_end)
+            price, dividend, split = load_raw_prices(range_tickers, range_start,
+                    range_end, connection_pool=self.connection_pool,
+                    chunk_size=self.chunk_size, max_workers=self.max_workers,
+                    progress=progress)
+            self._store(range_tickers, price, dividend, split, range_start, range_end)
+
+
+    def _store(self, tickers: List[str], price: pd.DataFrame, dividend: pd.DataFrame,
+            split: pd.DataFrame, start_date: date, end_date: date) -> None:
+        prices = dict(list(price.groupby('fsym_id')))
+        dividends = dict(list(dividend.groupby('fsym_id')))
+        splits = dict(list(split.groupby('fsym_id')))
+
+        fetched = {}
+        for ticker in tickers:
+            columns = []
+            if ticker in prices:
+                columns.append(prices[ticker].groupby('date')['price'].last())
+            if ticker in dividends:
+                columns.append(dividends[ticker].groupby('dividend_exdate')['dividend'].sum())
+            if ticker in splits:
+                columns.append(splits[ticker].groupby('split_exdate')['split_factor'].prod())
+            if not columns:
+                # nothing returned, the range stays missing
+                continue
+            dataframe = pd.concat(columns, axis=1).reindex(
+                    columns=['price', 'dividend', 'split_factor'])
+            dataframe.index = pd.DatetimeIndex(dataframe.index, name='date')
+            # only the dates actually returned are covered, a range ending
+            # after the last available date is fetched again next time
+            last_date = min(dataframe.index.max().date(), end_date)
+            fetched[ticker] = [start_date.isoformat(), last_date.isoformat()]
+            ticker_folder = self._ticker_folder(ticker)
+            with _file_lock(ticker_folder + '.lock'):
+                if is_stored(ticker_folder):
+                    dataframe = _merge_frames(read_frame(ticker_folder, mmap=False), dataframe)
+                write_frame(ticker_folder, dataframe)
+
+        def merge(coverage):
+            for ticker, (fetched_start, fetched_end) in fetched.items():
+                if ticker in coverage:
+                    stored_start, stored_end = coverage[ticker]
+                    coverage[ticker] = [min(stored_start, fetched_start),
+                            max(stored_end, fetched_end)]
+                else:
+                    coverage[ticker] = [fetched_start, fetched_end]
+        self.coverage = _update_coverage(self.folder, merge)
+
+
+    def load_raw_prices(self, tickers: List[str], start_date: date, end_date: date):
+        """
+        returns long format price, dividend and split dataframes read from
+        the cache, same layout as data.util.load_raw_prices
+        """
+        prices, dividends, splits = [], [], []
+        for ticker in tickers:
+            ticker_folder = self._ticker_folder(ticker)
+            with _file_lock(ticker_folder + '.lock', shared=True):
+                if not is_stored(ticker_folder):
+                    continue
+                dataframe = read_frame(ticker_folder, start_date=start_date,
+                        end_date=end_date, mmap=False)
+            dataframe['fsym_id'] = ticker
+            dataframe.index.name = 'date'
+            dataframe = dataframe.reset_index()
+            prices.append(dataframe.loc[dataframe['price'].notna(), ['fsym_id', 'date', 'price']])
+            dividends.append(dataframe.loc[dataframe['dividend'].notna(),
+                    ['fsym_id', 'date', 'dividend']].rename(columns={'date': 'dividend_exdate'}))
+            splits.append(dataframe.loc[dataframe['split_factor'].notna(),
+                    ['fsym_id', 'date', 'split_factor']].rename(columns={'date': 'split_exdate'}))
+
+        if not prices:
+            return (pd.DataFrame(columns=['fsym_id', 'date', 'price']),
+                    pd.DataFrame(columns=['fsym_id', 'dividend_exdate', 'dividend']),
+                    pd.DataFrame(columns=['fsym_id', 'split_exdate', 'split_factor']))
+        return tuple(pd.concat(frames, ignore_index=True) for frames in
+                (prices, dividends, splits))
+
+
+    def get_adjusted_prices(self, tickers: List[str], start_date: date,
+            end_date: date, adjustment_method: str='f',
+            progress: Callable=None) -> pd.DataFrame:
+        """
+        returns the adjusted price panel of tickers over start to end date,
+        same layout as data.util.load_adjusted_prices
+        """
+        if not adjustment_method in ('f', 'b'):
+            raise ValueError('Unrecognized adjustment method %s' % adjustment_method)
+        self.update(tickers, start_date, end_date, progress=progress)
+        price, dividend, split = self.load_raw_prices(tickers, start_date, end_date)
+        return pivot_adjusted_prices(adjust_prices(price, dividend, split,
+                adjustment_method), tickers)
+
+
+class FundamentalCache:
+    """
+    Incremental cache of fundamental data, stored per field in the columnar
+    store. For every field and ticker the cache records the date up to which
+    data was fetched, so only missing tickers and rows published after that
+    date are fetched from the database.
+    """
+
+    def __init__(self, folder: str, period: str='q', logger=None):
+        """
+        folder: root folder of the per field stores
+        period: periodicity of the fundamental data, see
+                data.util.load_fundamental_dataframe
+        """
+        self.folder = path.join(folder, period)
+        if not path.isdir(self.folder):
+            makedirs(self.folder)
+        self.period = period
+        self.logger = logger or get_logger('FundamentalCache', logging.WARNING)
+        # field -> ticker -> date fetched through, as iso string
+        self.coverage = _read_coverage(self.folder)
+
+
+    def _field_folder(self, field: str) -> str:
+        return path.join(self.folder, field)
+
+
+    def update(self, tickers: List[str], fields: List[str], end_date: date) -> None:
+        for field in fields:
+            field_coverage = self.coverage.get(field, {})
+            missing = {}
+            for ticker in tickers:
+                fetched_through = field_coverage.get(ticker)
+                if fetched_through is None or fetched_through < end_date.isoformat():
+                    missing.setdefault(fetched_through, []).append(ticker)
+
+            for fetched_through, missing_tickers in missing.items():
+                # rows are dated by period end and published up to
+                # FUNDAMENTAL_PUBLISH_DELAY days later, so the rows dated
+                # within that delay are fetched again and replace the stored
+                after_date = None if fetched_through is None else \
+                        date(*map(int, fetched_through.split('-'))) - \
+                        timedelta(days=FUNDAMENTAL_PUBLISH_DELAY)
+                self.logger.info('fetching %s of %d tickers after %s',
+                        field, len(missing_tickers), after_date)
+                dataframe = load_fundamental_dataframe(fsym_ids=missing_tickers,
+                        period=self.period, factset_fields=[field],
+                        after_date=after_date)
+                dataframe = dataframe.loc[:, [field]]
+                field_folder = self._field_folder(field)
+                with _file_lock(field_folder + '.lock'):
+                    if is_stored(field_folder):
+                        dataframe = _merge_frames(read_frame(field_folder, mmap=False), dataframe)
+                    if not dataframe.empty:
+                        write_frame(field_folder, dataframe)
+
+                def merge(coverage):
+                    field_coverage = coverage.setdefault(field, {})
+                    for ticker in missing_tickers:
+                        field_coverage[ticker] = max(field_coverage.get(ticker, ''),
+                                end_date.isoformat())
+                self.coverage = _update_coverage(self.folder, merge)
+
+
+    def get_fundamentals(self, tickers: List[str], fields: List[str],
+            end_date: date) -> pd.DataFrame:
+        """
+        returns (date, fsym_id) indexed dataframe with one column per field,
+        same layout as data.util.load_fundamental_dataframe
+        """
+        if len(fields) == 0:
+            return pd.DataFrame()
+        self.update(tickers, fields, end_date)
+        frames = []
+        for field in fields:
+            field_folder = self._field_folder(field)
+            with _file_lock(field_folder + '.lock', shared=True):
+                if is_stored(field_folder):
+                    frames.append(read_frame(field_folder, columns=tickers, mmap=False))
+        if not frames:
+            return pd.DataFrame(columns=fields)
+        return pd.concat(frames, axis=1, join='outer').sort_index()
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+import queue
+import sqlite3
+import threading
+from typing import Callable
+
+from data.config import PRICE_DATABASE, PRICE_DATABASE_USERNAME, \
+    PRICE_DATABASE_PASSWORD, PRICE_SCHEMA, FUNDAMENTAL_DATABASE, \
+    FUNDAMENTAL_DATABASE_USERNAME, FUNDAMENTAL_DATBASE_PASSWORD, FUNDAMENTAL_SCHEMA
+
+
+PRICE_TABLES = {
+    'fp_v2_fp_basic_prices': 'fsym_id TEXT, p_date TEXT, p_price REAL',
+    'fp_v2_fp_basic_dividends': 'fsym_id TEXT, p_divs_exdate TEXT, p_divs_pd REAL',
+    'fp_v2_fp_basic_splits': 'fsym_id TEXT, p_split_date TEXT, p_split_factor REAL',
+}
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of database connections. At most size connections are
+    opened, each of them is only used by one thread at a time and reused
+    across queries instead of reconnecting for every ticker.
+    """
+
+    def __init__(self, connect: Callable, size: int=4):
+        """
+        connect: callable returning a new DB-API connection
+        size: maximum number of connections opened at the same time
+        """
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.connect()
+            try:
+                yield conn
+            except Exception:
+                # do not hand a connection in unknown state to the next user
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def connect_price_database():
+    import pymysql
+    return pymysql.connect(host=PRICE_DATABASE, user=PRICE_DATABASE_USERNAME,
+                password=PRICE_DATABASE_PASSWORD, db=PRICE_SCHEMA)
+
+
+def connect_fundamental_database():
+    import pymysql
+    return pymysql.connect(host=FUNDAMENTAL_DATABASE, user=FUNDAMENTAL_DATABASE_USERNAME,
+                password=FUNDAMENTAL_DATBASE_PASSWORD, db=FUNDAMENTAL_SCHEMA)
+
+
+def connect_sqlite_price_database(database_path: str) -> sqlite3.Connection:
+    """
+    Local stand-in of the eod price database. The SQLite file is attached
+    under the eod schema name so the loader queries run unchanged.
+    """
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute('ATTACH DATABASE ? AS eod', (database_path,))
+    return conn
+
+
+def create_sqlite_price_database(database_path: str) -> None:
+    """
+    Creates the eod price, dividend and split tables in a SQLite file
+    """
+    conn = connect_sqlite_price_database(database_path)
+    with conn:
+        for table, columns in PRICE_TABLES.items():
+            conn.execute('CREATE TABLE IF NOT EXISTS eod.%s (%s)' % (table, columns))
+        conn.execute('CREATE INDEX IF NOT EXISTS eod.price_idx ON '
+                'fp_v2_fp_basic_prices (fsym_id, p_date)')
+    conn.close()
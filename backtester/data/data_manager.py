@@ -1,4 +1,4 @@
-from datetime import date, timedelta
+from datetime import date
 from dateutil.parser import parse
 from hashlib import sha256
 import logging
@@ -9,9 +9,13 @@ from typing import List, Dict
 
 import pandas as pd
 
-from data.util import get_data_folder, load_adjusted_price, \
-    load_fundamental_dataframe, load_benchmark
-from data.config import FUNDAMENTAL_PUBLISH_DELAY
+from data.connection import ConnectionPool
+from data.dtypes import DEFAULT_POLICY, DtypePolicy, memory_report
+from data.cache import PriceCache, FundamentalCache
+from data.util import get_data_folder, load_benchmark
+from data.feed import MarketDataFeed
+from data.store import is_stored, read_frame, write_frame
+from core.profiling import timed
 from core.util import get_logger
 
 
@@ -23,30 +27,30 @@ class DataManager:
         run_id = ' '.join([start_date.isoformat(), end_date.isoformat(), 
                         ''.join(universe)])
         file_key = sha256(run_id.encode()).hexdigest()
-        file_path = join(get_data_folder()['price'], file_key + '.csv')
+        store_folder = join(get_data_folder()['price'], file_key)
+        file_path = store_folder + '.csv'
         
-        if isfile(file_path):
+        if is_stored(store_folder):
             self.logger.info('found existing cached price data')
-            return pd.read_csv(file_path, index_col='date', parse_dates=['date'])
-
-        dataframe = None
-        for idx, ticker in enumerate(universe):
-            df = load_adjusted_price(fsym_id=ticker, start_date=start_date,
-                        end_date=end_date, adjustment_method='f')
+            return read_frame(store_folder)
+        if isfile(file_path):
+            self.logger.info('found existing cached price csv, converting to store')
+            dataframe = pd.read_csv(file_path, index_col='date', parse_dates=['date'])
+            write_frame(store_folder, dataframe)
+            return read_frame(store_folder)
 
-            stdout.write('\rloaded [%d / %d] prices' % (idx + 1, len(universe)))
+        def progress(loaded):
+            stdout.write('\rloaded [%d / %d] prices' % (loaded, len(universe)))
             stdout.flush()
 
-            if idx == 0:
-                dataframe = df
-                continue
-            dataframe = dataframe.join(df, how='outer')
+        # only the date ranges and tickers not stored yet are fetched
+        dataframe = self.get_price_cache().get_adjusted_prices(universe, 
+                    start_date, end_date, adjustment_method='f', progress=progress)
         
         dataframe = dataframe.round(decimals=2)
         dataframe.index = pd.to_datetime(dataframe.index)
         dataframe.sort_index(inplace=True)
         dataframe.fillna(inplace=True, method='pad')
-        dataframe.to_csv(file_path)
         return dataframe
 
 
@@ -61,65 +65,138 @@ class DataManager:
         run_id = ' '.join([start_date.isoformat(), end_date.isoformat(), 
                   ''.join(universe), ','.join(sorted(required_fields))])
         file_key = sha256(run_id.encode()).hexdigest()
-        file_path = join(get_data_folder()['fundamental'], file_key + '.csv')
+        store_folder = join(get_data_folder()['fundamental'], file_key)
+        file_path = store_folder + '.csv'
 
-        if isfile(file_path):
+        if is_stored(store_folder):
             self.logger.info('found existing cached fundamental data')
-            return pd.read_csv(file_path, parse_dates=True, 
+            return read_frame(store_folder)
+        if isfile(file_path):
+            self.logger.info('found existing cached fundamental csv, converting to store')
+            dataframe = pd.read_csv(file_path, parse_dates=True, 
                     index_col=['date', 'fsym_id'])
+            write_frame(store_folder, dataframe)
+            return read_frame(store_folder)
 
-        dataframe = load_fundamental_dataframe(fsym_ids=universe, 
-                    period='q', factset_fields=required_fields)
-        dataframe.to_csv(file_path)
-        return dataframe
+        return self.get_fundamental_cache().get_fundamentals(universe, 
+                    required_fields, end_date)
+
+
+    def get_price_cache(self) -> PriceCache:
+        if self.price_cache is None:
+            self.price_cache = PriceCache(join(get_data_folder()['price'], 'tickers'),
+                    connection_pool=self.price_connection_pool, logger=self.logger)
+        return self.price_cache
+
+
+    def get_fundamental_cache(self) -> FundamentalCache:
+        if self.fundamental_cache is None:
+            self.fundamental_cache = FundamentalCache(
+                    join(get_data_folder()['fundamental'], 'fields'), period='q',
+                    logger=self.logger)
+        return self.fundamental_cache
 
 
-    def __init__(self, logger=None, *args, **kwargs):
+    def __init__(self, logger=None, price_connection_pool: ConnectionPool=None, 
+            dtype_policy: DtypePolicy=None, *args, **kwargs):
+        """
+        price_connection_pool: pool of price database connections, e.g. over 
+                a local SQLite stand-in. Defaults to the eod database
+        dtype_policy: dtypes the dataframes and the feed hold market data 
+                in, data.dtypes.DEFAULT_POLICY if not provided
+        """
         self.DATAFRAMES = {}
-        self.current_row_index = None
+        self.price_connection_pool = price_connection_pool
+        self.price_cache = None
+        self.fundamental_cache = None
+        self.dtype_policy = dtype_policy or DEFAULT_POLICY
+        self.feed = None
+        # core.profiling.RunStats timing the load steps, set by the engine
+        self.stats = None
         self.logger = logger or get_logger('DataManager', logging.WARNING)
     
 
     def setup(self, start_date: date, end_date: date, 
             universe: List[str], strategy) -> None:
         
-        self.DATAFRAMES['price'] = self.create_price_dataframe(
-            start_date=start_date, end_date=end_date, 
-            universe=universe, strategy=strategy)
-        self.DATAFRAMES['fundamental'] = self.create_fundamental_dataframe(
-            start_date=start_date, end_date=end_date, 
-            universe=universe, strategy=strategy)
+        with timed(self.stats, 'load_price'):
+            self.DATAFRAMES['price'] = self.create_price_dataframe(
+                start_date=start_date, end_date=end_date, 
+                universe=universe, strategy=strategy)
+        with timed(self.stats, 'load_fundamental'):
+            self.DATAFRAMES['fundamental'] = self.create_fundamental_dataframe(
+                start_date=start_date, end_date=end_date, 
+                universe=universe, strategy=strategy)
         if strategy.benchmark is None:
             self.DATAFRAMES['benchmark'] = None
         else:    
-            benchmark_dataframe = load_benchmark(strategy.benchmark)
-            benchmark_dataframe = benchmark_dataframe.loc[start_date: end_date, :]
+            with timed(self.stats, 'load_benchmark'):
+                benchmark_dataframe = load_benchmark(strategy.benchmark)
+                benchmark_dataframe = benchmark_dataframe.loc[start_date: end_date, :]
             self.DATAFRAMES['benchmark'] = benchmark_dataframe
+        self.DATAFRAMES = self.dtype_policy.apply(self.DATAFRAMES)
+        self.feed = None
+
+
+    def set_dataframes(self, dataframes: Dict[str, pd.DataFrame]) -> None:
+        """
+        uses dataframes, same layout as DATAFRAMES, instead of loading them
+        in setup. They are cast to the dtype policy, without copying the ones
+        already in their dtype
+        """
+        self.DATAFRAMES = self.dtype_policy.apply(dataframes)
+        self.feed = None
+
+
+    def create_feed(self, window_size: int=365) -> MarketDataFeed:
+        """
+        window_size: number of calendar days of history handed to the 
+                strategy on each date, normally Strategy.data_window_size
+        """
+        self.feed = MarketDataFeed(self.DATAFRAMES, window_size=window_size,
+                dtype_policy=self.dtype_policy)
+        return self.feed
+
+
+    def with_window_size(self, window_size: int) -> 'DataManager':
+        """
+        returns a data manager over the same dataframes whose feed shares
+        the arrays of this one, see MarketDataFeed.with_window_size
+        """
+        data_manager = DataManager(logger=self.logger, 
+                price_connection_pool=self.price_connection_pool,
+                dtype_policy=self.dtype_policy)
+        data_manager.DATAFRAMES = self.DATAFRAMES
+        data_manager.stats = self.stats
+        feed = self.feed if self.feed is not None else self.create_feed()
+        data_manager.feed = feed.with_window_size(window_size)
+        return data_manager
+
+
+    def memory_report(self) -> pd.DataFrame:
+        """
+        returns the footprint of the dataframes and of the feed arrays, see
+        data.dtypes.memory_report
+        """
+        return memory_report(self.DATAFRAMES, self.feed)
+
+
+    def _seek(self, as_of_date: date) -> MarketDataFeed:
+        if self.feed is None:
+            self.create_feed()
+        self.feed.seek(as_of_date)
+        return self.feed
 
 
     def get_market_data(self, as_of_date: date) -> Dict:
-        data = {}
-        for db_type, dataframe in self.DATAFRAMES.items():
-            if db_type == 'price':
-                price_dataframe = dataframe[dataframe.index <= as_of_date]
-                # in case some stocks are listed after as_of date, 
-                # their price will all be nan, we filter them out
-                # to avoid look ahead bias
-                listed_tickers = price_dataframe.notna().any()
-                data[db_type] = price_dataframe.loc[:, listed_tickers]
-            elif db_type == 'fundamental':
-                # due to the lag between fiscal period end and the
-                # actual publish date of fundamental date we add a 
-                # conservative lag here to avoid look ahead bias
-                visible_date = as_of_date - timedelta(days=FUNDAMENTAL_PUBLISH_DELAY)
-                data[db_type] = dataframe.loc[pd.IndexSlice[:visible_date,:]]
-        return data
+        # stocks listed after as_of date are filtered out and fundamental
+        # data is lagged by FUNDAMENTAL_PUBLISH_DELAY to avoid look ahead bias
+        return self._seek(as_of_date).get_market_data()
     
 
     def get_prices_for_date(self, as_of_date: date) -> pd.Series:
-        price = self.DATAFRAMES['price']
-        return price[price.index <= as_of_date].iloc[-1, :].squeeze()
+        return self._seek(as_of_date).get_prices()
         
     
     def get_ticker_price_for_date(self, ticker: str, as_of_date: date) -> float:
-        return self.DATAFRAMES['price'][ticker].loc[as_of_date]
\ No newline at end of file
+        return self._seek(as_of_date).get_ticker_price(ticker)
\ No newline at end of file
@@ -0,0 +1,90 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+class DtypePolicy:
+    """
+    dtypes market data is held in, from the DataManager dataframes to the
+    arrays of the feed. Tickers need no policy, every per row structure
+    already refers to them by integer code: the feed and ledger columns,
+    the fundamental MultiIndex and the blotter ticker ids.
+    """
+
+    def __init__(self, price: str='float64', fundamental: str='float64'):
+        """
+        price: dtype of the price and benchmark panels
+        fundamental: dtype of the fundamental values and point in time panels
+        """
+        self.price = np.dtype(price)
+        self.fundamental = np.dtype(fundamental)
+
+
+    def apply(self, dataframes: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """
+        returns a copy of the dictionary of dataframes, layout of
+        DataManager.DATAFRAMES, with each dataframe cast to its dtype.
+        Dataframes already in their dtype are passed through without a copy
+        """
+        dtypes = {'price': self.price, 'benchmark': self.price,
+                  'fundamental': self.fundamental}
+        result = dict(dataframes)
+        for name, dtype in dtypes.items():
+            dataframe = result.get(name)
+            if dataframe is None or dataframe.empty:
+                continue
+            if (dataframe.dtypes != dtype).any():
+                result[name] = dataframe.astype(dtype)
+        return result
+
+
+    def __repr__(self):
+        return 'DtypePolicy(price=%s, fundamental=%s)' % (self.price, self.fundamental)
+
+
+DEFAULT_POLICY = DtypePolicy()
+# halves the footprint of the panels, prices keep about 7 significant digits
+COMPACT_POLICY = DtypePolicy(price='float32', fundamental='float32')
+
+
+def memory_report(dataframes: Dict[str, pd.DataFrame], feed=None) -> pd.DataFrame:
+    """
+    dataframes: dictionary of dataframes, layout of DataManager.DATAFRAMES
+    feed: optional data.feed.MarketDataFeed, its price array and point in
+          time panels are reported as well. Arrays shared with a dataframe
+          are only counted once
+
+    returns one row per dataset with its shape, dtype and size in bytes
+            and megabytes, index included, followed by a total row
+    """
+    rows, seen = [], []
+
+    def add(name, shape, dtype, size, array=None):
+        if array is not None:
+            if any(np.may_share_memory(array, other) for other in seen):
+                size = 0
+            seen.append(array)
+        rows.append({'dataset': name, 'shape': shape, 'dtype': str(dtype), 'bytes': size})
+
+    for name, dataframe in dataframes.items():
+        if dataframe is None:
+            continue
+        dtypes = dataframe.dtypes.unique()
+        values = dataframe.values if len(dtypes) == 1 else None
+        add(name, dataframe.shape, dtypes[0] if len(dtypes) == 1 else 'mixed',
+                int(dataframe.memory_usage(index=True, deep=True).sum()), values)
+
+    if feed is not None:
+        add('feed.price_values', feed.price_values.shape, feed.price_values.dtype,
+                feed.price_values.nbytes, feed.price_values)
+        for field, panel in feed.fundamental_panels.items():
+            add('feed.fundamental_panel.%s' % field, panel.shape, panel.dtype,
+                    panel.nbytes, panel)
+
+    report = pd.DataFrame(rows, columns=['dataset', 'shape', 'dtype', 'bytes'])
+    total = pd.DataFrame([{'dataset': 'total', 'shape': '', 'dtype': '',
+            'bytes': report['bytes'].sum()}], columns=report.columns)
+    report = pd.concat([report, total], ignore_index=True)
+    report['megabytes'] = report['bytes'] / 2 ** 20
+    return report.set_index('dataset')
@@ -0,0 +1,301 @@
+import copy
+from datetime import date
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from data.config import FUNDAMENTAL_PUBLISH_DELAY
+from data.dtypes import DEFAULT_POLICY, DtypePolicy
+
+
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+
+
+def point_in_time_panels(fundamental: pd.DataFrame, dates: pd.DatetimeIndex,
+        columns: pd.Index, publish_delay: int=FUNDAMENTAL_PUBLISH_DELAY,
+        dtype=np.float64) -> Dict[str, np.ndarray]:
+    """
+    Turns the (date, fsym_id) indexed fundamental dataframe into one dates x
+    tickers matrix per field. A value becomes visible publish_delay calendar
+    days after its report date and is carried forward until a newer value 
+    of the same ticker is visible, so a row of the matrix holds the latest
+    value known on that date.
+
+    fundamental: (date, fsym_id) MultiIndex dataframe, one column per field
+    dates: trading dates the panels are aligned with, e.g. the price index
+    columns: tickers the panels are aligned with
+    publish_delay: number of calendar days between report and visibility
+    dtype: dtype of the matrices
+
+    returns dictionary of field name to matrix
+    """
+    panels = {}
+    if fundamental is None or fundamental.empty:
+        return panels
+    # several reports on the same date and ticker, keep the last one
+    fundamental = fundamental.groupby(level=[0, 1]).last()
+    for field in fundamental.columns:
+        panel = fundamental[field].unstack(level=1).reindex(columns=columns)
+        panel.index = pd.DatetimeIndex(panel.index) + pd.Timedelta(days=publish_delay)
+        panel = panel.astype(dtype).ffill().reindex(dates, method='pad')
+        panels[field] = np.ascontiguousarray(panel.values)
+    return panels
+
+
+class MarketDataFeed:
+    """
+    Cursor based view over the dataframes held by DataManager. The feed
+    keeps integer cursors into the sorted date index and moves them forward
+    as the backtest advances, so building the market data snapshot of a
+    given day only depends on the size of the strategy's data window and
+    not on the number of days already simulated.
+    """
+
+    def __init__(self, dataframes: Dict[str, pd.DataFrame],
+            window_size: int=365, read_only: bool=False,
+            dtype_policy: DtypePolicy=None, *args, **kwargs):
+        """
+        dataframes: dictionary of dataframes, same layout as
+                    DataManager.DATAFRAMES
+        window_size: number of calendar days of history visible to the
+                    strategy, normally Strategy.data_window_size
+        read_only: flag the shared price history as read-only so that a
+                    strategy can not corrupt it through the windows it is
+                    handed. Off by default as the Cython kernels of older
+                    pandas versions (ewm, rolling) reject read-only buffers
+        dtype_policy: dtypes of the price array and fundamental panels,
+                    data.dtypes.DEFAULT_POLICY if not provided
+        """
+        price = dataframes['price']
+        if not isinstance(price.index, pd.DatetimeIndex):
+            # e.g. a row set with a datetime.date key turns the index into
+            # an object index mixing dates and timestamps
+            raise ValueError('price index must be a DatetimeIndex, not %s'
+                    % type(price.index).__name__)
+        if not price.index.is_monotonic_increasing:
+            price = price.sort_index()
+
+        self.window_size = window_size
+        self.window_length = window_size * NANOSECONDS_PER_DAY
+        self.dates = pd.DatetimeIndex(price.index)
+        self.columns = price.columns
+        self.column_index = {ticker: idx for idx, ticker in enumerate(self.columns)}
+        self._date_values = self.dates.values.view('i8')
+
+        # windows handed to strategies are views into this array, unless
+        # unlisted tickers sit between listed ones: the listed columns are
+        # then gathered, which copies the window
+        dtype_policy = dtype_policy or DEFAULT_POLICY
+        self.price_values = np.asarray(price.values, dtype=dtype_policy.price)
+        self.price_values.flags.writeable = not read_only
+
+        # row index at which each ticker gets its first price, a ticker is
+        # only visible to the strategy once it is listed to avoid look ahead
+        observed = ~np.isnan(self.price_values)
+        self._listing_row = np.where(observed.any(axis=0),
+                observed.argmax(axis=0), self.dates.shape[0])
+        self._sorted_listing_row = np.sort(self._listing_row)
+        self._listed_count = -1
+        self._listed_columns = None
+
+        fundamental = dataframes.get('fundamental')
+        if fundamental is None or fundamental.empty:
+            self.fundamental = fundamental
+            self._fundamental_date_values = None
+        else:
+            if not fundamental.index.is_monotonic_increasing:
+                fundamental = fundamental.sort_index()
+            self.fundamental = fundamental
+            self._fundamental_date_values = fundamental.index \
+                    .get_level_values(0).values.astype('datetime64[ns]').view('i8')
+        self.publish_delay = FUNDAMENTAL_PUBLISH_DELAY * NANOSECONDS_PER_DAY
+        # visibility is resolved once here, a strategy reads the latest 
+        # known values as one row of the price aligned panels
+        self.fundamental_panels = point_in_time_panels(fundamental, self.dates,
+                self.columns, FUNDAMENTAL_PUBLISH_DELAY, dtype=dtype_policy.fundamental)
+        for panel in self.fundamental_panels.values():
+            panel.flags.writeable = not read_only
+
+        self.reset()
+
+
+    def with_window_size(self, window_size: int) -> 'MarketDataFeed':
+        """
+        returns a feed handing windows of window_size calendar days over the
+        same price array and fundamental panels, which are not copied. Its
+        cursor is reset
+        """
+        feed = copy.copy(self)
+        feed.window_size = window_size
+        feed.window_length = window_size * NANOSECONDS_PER_DAY
+        feed._listed_count = -1
+        feed._listed_columns = None
+        feed.reset()
+        return feed
+
+
+    def reset(self) -> None:
+        self.as_of = None
+        self.cursor = -1                 # last row dated on or before as_of
+        self._window_start = 0           # first row inside the data window
+        self._fundamental_start = 0
+        self._fundamental_end = 0
+
+
+    def seek(self, as_of_date: date) -> int:
+        """
+        Moves the cursor to the last price row dated on or before as_of_date.
+        Moving forward is amortized O(1) per business date, moving backward
+        falls back to a binary search.
+
+        returns the row index of the cursor, -1 if as_of_date precedes the data
+        """
+        as_of = pd.Timestamp(as_of_date).value
+        if self.as_of is not None and as_of < self.as_of:
+            self._search(as_of)
+            return self.cursor
+        self.as_of = as_of
+
+        date_values, last_row = self._date_values, self._date_values.shape[0] - 1
+        while self.cursor < last_row and date_values[self.cursor + 1] <= as_of:
+            self.cursor += 1
+        window_start = as_of - self.window_length
+        while self._window_start <= self.cursor and \
+                date_values[self._window_start] < window_start:
+            self._window_start += 1
+
+        if self._fundamental_date_values is not None:
+            fundamental_dates = self._fundamental_date_values
+            visible_date = as_of - self.publish_delay
+            window_start = visible_date - self.window_length
+            while self._fundamental_end < fundamental_dates.shape[0] and \
+                    fundamental_dates[self._fundamental_end] <= visible_date:
+                self._fundamental_end += 1
+            while self._fundamental_start < self._fundamental_end and \
+                    fundamental_dates[self._fundamental_start] < window_start:
+                self._fundamental_start += 1
+        return self.cursor
+
+
+    def _search(self, as_of: int) -> None:
+        self.as_of = as_of
+        window_start = as_of - self.window_length
+        self.cursor = int(np.searchsorted(self._date_values, as_of, side='right')) - 1
+        self._window_start = int(np.searchsorted(self._date_values, window_start))
+        if self._fundamental_date_values is not None:
+            visible_date = as_of - self.publish_delay
+            self._fundamental_end = int(np.searchsorted(
+                    self._fundamental_date_values, visible_date, side='right'))
+            self._fundamental_start = int(np.searchsorted(
+                    self._fundamental_date_values, visible_date - self.window_length))
+
+
+    def rows_for_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """
+        returns for each date the row position seek would move the cursor to
+        """
+        date_values = pd.DatetimeIndex(dates).values.view('i8')
+        return np.searchsorted(self._date_values, date_values, side='right') - 1
+
+
+    def listed_columns(self) -> np.ndarray:
+        """
+        returns the column positions of tickers listed as of the cursor, as
+        a slice when they are contiguous so windows stay views, None when
+        every ticker in the universe is listed
+        """
+        listed_count = int(np.searchsorted(self._sorted_listing_row,
+                self.cursor, side='right'))
+        if listed_count != self._listed_count:
+            self._listed_count = listed_count
+            if listed_count == self.columns.shape[0]:
+                self._listed_columns = None
+            else:
+                listed_columns = np.flatnonzero(self._listing_row <= self.cursor)
+                if listed_columns.shape[0] == 0:
+                    listed_columns = slice(0, 0)
+                elif listed_columns[-1] - listed_columns[0] + 1 == listed_columns.shape[0]:
+                    listed_columns = slice(int(listed_columns[0]), int(listed_columns[-1]) + 1)
+                self._listed_columns = listed_columns
+        return self._listed_columns
+
+
+    def get_price_window(self) -> pd.DataFrame:
+        start, end = self._window_start, self.cursor + 1
+        window = self.price_values[start: end]
+        index = self.dates[start: end]
+        listed_columns = self.listed_columns()
+        if listed_columns is None:
+            return pd.DataFrame(window, index=index, columns=self.columns, copy=False)
+        return pd.DataFrame(window[:, listed_columns], index=index,
+                columns=self.columns[listed_columns], copy=False)
+
+
+    def get_fundamental_window(self) -> pd.DataFrame:
+        if self._fundamental_date_values is None:
+            return self.fundamental
+        return self.fundamental.iloc[self._fundamental_start: self._fundamental_end]
+
+
+    def get_fundamental_panel_window(self) -> Dict[str, pd.DataFrame]:
+        """
+        returns dictionary of field name to the point in time values over
+        the data window, aligned with the rows and columns of the price window
+        """
+        start, end = self._window_start, self.cursor + 1
+        index = self.dates[start: end]
+        listed_columns = self.listed_columns()
+        windows = {}
+        for field, panel in self.fundamental_panels.items():
+            if listed_columns is None:
+                windows[field] = pd.DataFrame(panel[start: end], index=index,
+                        columns=self.columns, copy=False)
+            else:
+                windows[field] = pd.DataFrame(panel[start: end, listed_columns],
+                        index=index, columns=self.columns[listed_columns], copy=False)
+        return windows
+
+
+    def get_fundamental_panels(self) -> Dict[str, pd.DataFrame]:
+        """
+        returns dictionary of field name to the point in time values over
+        all dates of the feed
+        """
+        return {field: pd.DataFrame(panel, index=self.dates, columns=self.columns,
+                copy=False) for field, panel in self.fundamental_panels.items()}
+
+
+    def get_fundamental_values(self, field: str) -> np.ndarray:
+        """
+        returns the latest value of field known as of the cursor for every
+        ticker, aligned with columns
+        """
+        if self.cursor < 0:
+            raise ValueError('No data is available as of %s' % pd.Timestamp(self.as_of))
+        return self.fundamental_panels[field][self.cursor]
+
+
+    def get_market_data(self) -> Dict:
+        data = {'price': self.get_price_window()}
+        if self.fundamental is not None:
+            data['fundamental'] = self.get_fundamental_window()
+            data['fundamental_panel'] = self.get_fundamental_panel_window()
+        return data
+
+
+    def current_prices(self) -> np.ndarray:
+        """
+        returns the price row at the cursor, aligned with columns
+        """
+        if self.cursor < 0:
+            raise ValueError('No price is available as of %s' % pd.Timestamp(self.as_of))
+        return self.price_values[self.cursor]
+
+
+    def get_prices(self) -> pd.Series:
+        return pd.Series(self.current_prices(), index=self.columns)
+
+
+    def get_ticker_price(self, ticker: str) -> float:
+        return self.current_prices()[self.column_index[ticker]]
@@ -0,0 +1,192 @@
+from datetime import date
+import glob
+import json
+from os import path, makedirs, remove, rename
+import shutil
+import tempfile
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+META_FILE = 'meta.json'
+VALUES_FILE = 'values.npy'
+
+
+def is_stored(folder: str) -> bool:
+    return path.isfile(path.join(folder, META_FILE))
+
+
+def _write_meta(folder: str, meta: dict) -> None:
+    with open(path.join(folder, META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file)
+
+
+def _read_meta(folder: str) -> dict:
+    with open(path.join(folder, META_FILE)) as meta_file:
+        return json.load(meta_file)
+
+
+def _load(folder: str, file_name: str, mmap: bool) -> np.ndarray:
+    # copy-on-write mapping keeps the arrays writeable, which the Cython
+    # kernels of older pandas versions require
+    return np.load(path.join(folder, file_name), mmap_mode='c' if mmap else None)
+
+
+def write_frame(folder: str, dataframe: pd.DataFrame) -> None:
+    """
+    Stores a date indexed dataframe, e.g. price or benchmark dataframe, as a
+    folder holding the date index as int64 nanoseconds, the values as one 
+    column-major float64 .npy array and a json file describing the columns
+    and the index frequency.
+    Arrays are memory mapped when read back, so a run only touches the 
+    pages of the dates and tickers it uses.
+    A (date, ticker) MultiIndex dataframe, e.g. fundamental dataframe, is 
+    stored sorted by date with the dates and tickers as integer codes.
+    """
+    # a staging folder of its own, concurrent writers never share it
+    parent_folder, name = path.split(path.abspath(folder))
+    makedirs(parent_folder, exist_ok=True)
+    tmp_folder = tempfile.mkdtemp(prefix='.%s.' % name, dir=parent_folder)
+
+    meta = {'columns': [str(column) for column in dataframe.columns]}
+    if isinstance(dataframe.index, pd.MultiIndex):
+        meta['kind'] = 'multiindex'
+        meta['index_names'] = list(dataframe.index.names)
+        row_dates = pd.DatetimeIndex(dataframe.index.get_level_values(0)).values.view('i8')
+        row_tickers = np.asarray(dataframe.index.get_level_values(1).astype(str))
+        dates, date_codes = np.unique(row_dates, return_inverse=True)
+        tickers, ticker_codes = np.unique(row_tickers, return_inverse=True)
+        order = np.lexsort((ticker_codes, date_codes))
+        dataframe = dataframe.iloc[order]
+        meta['tickers'] = list(tickers)
+        np.save(path.join(tmp_folder, 'dates.npy'), dates)
+        np.save(path.join(tmp_folder, 'date_codes.npy'), date_codes[order].astype(np.int32))
+        np.save(path.join(tmp_folder, 'ticker_codes.npy'), ticker_codes[order].astype(np.int32))
+    else:
+        meta['kind'] = 'frame'
+        meta['index_name'] = dataframe.index.name
+        meta['freq'] = getattr(dataframe.index, 'freqstr', None)
+        np.save(path.join(tmp_folder, 'index.npy'),
+                pd.DatetimeIndex(dataframe.index).values.view('i8'))
+
+    values = np.asfortranarray(dataframe.values, dtype=np.float64)
+    np.save(path.join(tmp_folder, VALUES_FILE), values)
+    _write_meta(tmp_folder, meta)
+
+    # only expose the folder once it is complete. The rename fails while
+    # a folder is stored, which is moved aside first. With concurrent
+    # writers the last rename wins. The folder is briefly missing between
+    # the two renames, concurrent readers must be kept out by a lock, as
+    # data.cache does
+    while True:
+        try:
+            rename(tmp_folder, folder)
+            return
+        except OSError:
+            if not path.isdir(folder):
+                raise
+        old_folder = tempfile.mkdtemp(prefix='.%s.' % name, dir=parent_folder)
+        try:
+            rename(folder, path.join(old_folder, name))
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(old_folder, ignore_errors=True)
+
+
+def read_frame(folder: str, start_date: date=None, end_date: date=None,
+        columns: List[str]=None, mmap: bool=True) -> pd.DataFrame:
+    """
+    folder: folder the dataframe was written to with write_frame
+    start_date, end_date: optional inclusive date range to read
+    columns: optional subset of columns (or tickers, for a MultiIndex
+             dataframe) to read
+    mmap: memory map the values instead of reading the whole file
+    """
+    meta = _read_meta(folder)
+    if meta['kind'] == 'multiindex':
+        return _read_multiindex_frame(folder, meta, start_date, end_date, columns, mmap)
+
+    index = np.load(path.join(folder, 'index.npy'))
+    start = 0 if start_date is None else \
+            int(np.searchsorted(index, pd.Timestamp(start_date).value))
+    end = index.shape[0] if end_date is None else \
+            int(np.searchsorted(index, pd.Timestamp(end_date).value, side='right'))
+
+    all_columns = pd.Index(meta['columns'])
+    values = _load(folder, VALUES_FILE, mmap)[start: end]
+    if columns is not None:
+        positions = all_columns.get_indexer(columns)
+        if (positions < 0).any():
+            raise KeyError('columns %s are not stored' % list(all_columns[positions < 0]))
+        values, all_columns = values[:, positions], all_columns[positions]
+    # a contiguous slice of a regular index keeps its frequency
+    dates = pd.DatetimeIndex(index[start: end].view('datetime64[ns]'),
+            name=meta['index_name'], freq=meta.get('freq'))
+    return pd.DataFrame(values, index=dates, columns=all_columns, copy=False)
+
+
+def _read_multiindex_frame(folder: str, meta: dict, start_date: date,
+        end_date: date, tickers: List[str], mmap: bool) -> pd.DataFrame:
+    dates = pd.DatetimeIndex(np.load(path.join(folder, 'dates.npy')).view('datetime64[ns]'))
+    date_codes = _load(folder, 'date_codes.npy', mmap)
+    ticker_codes = _load(folder, 'ticker_codes.npy', mmap)
+
+    # rows are sorted by date, so a date range is a contiguous block of rows
+    start = 0 if start_date is None else \
+            int(np.searchsorted(date_codes, dates.searchsorted(pd.Timestamp(start_date))))
+    end = date_codes.shape[0] if end_date is None else int(np.searchsorted(date_codes,
+            dates.searchsorted(pd.Timestamp(end_date), side='right')))
+    rows = slice(start, end)
+    values = _load(folder, VALUES_FILE, mmap)[rows]
+    date_codes, ticker_codes = date_codes[rows], ticker_codes[rows]
+
+    if tickers is not None:
+        stored_tickers = pd.Index(meta['tickers'])
+        selected = np.isin(ticker_codes, stored_tickers.get_indexer(tickers))
+        values = values[selected]
+        date_codes, ticker_codes = date_codes[selected], ticker_codes[selected]
+
+    index = pd.MultiIndex(levels=[dates, meta['tickers']],
+            codes=[date_codes, ticker_codes], names=meta['index_names'])
+    return pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+
+
+def _read_csv_cache(file_path: str, data_type: str) -> pd.DataFrame:
+    if data_type == 'price':
+        return pd.read_csv(file_path, index_col='date', parse_dates=['date'])
+    if data_type == 'fundamental':
+        return pd.read_csv(file_path, parse_dates=True, index_col=['date', 'fsym_id'])
+    return pd.read_csv(file_path, index_col=0, parse_dates=True)
+
+
+def convert_csv_cache(data_folders: dict=None, remove_csv: bool=False) -> List[str]:
+    """
+    One-shot converter of the CSV caches into the columnar store. Every
+    <key>.csv file of the price, fundamental and benchmark folders is
+    written next to it as a <key> store folder.
+
+    data_folders: dictionary as returned by data.util.get_data_folder
+    remove_csv: delete the CSV files once converted
+
+    returns the list of store folders written
+    """
+    if data_folders is None:
+        from data.util import get_data_folder
+        data_folders = get_data_folder()
+
+    converted = []
+    for data_type, data_folder in data_folders.items():
+        for file_path in sorted(glob.glob(path.join(data_folder, '*.csv'))):
+            folder = path.splitext(file_path)[0]
+            write_frame(folder, _read_csv_cache(file_path, data_type))
+            converted.append(folder)
+            if remove_csv:
+                remove(file_path)
+    return converted
+
+
+if __name__ == '__main__':
+    for folder in convert_csv_cache():
+        print('converted %s' % folder)
@@ -2,15 +2,14 @@ import datetime
 from dateutil.relativedelta import relativedelta
 import io
 from os import path, makedirs
+from typing import Callable
 
 import numpy as np
 import pandas as pd
-import pymysql
 
-from data.config import PRICE_DATABASE, PRICE_DATABASE_USERNAME, \
-    PRICE_DATABASE_PASSWORD, PRICE_SCHEMA, \
-    FUNDAMENTAL_DATABASE, FUNDAMENTAL_DATABASE_USERNAME, \
-    FUNDAMENTAL_DATBASE_PASSWORD, FUNDAMENTAL_SCHEMA
+from data.connection import ConnectionPool, connect_fundamental_database, \
+    connect_price_database
+from data.store import is_stored, read_frame
 
 
 def get_data_folder():
@@ -29,14 +28,19 @@ def get_data_folder():
 def load_benchmark(benchmark: str) -> pd.DataFrame:
     """
     benchmark: str of the index name. Make sure there is a csv file 
-    with the name as the passed in benchmark existing in benchmark folder
+    with the name as the passed in benchmark existing in benchmark folder,
+    or a store folder of that name converted with data.store.convert_csv_cache
     """
     benchmark_folder = get_data_folder()['benchmark']
-    file_path = path.join(benchmark_folder, benchmark + '.csv')
-    if not path.isfile(file_path):
+    store_folder = path.join(benchmark_folder, benchmark)
+    file_path = store_folder + '.csv'
+    if is_stored(store_folder):
+        benchmark_series = read_frame(store_folder)
+    elif path.isfile(file_path):
+        benchmark_series = pd.read_csv(file_path, index_col=0, parse_dates=True)
+    else:
         raise FileNotFoundError('%s.csv is not found at %s' % 
                 (benchmark, benchmark_folder))
-    benchmark_series = pd.read_csv(file_path, index_col=0, parse_dates=True)
     if benchmark_series.shape[1] > 1:
         if benchmark in benchmark_series.columns:
             benchmark_series = benchmark_series.loc[:, [benchmark]]
@@ -47,7 +51,7 @@ def load_benchmark(benchmark: str) -> pd.DataFrame:
 
 def load_adjusted_price(fsym_id: str, start_date: datetime.date=None, 
         end_date: datetime.date=None, adjustment_method: str='f',
-        period: str='10y') -> pd.DataFrame:
+        period: str='10y', connection=None) -> pd.DataFrame:
     """
     Function interface to retrieve adjusted stock price
 
@@ -58,6 +62,8 @@ def load_adjusted_price(fsym_id: str, start_date: datetime.date=None,
             backtesting.
     period: length of the time period to retrieve. End date use today. Will
             be ignored if start date is supplied.
+    connection: price database connection, a new connection to the eod 
+            database is opened if not provided
     """
 
     if not adjustment_method in ('f', 'b'):
@@ -73,12 +79,27 @@ def load_adjusted_price(fsym_id: str, start_date: datetime.date=None,
         period_unit = period[-1].upper()
         start_date = end_date + time_range[period_unit](periods)
 
-    connection = pymysql.connect(host=PRICE_DATABASE, user=PRICE_DATABASE_USERNAME, 
-                        password=PRICE_DATABASE_PASSWORD, db=PRICE_SCHEMA)
+    if connection is None:
+        connection = connect_price_database()
     price_dataframe = _load_daily_price(fsym_id, connection, start_date, end_date)
     dividend_dataframe = _load_dividend(fsym_id, connection, start_date, end_date)
     split_dataframe = _load_split(fsym_id, connection, start_date, end_date)
     
+    dataframe = _adjust_price_dataframe(price_dataframe, dividend_dataframe,
+                split_dataframe, adjustment_method)
+    dataframe[fsym_id] = dataframe['price'] * dataframe['total_factor']
+    dataframe.set_index('date', inplace=True)
+    return dataframe.loc[:, [fsym_id]]
+
+
+def _adjust_price_dataframe(price_dataframe: pd.DataFrame, 
+        dividend_dataframe: pd.DataFrame, split_dataframe: pd.DataFrame,
+        adjustment_method: str) -> pd.DataFrame:
+    """
+    Computes the total adjustment factor of a single ticker's daily prices
+    from its dividends and splits, stored under 'total_factor'
+    """
+
     # backward adjustment follows Bloomberg convention
     dataframe = pd.merge(left=price_dataframe, right=dividend_dataframe, 
                 left_on='date', right_on='dividend_exdate', how='left')
@@ -99,13 +120,213 @@ def load_adjusted_price(fsym_id: str, start_date: datetime.date=None,
         dataframe['cash_factor'] /= dataframe['price']
         total_factor = list(dataframe['cash_factor'] / dataframe['split_factor'])
         dataframe['total_factor'] = np.cumprod(total_factor)
-    
-    dataframe[fsym_id] = dataframe['price'] * dataframe['total_factor']
-    dataframe.set_index('date', inplace=True)
-    return dataframe.loc[:, [fsym_id]]
+    return dataframe
+
+
+def load_adjusted_prices(fsym_ids: [str], start_date: datetime.date, 
+        end_date: datetime.date, adjustment_method: str='f',
+        connection_pool: ConnectionPool=None, chunk_size: int=100, 
+        max_workers: int=4, progress: Callable=None) -> pd.DataFrame:
+    """
+    Bulk version of load_adjusted_price, see load_raw_prices for the 
+    description of the loading parameters.
+
+    fsym_ids: list of factset security identifiers
+    adjustment_method: 'f' or 'b' for forward or backward adjustment
+
+    returns dataframe of adjusted prices, indexed by date with one column 
+            per ticker in the order of fsym_ids
+    """
+
+    if not adjustment_method in ('f', 'b'):
+        raise ValueError('Unrecognized adjustment method %s' % adjustment_method)
+    price, dividend, split = load_raw_prices(fsym_ids, start_date, end_date,
+            connection_pool=connection_pool, chunk_size=chunk_size, 
+            max_workers=max_workers, progress=progress)
+    return pivot_adjusted_prices(adjust_prices(price, dividend, split, 
+            adjustment_method), fsym_ids)
+
+
+def load_raw_prices(fsym_ids: [str], start_date: datetime.date, 
+        end_date: datetime.date, connection_pool: ConnectionPool=None, 
+        chunk_size: int=100, max_workers: int=4, progress: Callable=None):
+    """
+    Loads unadjusted prices, dividends and splits of many tickers. Tickers 
+    are fetched in chunks, each chunk issuing one price, one dividend and 
+    one split query with an IN list over a pooled connection. Chunks run 
+    concurrently on a bounded thread pool.
+
+    connection_pool: pool of price database connections, a pool over the 
+            eod database is created if not provided
+    chunk_size: number of tickers fetched per query
+    max_workers: number of chunks loaded concurrently
+    progress: optional callable receiving the number of tickers loaded so far
+
+    returns long format price, dividend and split dataframes, each with a
+            fsym_id column
+    """
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    owns_pool = connection_pool is None
+    if owns_pool:
+        connection_pool = ConnectionPool(connect_price_database, size=max_workers)
+
+    def load_chunk(chunk):
+        with connection_pool.connection() as connection:
+            return (_load_daily_prices(chunk, connection, start_date, end_date),
+                    _load_dividends(chunk, connection, start_date, end_date),
+                    _load_splits(chunk, connection, start_date, end_date))
+
+    chunks = [fsym_ids[idx: idx + chunk_size] for idx in 
+                range(0, len(fsym_ids), chunk_size)]
+    results, loaded = [], 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(load_chunk, chunk): len(chunk) for chunk in chunks}
+            for future in as_completed(futures):
+                results.append(future.result())
+                loaded += futures[future]
+                if progress is not None:
+                    progress(loaded)
+    finally:
+        # a pool passed in is left open for the caller to reuse
+        if owns_pool:
+            connection_pool.close()
 
+    if not results:
+        return (pd.DataFrame(columns=['fsym_id', 'date', 'price']),
+                pd.DataFrame(columns=['fsym_id', 'dividend_exdate', 'dividend']),
+                pd.DataFrame(columns=['fsym_id', 'split_exdate', 'split_factor']))
+    return tuple(pd.concat(frames, ignore_index=True) for frames in zip(*results))
+
+
+def pivot_adjusted_prices(adjusted_prices: pd.DataFrame, fsym_ids: [str]) -> pd.DataFrame:
+    """
+    Turns the long format output of adjust_prices into a date x ticker panel
+    """
+    dataframe = adjusted_prices.pivot(index='date', columns='fsym_id', 
+            values='adjusted_price')
+    dataframe = dataframe.reindex(columns=fsym_ids)
+    dataframe.columns.name = None
+    return dataframe
+
+
+def adjust_prices(price_dataframe: pd.DataFrame, dividend_dataframe: pd.DataFrame,
+        split_dataframe: pd.DataFrame, adjustment_method: str) -> pd.DataFrame:
+    """
+    Multi ticker version of the adjustment of load_adjusted_price. The 
+    dividends and splits of all tickers are matched to the price rows in
+    one pass and the factors of every ticker are accumulated together, as
+    the rows of a ticker x row matrix, so the result is identical to 
+    adjusting one ticker at a time. Several dividends (splits) of a ticker
+    on the same exdate are summed (multiplied) into one event, so there is
+    one row per ticker and date.
+
+    price_dataframe: long format prices with fsym_id, date and price columns
+    dividend_dataframe: fsym_id, dividend_exdate and dividend columns
+    split_dataframe: fsym_id, split_exdate and split_factor columns
+    adjustment_method: 'f' or 'b' for forward or backward adjustment
+
+    returns long format dataframe with date, fsym_id, price, total_factor
+            and adjusted_price columns, tickers in order of first appearance
+    """
+    columns = ['date', 'fsym_id', 'price', 'total_factor', 'adjusted_price']
+    if len(price_dataframe) == 0:
+        return pd.DataFrame(columns=columns)
 
-def _load_daily_price(fsym_id: str, db_connection: pymysql.Connection,
+    codes, tickers = pd.factorize(price_dataframe['fsym_id'], sort=False)
+    tickers = pd.Index(tickers)
+    dividend_keys = _event_keys(dividend_dataframe['fsym_id'], 
+            dividend_dataframe['dividend_exdate'], tickers)
+    if pd.Index(dividend_keys).has_duplicates:
+        # dividends going ex on the same date are paid together
+        dividend_dataframe = dividend_dataframe.groupby(['fsym_id', 'dividend_exdate'],
+                sort=False)['dividend'].sum().reset_index()
+        dividend_keys = _event_keys(dividend_dataframe['fsym_id'], 
+                dividend_dataframe['dividend_exdate'], tickers)
+    split_keys = _event_keys(split_dataframe['fsym_id'], 
+            split_dataframe['split_exdate'], tickers)
+    if pd.Index(split_keys).has_duplicates:
+        split_dataframe = split_dataframe.groupby(['fsym_id', 'split_exdate'],
+                sort=False)['split_factor'].prod().reset_index()
+        split_keys = _event_keys(split_dataframe['fsym_id'], 
+                split_dataframe['split_exdate'], tickers)
+    dataframe = price_dataframe
+    price_keys = _event_keys(None, dataframe['date'], tickers, codes)
+    dividend = _lookup(price_keys, dividend_keys, dividend_dataframe['dividend'])
+    split_factor = _lookup(price_keys, split_keys, split_dataframe['split_factor'])
+    dividend[np.isnan(dividend)] = 0
+    split_factor[np.isnan(split_factor)] = 1
+
+    # rows of a ticker made contiguous, keeping their order
+    price = dataframe['price'].values.astype(np.float64)
+    if (np.diff(codes) < 0).any():
+        order = np.argsort(codes, kind='mergesort')
+        dataframe = dataframe.iloc[order]
+        codes, price = codes[order], price[order]
+        dividend, split_factor = dividend[order], split_factor[order]
+    counts = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    positions = np.arange(len(codes)) - starts[codes]
+
+    # backward adjustment follows Bloomberg convention
+    if adjustment_method == 'b':
+        last = positions == counts[codes] - 1
+        next_dividend = np.append(dividend[1:], np.nan)
+        next_split_factor = np.append(split_factor[1:], np.nan)
+        next_dividend[last], next_split_factor[last] = np.nan, np.nan
+        cash_factor = price - next_dividend
+        cash_factor /= price
+        factor = cash_factor * next_split_factor
+        factor[last] = 1
+        # accumulated from the last row of every ticker
+        positions = counts[codes] - 1 - positions
+    else:
+        cash_factor = dividend + price
+        cash_factor /= price
+        factor = cash_factor / split_factor
+
+    factors = np.ones((counts.shape[0], counts.max()))
+    factors[codes, positions] = factor
+    total_factor = np.cumprod(factors, axis=1)[codes, positions]
+
+    return pd.DataFrame({'date': dataframe['date'].values, 
+            'fsym_id': dataframe['fsym_id'].values, 'price': price,
+            'total_factor': total_factor, 'adjusted_price': price * total_factor},
+            columns=columns)
+
+
+def _event_keys(fsym_ids: pd.Series, dates: pd.Series, tickers: pd.Index,
+        codes: np.ndarray=None) -> np.ndarray:
+    """
+    returns one int64 key per (ticker, date) row, the ticker code in the
+    high bits and the day number in the low bits. Tickers not in tickers
+    get negative keys
+    """
+    if codes is None:
+        codes = tickers.get_indexer(fsym_ids)
+    days = pd.to_datetime(dates).values.astype('datetime64[D]').view('i8')
+    return codes.astype(np.int64) * (1 << 32) + days
+
+
+def _lookup(price_keys: np.ndarray, event_keys: np.ndarray, 
+        values: pd.Series) -> np.ndarray:
+    """
+    returns the event value on each price row, NaN where there is none
+    """
+    result = np.full(price_keys.shape[0], np.nan)
+    if event_keys.shape[0] == 0:
+        return result
+    order = np.argsort(event_keys)
+    sorted_keys = event_keys[order]
+    positions = np.searchsorted(sorted_keys, price_keys).clip(max=sorted_keys.shape[0] - 1)
+    found = sorted_keys[positions] == price_keys
+    result[found] = values.values[order[positions[found]]]
+    return result
+
+
+def _load_daily_price(fsym_id: str, db_connection,
         start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
     """
     Function to retrieve unadjusted daily price
@@ -118,7 +339,7 @@ def _load_daily_price(fsym_id: str, db_connection: pymysql.Connection,
     return dataframe
 
 
-def _load_dividend(fsym_id: str, db_connection: pymysql.Connection,
+def _load_dividend(fsym_id: str, db_connection,
         start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
     """
     Function to retrieve dividend
@@ -131,7 +352,7 @@ def _load_dividend(fsym_id: str, db_connection: pymysql.Connection,
     return dataframe
 
 
-def _load_split(fsym_id: str, db_connection: pymysql.Connection,
+def _load_split(fsym_id: str, db_connection,
         start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
     """
     Function to retrieve stock split
@@ -145,6 +366,55 @@ def _load_split(fsym_id: str, db_connection: pymysql.Connection,
     return dataframe
 
 
+def _fsym_id_list(fsym_ids: [str]) -> str:
+    return ','.join(["'" + fsym_id + "'" for fsym_id in fsym_ids])
+
+
+def _load_daily_prices(fsym_ids: [str], db_connection,
+        start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
+    """
+    Function to retrieve unadjusted daily prices of several tickers
+    """
+    base_sql = """ SELECT fsym_id, p_date AS date, p_price AS price FROM 
+                    eod.fp_v2_fp_basic_prices WHERE fsym_id IN (%s) 
+                    AND p_date >= '%s' AND p_date <= '%s' 
+                    ORDER BY fsym_id, p_date """
+    sql = base_sql % (_fsym_id_list(fsym_ids), start_date, end_date)
+    dataframe = pd.read_sql(sql=sql, con=db_connection)
+    dataframe['date'] = pd.to_datetime(dataframe['date'])
+    return dataframe
+
+
+def _load_dividends(fsym_ids: [str], db_connection,
+        start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
+    """
+    Function to retrieve dividends of several tickers
+    """
+    base_sql = """ SELECT fsym_id, p_divs_exdate AS dividend_exdate, 
+                    p_divs_pd AS dividend FROM eod.fp_v2_fp_basic_dividends 
+                    WHERE fsym_id IN (%s) AND p_divs_exdate >= '%s' 
+                    AND p_divs_exdate <= '%s' """
+    sql = base_sql % (_fsym_id_list(fsym_ids), start_date, end_date)
+    dataframe = pd.read_sql(sql=sql, con=db_connection)
+    dataframe['dividend_exdate'] = pd.to_datetime(dataframe['dividend_exdate'])
+    return dataframe
+
+
+def _load_splits(fsym_ids: [str], db_connection,
+        start_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
+    """
+    Function to retrieve stock splits of several tickers
+    """
+    base_sql = """ SELECT fsym_id, p_split_date AS split_exdate, 
+                    p_split_factor AS split_factor
+                    FROM eod.fp_v2_fp_basic_splits WHERE fsym_id IN (%s) 
+                    AND p_split_date >= '%s' AND p_split_date <= '%s' """
+    sql = base_sql % (_fsym_id_list(fsym_ids), start_date, end_date)
+    dataframe = pd.read_sql(sql=sql, con=db_connection)
+    dataframe['split_exdate'] = pd.to_datetime(dataframe['split_exdate'])
+    return dataframe
+
+
 def _get_field_table(fields: [str]) -> dict:
     """
     fields: a list of factset fields
@@ -155,8 +425,7 @@ def _get_field_table(fields: [str]) -> dict:
 
     sql = 'SELECT table_name FROM fundamental.ff_v3_ff_metadata WHERE field_name=%s'
     result = {}
-    conn = pymysql.connect(host=FUNDAMENTAL_DATABASE, user=FUNDAMENTAL_DATABASE_USERNAME,
-                    password=FUNDAMENTAL_DATBASE_PASSWORD, db=FUNDAMENTAL_SCHEMA)
+    conn = connect_fundamental_database()
     with conn.cursor() as cursor:
         for field in fields:
             cursor.execute(sql, field)
@@ -165,7 +434,8 @@ def _get_field_table(fields: [str]) -> dict:
     return result
         
 
-def load_fundamental_dataframe(fsym_ids: [str], period: str, factset_fields: [str]):
+def load_fundamental_dataframe(fsym_ids: [str], period: str, factset_fields: [str],
+        after_date: datetime.date=None):
     """
     fsym_ids: a list of factset security identifiers
     factset_fields: a list of factset fields to retrieve from factset 
@@ -173,6 +443,7 @@ def load_fundamental_dataframe(fsym_ids: [str], period: str, factset_fields: [st
             table name contains '_basic_' or '_advanced_'.
     period: periodicity of built dataframe, 'a' for annual, 'q' for quarter,
             'sa' for semi-annual, 'ltm' for last twelve month
+    after_date: only retrieve rows dated strictly after this date
     
     returns a dictionary of "fsym_id: dataframe" key, value pair.
     """
@@ -197,11 +468,10 @@ def load_fundamental_dataframe(fsym_ids: [str], period: str, factset_fields: [st
         table_field_map[table] = table_field_map.get(table, []) + [field]
     
     sql = 'SELECT %s FROM fundamental.%s t WHERE t.fsym_id in (%s)' 
-    sql_fsym_id_str = ','.join(["'" + fsym_id + "'" for fsym_id in fsym_ids])
-    conn = pymysql.connect(host=FUNDAMENTAL_DATABASE, 
-                    user=FUNDAMENTAL_DATABASE_USERNAME, 
-                    password=FUNDAMENTAL_DATBASE_PASSWORD, 
-                    db=FUNDAMENTAL_SCHEMA)
+    sql_fsym_id_str = _fsym_id_list(fsym_ids)
+    if after_date is not None:
+        sql += " AND t.date > '%s'" % after_date
+    conn = connect_fundamental_database()
 
     for table, fields in table_field_map.items():
         fields = list(set(['fsym_id', 'date'] + fields))
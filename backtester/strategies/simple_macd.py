@@ -1,6 +1,10 @@
 from collections import defaultdict
 from datetime import date, timedelta
 from typing import List, Dict
+
+import numpy as np
+
+from core.indicators import MACD
 from core.order import Order
 from strategies.strategy import Strategy
 
@@ -10,23 +14,21 @@ class SimpleMACD(Strategy):
 
     def __init__(self,*args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.macd = self.register_indicator('macd', MACD(fast=12, slow=26, signal=9))
 
 
     def digest(self, data: Dict, current_date: date, position: Dict, cash:float=None) -> List[Order]:
-        price = data['price']
         trades = defaultdict(int)
         for ticker, qty in position.items():
             trades[ticker] = -qty
         
-        ewma12 = price.ewm(span=12, adjust=False).mean()
-        ewma26 = price.ewm(span=26, adjust=False).mean()
-        macd = ewma12 - ewma26
-        signal = macd.ewm(span=9, adjust=False).mean()
-        diff = macd.iloc[-2:, :] - signal.iloc[-2:, :]
-        cross = (diff.iloc[0, :] * diff.iloc[1, :]) < 0
-        crossed_tickers = cross[cross]
-        for ticker in crossed_tickers.index:
-            if diff[ticker].iloc[-1] > 0:       # buy signal
+        # difference of macd and signal lines, advanced by the engine
+        diff = self.macd.value
+        with np.errstate(invalid='ignore'):
+            cross = (self.macd.previous * diff) < 0
+        for idx in np.flatnonzero(cross):
+            ticker = self.macd.columns[idx]
+            if diff[idx] > 0:       # buy signal
                 trades[ticker] += 1000
             else:                           # sell signal
                 trades[ticker] -= 1000
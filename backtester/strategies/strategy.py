@@ -1,20 +1,78 @@
 from datetime import date
 from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+from core.indicators import Indicator
 from core.order import Order
 
 
 class Strategy:
 
+    # kind of targets returned by generate_targets, 'weight' or 'shares'
+    target_type = 'weight'
+
     @staticmethod
     def required_fields():   return []
 
 
     def __init__(self, data_window_size: int=365, benchmark: str=None,
                 rebalance_freq: str=None, *args, **kwargs):
+        """
+        data_window_size: number of calendar days of history passed to digest
+        benchmark: name of the benchmark index, None if there is no benchmark
+        rebalance_freq: None to digest on every business date, one of 'W', 
+                'M', 'Q', 'SA', 'Y' to digest on period end business dates only,
+                or a custom schedule, see core.scheduler.Scheduler
+        """
         self.benchmark = benchmark
         self.data_window_size = data_window_size
         self.rebalance_freq = rebalance_freq
+        self.indicators = {}
+
+
+    def register_indicator(self, name: str, indicator: Indicator) -> Indicator:
+        """
+        Registers an indicator of core.indicators. The engine resets it with
+        the price columns, warms it up over the rows preceding the backtest
+        start date and then updates it with the price row of every business
+        date, before digest is called.
+
+        returns the indicator
+        """
+        self.indicators[name] = indicator
+        return indicator
+
+
+    def reset_indicators(self, columns: List[str]) -> None:
+        for indicator in self.indicators.values():
+            indicator.reset(columns)
+
+
+    def update_indicators(self, prices: np.ndarray) -> None:
+        for indicator in self.indicators.values():
+            indicator.update(prices)
 
 
     def digest(self, data: Dict, current_date: date, position: Dict, cash: float) -> List[Order]:
-        raise NotImplementedError('This is an interface class. Digest method is NOT implemented')
\ No newline at end of file
+        raise NotImplementedError('This is an interface class. Digest method is NOT implemented')
+
+
+    def generate_targets(self, data: Dict, rebalance_dates: pd.DatetimeIndex) -> pd.DataFrame:
+        """
+        Optional vectorized interface used by Engine.run_vectorized.
+
+        data: dictionary of dataframes covering the whole backtest period, 
+              same layout as DataManager.DATAFRAMES, plus the point in time
+              fundamental panels under 'fundamental_panel'. Targets of a 
+              rebalance date must only use rows dated on or before it
+        rebalance_dates: business dates on which the strategy rebalances
+
+        returns dataframe indexed by rebalance dates with one column per ticker,
+              holding the target weight of the portfolio value or the target
+              number of shares, depending on target_type. nan leaves the 
+              position of the ticker untouched
+        """
+        raise NotImplementedError('%s does NOT implement generate_targets' % 
+                type(self).__name__)
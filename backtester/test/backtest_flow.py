@@ -33,10 +33,10 @@ class TestBackTestFlow(unittest.TestCase):
         prices = pd.DataFrame(index=date_range)
         prices['aapl'] = 100
         prices['googl'] = 100
-        prices.loc[date(2010, 2, 2)] = [102, 98]
-        prices.loc[date(2010, 2, 3)] = [90, 95]
-        prices.loc[date(2014, 1, 24)] = [98, 102]
-        prices.loc[date(2014, 1, 27)] = [99, 101]
+        prices.loc[pd.Timestamp(2010, 2, 2)] = [102, 98]
+        prices.loc[pd.Timestamp(2010, 2, 3)] = [90, 95]
+        prices.loc[pd.Timestamp(2014, 1, 24)] = [98, 102]
+        prices.loc[pd.Timestamp(2014, 1, 27)] = [99, 101]
         data = {'price': prices}
         self.bt = Engine(universe=['aapl', 'googl'], 
             start_date=self.start_date, end_date=self.end_date, 
@@ -0,0 +1,91 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.batch_metrics import compute_metrics, compute_rolling_metrics, METRICS
+from core.metrics_util import calculate_information_ratio, \
+        calculate_max_drawdown, calculate_sharpe
+
+
+class TestBatchMetrics(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(7)
+        date_range = pd.bdate_range(date(2014, 1, 1), periods=600)
+        returns = random_state.normal(.0003, .01, (len(date_range), 5))
+        self.values = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c', 'd', 'benchmark'])
+
+    def test_MatchesSingleSerieMetrics(self):
+        portfolios = self.values.drop(columns='benchmark')
+        metrics = compute_metrics(portfolios, benchmark=self.values['benchmark'])
+        self.assertEqual(list(metrics.columns), METRICS)
+        self.assertEqual(list(metrics.index), ['a', 'b', 'c', 'd'])
+        for ticker in portfolios.columns:
+            self.assertAlmostEqual(metrics.loc[ticker, 'sharpe'],
+                    calculate_sharpe(self.values[ticker], '1D'), places=10)
+            self.assertAlmostEqual(metrics.loc[ticker, 'max_drawdown'],
+                    calculate_max_drawdown(self.values[ticker]), places=10)
+            self.assertAlmostEqual(metrics.loc[ticker, 'information_ratio'],
+                    calculate_information_ratio(self.values, '1D', ticker, 'benchmark'),
+                    places=10)
+
+        returns = np.log(portfolios / portfolios.shift(1)).iloc[1:]
+        np.testing.assert_allclose(metrics['volatility'], returns.std() * np.sqrt(252))
+        np.testing.assert_allclose(metrics['hit_rate'], (returns > 0).mean())
+        np.testing.assert_allclose(metrics['calmar'],
+                metrics['annualized_return'] / metrics['max_drawdown'].abs())
+        self.assertTrue(metrics['turnover'].isnull().all())
+
+        from_returns = compute_metrics(returns, is_return=True)
+        np.testing.assert_allclose(from_returns['sharpe'], metrics['sharpe'])
+        np.testing.assert_allclose(from_returns['max_drawdown'], metrics['max_drawdown'])
+
+    def test_DrawdownOnFirstReturn(self):
+        values = pd.Series([100., 90., 95., 99., 101.])
+        returns = np.log(values / values.shift(1)).iloc[1:]
+        metrics = compute_metrics(returns, is_return=True)
+        self.assertAlmostEqual(metrics['max_drawdown'].iloc[0], -.1)
+        self.assertAlmostEqual(compute_metrics(values)['max_drawdown'].iloc[0], -.1)
+
+    def test_MissingValuesAndTurnover(self):
+        values = self.values.copy()
+        values.iloc[:100, 0] = np.nan
+        values.iloc[:, 1] = 100.
+        traded_value = pd.DataFrame(0., index=values.index, columns=values.columns)
+        traded_value.iloc[::20, :] = 50.
+        metrics = compute_metrics(values, traded_value=traded_value)
+
+        self.assertAlmostEqual(metrics.loc['a', 'sharpe'],
+                calculate_sharpe(values['a'], '1D'), places=10)
+        self.assertAlmostEqual(metrics.loc['a', 'max_drawdown'],
+                calculate_max_drawdown(values['a'].dropna()), places=10)
+        # flat curve has no volatility and no drawdown
+        self.assertTrue(np.isnan(metrics.loc['b', 'sharpe']))
+        self.assertTrue(np.isnan(metrics.loc['b', 'calmar']))
+        self.assertEqual(metrics.loc['b', 'max_drawdown'], 0.)
+        self.assertAlmostEqual(metrics.loc['b', 'turnover'],
+                50. * 29 / 100. * 252 / 599, places=10)
+
+    def test_RollingMetrics(self):
+        window = 60
+        rolling = compute_rolling_metrics(self.values, window)
+        returns = np.log(self.values / self.values.shift(1))
+        mean = returns.rolling(window).mean()
+        std = returns.rolling(window).std()
+        self.assertTrue(rolling.index.equals(self.values.index))
+        pd.testing.assert_frame_equal(rolling['volatility'], std * np.sqrt(252),
+                check_less_precise=True)
+        pd.testing.assert_frame_equal(rolling['sharpe'],
+                ((1 + mean) ** 252 - 1 - .03) / (std * np.sqrt(252)), check_less_precise=True)
+        pd.testing.assert_frame_equal(rolling['hit_rate'],
+                (returns > 0).astype(float).where(returns.notnull()).rolling(window).mean(),
+                check_less_precise=True)
+        self.assertTrue(rolling['sortino'].iloc[:window].isnull().values.all())
+        self.assertFalse(rolling['sortino'].iloc[window:].isnull().values.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark.suite import CASES, compare, make_panels, run_case
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_SyntheticPanels(self):
+        panels = make_panels(n_tickers=20, n_years=2)
+        price = panels['price']
+        self.assertEqual(price.shape, (504, 20))
+        # every ticker is listed by the middle of the period
+        self.assertFalse(price.iloc[252:].isnull().values.any())
+        self.assertEqual(panels['fundamental'].shape[0], 8 * 20)
+        self.assertTrue(panels['benchmark'].index.equals(price.index))
+
+    def test_EveryCaseRunsAndCompares(self):
+        results = [run_case(case, n_tickers=4, n_years=1) for case in CASES]
+        for result in results:
+            self.assertEqual(result['status'], 'ok')
+            self.assertGreater(result['days'], 0)
+            self.assertGreater(result['peak_rss_mb'], 0)
+        # results are JSON serializable and comparable across files
+        folder = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(folder, 'results.json')
+            with open(file_path, 'w') as result_file:
+                json.dump({'results': results}, result_file)
+            comparison = compare(file_path, file_path)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        self.assertEqual(len(comparison), len(CASES))
+        self.assertTrue((comparison['speedup'] == 1).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
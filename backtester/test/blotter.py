@@ -0,0 +1,84 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.blotter import Blotter
+from core.engine import Engine
+from core.order import Order
+from core.trade import Trade
+from strategies.strategy import Strategy
+
+
+class HolidayOrderStrategy(Strategy):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.placed = []
+
+    def digest(self, data, current_date, position, cash):
+        if current_date.date() != date(2015, 7, 2):
+            return []
+        self.placed = [Order('aapl', 5, current_date)]
+        return self.placed
+
+
+class TestBlotter(unittest.TestCase):
+
+    def setUp(self):
+        self.dates = pd.bdate_range(date(2015, 1, 1), periods=10)
+        self.blotter = Blotter(['aapl', 'googl', 'fb'], self.dates, size=2)
+
+    def test_AppendAndExtend(self):
+        self.blotter.append(1, 0, 10, 100.5)
+        self.blotter.extend(np.array([0, 2, 1]), 3, np.array([5., -5., 2.]),
+                np.array([10., 20., 30.]))
+        self.blotter.extend(np.array([2]), np.array([4]), np.array([1.]), np.array([7.]))
+        self.assertEqual(len(self.blotter), 5)
+
+        dataframe = self.blotter.to_dataframe()
+        self.assertEqual(list(dataframe.columns), ['trade_date', 'ticker', 'quantity', 'price'])
+        self.assertEqual(list(dataframe['ticker']), ['googl', 'aapl', 'fb', 'googl', 'fb'])
+        self.assertEqual(list(dataframe['trade_date']), [self.dates[0]] + [self.dates[3]] * 3
+                + [self.dates[4]])
+        np.testing.assert_array_equal(dataframe['quantity'].values, [10, 5, -5, 2, 1])
+
+        trade = self.blotter[-1]
+        self.assertIsInstance(trade, Trade)
+        self.assertEqual((trade.ticker, trade.quantity, trade.price, trade.trade_date),
+                ('fb', 1., 7., self.dates[4]))
+        self.assertEqual([t.ticker for t in self.blotter], list(dataframe['ticker']))
+        with self.assertRaises(IndexError):
+            self.blotter[5]
+
+    def test_EmptyBlotter(self):
+        dataframe = self.blotter.to_dataframe()
+        self.assertEqual(len(dataframe), 0)
+        self.assertEqual(list(self.blotter), [])
+
+    def test_SlottedObjects(self):
+        order = Order('aapl', 10, date(2015, 1, 2))
+        trade = order.fill(price=10., trade_date=date(2015, 1, 5))
+        for item in (order, trade):
+            self.assertFalse(hasattr(item, '__dict__'))
+        self.assertEqual(trade.to_dict(), {'ticker': 'aapl', 'price': 10.,
+                'quantity': 10, 'trade_date': date(2015, 1, 5)})
+        self.assertEqual(order.to_dict()['status'], 'filled')
+
+    def test_OrderDateFromEngineCalendar(self):
+        # independence day is missing from the price history
+        dates = pd.bdate_range(date(2015, 6, 1), date(2015, 7, 31)).drop(
+                pd.Timestamp(date(2015, 7, 3)))
+        prices = pd.DataFrame({'aapl': 10.}, index=dates)
+        strategy = HolidayOrderStrategy()
+        bt = Engine(universe=['aapl'], start_date=date(2015, 6, 15),
+                end_date=date(2015, 7, 31), generate_report=False)
+        bt.run(strategy, {'price': prices})
+        self.assertEqual(strategy.placed[0].order_date, date(2015, 7, 6))
+        self.assertEqual(bt.trades.to_dataframe()['trade_date'].tolist(),
+                [pd.Timestamp(date(2015, 7, 6))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+from datetime import date
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from data.cache import FundamentalCache, PriceCache
+from data.connection import ConnectionPool, connect_sqlite_price_database
+from data.util import load_adjusted_prices
+from test.price_loader import populate_price_database
+
+
+class TestPriceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.folder, 'eod.sqlite')
+        self.tickers = ['T%02d-R' % idx for idx in range(8)]
+        populate_price_database(self.database_path, self.tickers,
+                date(2015, 1, 1), date(2016, 6, 30))
+        self.pool = ConnectionPool(
+                lambda: connect_sqlite_price_database(self.database_path), size=2)
+        self.cache = PriceCache(os.path.join(self.folder, 'cache'),
+                connection_pool=self.pool, chunk_size=3, max_workers=2)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.folder)
+
+    def assert_matches_loader(self, panel, tickers, start_date, end_date, adjustment_method='f'):
+        expected = load_adjusted_prices(tickers, start_date, end_date,
+                adjustment_method=adjustment_method, connection_pool=self.pool)
+        np.testing.assert_array_equal(panel.index.values, expected.index.values)
+        np.testing.assert_array_equal(panel.values, expected.values)
+        self.assertEqual(list(panel.columns), tickers)
+
+    def test_MissingRanges(self):
+        self.cache.get_adjusted_prices(self.tickers[:5], date(2015, 3, 1), date(2015, 12, 31))
+        missing = self.cache.missing_ranges(self.tickers[:6], date(2015, 1, 1), date(2016, 1, 4))
+        self.assertEqual(missing, {
+            (date(2015, 1, 1), date(2015, 2, 28)): self.tickers[:5],
+            (date(2016, 1, 1), date(2016, 1, 4)): self.tickers[:5],
+            (date(2015, 1, 1), date(2016, 1, 4)): self.tickers[5:6]})
+        self.assertEqual(self.cache.missing_ranges(self.tickers[:5], date(2015, 6, 1),
+                date(2015, 9, 30)), {})
+
+    def test_IncrementalPanels(self):
+        panel = self.cache.get_adjusted_prices(self.tickers[:5], date(2015, 3, 1), date(2015, 12, 31))
+        self.assert_matches_loader(panel, self.tickers[:5], date(2015, 3, 1), date(2015, 12, 31))
+
+        # extended on both sides with new tickers, then served from the cache only
+        for adjustment_method in ('f', 'b'):
+            panel = self.cache.get_adjusted_prices(self.tickers + ['MISSING-R'],
+                    date(2015, 1, 1), date(2016, 6, 30), adjustment_method=adjustment_method)
+            self.assert_matches_loader(panel, self.tickers + ['MISSING-R'],
+                    date(2015, 1, 1), date(2016, 6, 30), adjustment_method)
+        panel = self.cache.get_adjusted_prices(self.tickers[2:], date(2015, 7, 1), date(2016, 2, 1))
+        self.assert_matches_loader(panel, self.tickers[2:], date(2015, 7, 1), date(2016, 2, 1))
+
+        # coverage survives a new cache instance over the same folder, the
+        # ticker without rows is never covered
+        reopened = PriceCache(self.cache.folder, connection_pool=self.pool)
+        self.assertEqual(reopened.missing_ranges(self.tickers + ['MISSING-R'],
+                date(2015, 1, 1), date(2016, 6, 30)),
+                {(date(2015, 1, 1), date(2016, 6, 30)): ['MISSING-R']})
+
+    def test_CoverageStopsAtLastDate(self):
+        self.cache.get_adjusted_prices(self.tickers[:2], date(2016, 3, 1), date(2016, 12, 31))
+        self.assertEqual(self.cache.coverage[self.tickers[0]], ['2016-03-01', '2016-06-30'])
+        self.assertEqual(self.cache.missing_ranges(self.tickers[:2], date(2016, 3, 1),
+                date(2016, 12, 31)), {(date(2016, 7, 1), date(2016, 12, 31)): self.tickers[:2]})
+
+    def test_ConcurrentInstancesKeepCoverage(self):
+        other = PriceCache(self.cache.folder, connection_pool=self.pool)
+        self.cache.get_adjusted_prices(self.tickers[:2], date(2015, 3, 1), date(2015, 6, 30))
+        # the other instance read the coverage before the first one wrote it
+        other.get_adjusted_prices(self.tickers[2:4], date(2015, 3, 1), date(2015, 6, 30))
+        reopened = PriceCache(self.cache.folder, connection_pool=self.pool)
+        self.assertEqual(reopened.missing_ranges(self.tickers[:4], date(2015, 3, 1),
+                date(2015, 6, 30)), {})
+        self.assertEqual(os.listdir(self.cache.folder).count(self.tickers[0]), 1)
+        self.assertFalse([name for name in os.listdir(self.cache.folder)
+                if name.startswith('.')])
+
+    def test_ReadWhileWriting(self):
+        start_date, end_date = date(2015, 1, 1), date(2015, 12, 31)
+        self.cache.get_adjusted_prices(self.tickers, start_date, end_date)
+        raw = self.cache.load_raw_prices(self.tickers, start_date, end_date)
+        stop, errors = threading.Event(), []
+
+        def write():
+            try:
+                while not stop.is_set():
+                    self.cache._store(self.tickers, *raw, start_date, end_date)
+            except Exception as error:
+                errors.append(error)
+
+        # every read sees each ticker stored, before or after a rewrite
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(20):
+                price, _, _ = self.cache.load_raw_prices(self.tickers, start_date, end_date)
+                self.assertEqual(len(price), len(raw[0]))
+        finally:
+            stop.set()
+            writer.join()
+        self.assertEqual(errors, [])
+
+
+class TestFundamentalCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = FundamentalCache(self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_RevisedRowsReplaced(self):
+        def fundamentals(rows):
+            index = pd.MultiIndex.from_tuples([(pd.Timestamp(d), t) for d, t, _ in rows],
+                    names=['date', 'fsym_id'])
+            return pd.DataFrame({'ff_pe': [v for _, _, v in rows]}, index=index)
+
+        with mock.patch('data.cache.load_fundamental_dataframe') as load:
+            load.return_value = fundamentals([('2015-03-31', 'A', 10.), ('2015-06-30', 'A', 11.)])
+            self.cache.update(['A'], ['ff_pe'], date(2015, 7, 15))
+            self.assertIsNone(load.call_args[1]['after_date'])
+
+            # the june row was published late and revised after the first fetch
+            load.return_value = fundamentals([('2015-06-30', 'A', 12.), ('2015-09-30', 'A', 13.)])
+            dataframe = self.cache.get_fundamentals(['A'], ['ff_pe'], date(2015, 10, 31))
+            self.assertEqual(load.call_args[1]['after_date'], date(2015, 4, 16))
+        self.assertEqual(list(dataframe['ff_pe']), [10., 12., 13.])
+        self.assertEqual(self.cache.coverage, {'ff_pe': {'A': '2015-10-31'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import random
 import unittest
 
 from pandas.tseries.holiday import get_calendar
+import numpy as np
 import pandas as pd
 
 from core.calendar import Calendar
@@ -40,6 +41,49 @@ class TestCalendar(unittest.TestCase):
         self.assertFalse(self.calendar.is_quarter_end_business_date(pd.Timestamp(date(2013, 1, 31))))
         self.assertTrue(self.calendar.is_quarter_end_business_date(pd.Timestamp(date(2013, 3, 29))))
 
+    def test_PeriodEndsMatchNextBusinessDate(self):
+        following = self.time_index[1:]
+        current = self.time_index[:-1]
+        expected = {
+            'is_month_end_business_date': following.month != current.month,
+            'is_quarter_end_business_date': (following.month != current.month) &
+                    current.month.isin([3, 6, 9, 12]),
+            'is_semiannual_end_business_date': (following.month != current.month) &
+                    (current.month == 6),
+            'is_year_end_business_date': following.year > current.year,
+        }
+        for predicate, mask in expected.items():
+            result = getattr(self.calendar, predicate)(self.time_index)
+            np.testing.assert_array_equal(result[:-1], mask)
+            self.assertFalse(result[-1])
+        self.assertRaises(ValueError, self.calendar.is_month_end_business_date, date(2013, 7, 4))
+
+    def test_SearchsortedAndRoll(self):
+        holiday = date(2013, 7, 4)
+        position = self.calendar.searchsorted(holiday)
+        self.assertEqual(self.time_index[position], pd.Timestamp(date(2013, 7, 5)))
+        self.assertEqual(self.calendar.searchsorted(holiday, roll='backward'), position - 1)
+        self.assertEqual(self.calendar.roll(holiday), pd.Timestamp(date(2013, 7, 5)))
+        self.assertEqual(self.calendar.roll(date(2013, 7, 6), roll='backward'),
+                pd.Timestamp(date(2013, 7, 5)))
+        self.assertEqual(self.calendar.next_business_date(holiday), pd.Timestamp(date(2013, 7, 5)))
+        self.assertEqual(self.calendar.previous_business_date(holiday),
+                pd.Timestamp(date(2013, 7, 3)))
+        rolled = self.calendar.roll([date(2013, 1, 5), date(2013, 12, 25)], roll='backward')
+        self.assertEqual(list(rolled), [pd.Timestamp(date(2013, 1, 4)), pd.Timestamp(date(2013, 12, 24))])
+        self.assertRaises(ValueError, self.calendar.roll, date(2014, 1, 1))
+        np.testing.assert_array_equal(self.calendar.is_business_date(
+                [date(2013, 7, 3), date(2013, 7, 4), date(2013, 12, 31)]), [True, False, True])
+
+    def test_HolidayCalendar(self):
+        weekdays = pd.bdate_range(date(2013, 1, 1), date(2013, 12, 31))
+        for calendar in (Calendar(weekdays, holiday_calendar='USFederalHolidayCalendar'),
+                Calendar(weekdays, holiday_calendar=self.holiday_calendar),
+                Calendar.from_holidays(date(2013, 1, 1), date(2013, 12, 31))):
+            self.assertTrue(calendar.calendar.equals(self.time_index))
+        self.assertEqual(Calendar(weekdays).count_business_dates(date(2013, 1, 1),
+                date(2013, 12, 31)), len(weekdays) - 1)
+
 
 
 if __name__ == '__main__':
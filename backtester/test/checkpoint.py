@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.blotter import Blotter
+from core.engine import Engine
+from core.order import Order
+from strategies.simple_macd import SimpleMACD
+
+
+class LimitMACD(SimpleMACD):
+    """
+    SimpleMACD also resting short lived limit orders, raises once it
+    reaches crash_date
+    """
+
+    crash_date = None
+
+    def digest(self, data, current_date, position, cash=None):
+        if self.crash_date is not None and current_date.date() >= self.crash_date:
+            raise RuntimeError('crash on %s' % current_date)
+        orders = super().digest(data, current_date, position, cash)
+        if current_date.day % 7 == 0:
+            price = data['price']['a'].iloc[-1]
+            orders.append(Order('a', 10, current_date, order_type='lmt', price=price * .99,
+                    expiry_date=current_date + timedelta(days=10)))
+        return orders
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(11)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2015, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 3))
+        self.prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c'])
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, 'engine.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def make_engine(self, end_date, **kwargs):
+        engine = Engine(universe=['a', 'b', 'c'], start_date=date(2015, 1, 2),
+                end_date=end_date, **kwargs)
+        engine.logger.setLevel(logging.WARNING)
+        return engine
+
+    def full_run(self):
+        engine = self.make_engine(date(2015, 12, 31))
+        engine.run(LimitMACD(), {'price': self.prices})
+        return engine
+
+    def assertSameRun(self, engine, expected):
+        pd.testing.assert_series_equal(engine.mtm, expected.mtm)
+        pd.testing.assert_frame_equal(engine.blotter.to_dataframe(),
+                expected.blotter.to_dataframe())
+        self.assertEqual(len(engine.order_book), len(expected.order_book))
+        self.assertEqual(engine.position, expected.position)
+
+    def test_ExtendCompletedRun(self):
+        expected = self.full_run()
+        # the nightly run only had the data up to july 2nd
+        engine = self.make_engine(date(2015, 7, 2), checkpoint_path=self.file_path)
+        engine.run(LimitMACD(), {'price': self.prices.loc[:'2015-07-02']})
+        self.assertTrue(engine.blotter.count > 0 and len(engine.order_book) > 0)
+
+        resumed = Engine.load_checkpoint(self.file_path, logger=engine.logger)
+        self.assertEqual(resumed.current_date, pd.Timestamp(date(2015, 7, 2)))
+        resumed.resume({'price': self.prices}, end_date=date(2015, 12, 31))
+        self.assertSameRun(resumed, expected)
+
+    def test_ResumeAfterCrash(self):
+        expected = self.full_run()
+        strategy = LimitMACD()
+        strategy.crash_date = date(2015, 8, 12)
+        engine = self.make_engine(date(2015, 12, 31), checkpoint_path=self.file_path,
+                checkpoint_freq=20)
+        with self.assertRaises(RuntimeError):
+            engine.run(strategy, {'price': self.prices})
+
+        resumed = Engine.load_checkpoint(self.file_path, logger=engine.logger)
+        self.assertLess(resumed.current_date, pd.Timestamp(strategy.crash_date))
+        self.assertGreater(resumed.current_date, pd.Timestamp(date(2015, 7, 1)))
+        resumed.strategy.crash_date = None
+        resumed.resume({'price': self.prices})
+        self.assertSameRun(resumed, expected)
+
+    def test_MismatchedData(self):
+        engine = self.make_engine(date(2015, 7, 2))
+        engine.run(LimitMACD(), {'price': self.prices})
+        engine.save_checkpoint(self.file_path)
+
+        resumed = Engine.load_checkpoint(self.file_path, logger=engine.logger)
+        with self.assertRaises(ValueError):
+            resumed.resume({'price': self.prices[['a', 'b']]})
+        resumed = Engine.load_checkpoint(self.file_path, logger=engine.logger)
+        with self.assertRaises(ValueError):
+            resumed.resume({'price': self.prices.loc['2015-06-01':]})
+        with self.assertRaises(ValueError):
+            self.make_engine(date(2015, 7, 2)).save_checkpoint()
+
+    def test_BlotterRebase(self):
+        dates = pd.bdate_range(date(2015, 1, 1), periods=5)
+        blotter = Blotter(['a', 'b'], dates)
+        blotter.extend(np.array([0, 1]), 3, np.array([1., 2.]), np.array([10., 20.]))
+        longer = pd.bdate_range(date(2014, 12, 1), periods=40)
+        blotter.rebase(longer)
+        self.assertEqual(list(blotter.to_dataframe()['trade_date']), [dates[3]] * 2)
+        self.assertEqual(blotter.date_indexes[0], longer.get_loc(dates[3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
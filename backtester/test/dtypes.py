@@ -0,0 +1,78 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from benchmark.suite import make_panels
+from core.batch_metrics import compute_metrics
+from core.engine import Engine
+from data.data_manager import DataManager
+from data.dtypes import COMPACT_POLICY, DEFAULT_POLICY, DtypePolicy, memory_report
+from data.feed import MarketDataFeed
+from strategies.simple_macd import SimpleMACD
+
+
+class TestDtypes(unittest.TestCase):
+
+    def setUp(self):
+        self.data = make_panels(n_tickers=6, n_years=2, seed=3)
+
+    def test_ApplyCastsOnlyWhenNeeded(self):
+        data = DEFAULT_POLICY.apply(self.data)
+        self.assertIsNot(data, self.data)
+        for name in self.data:
+            self.assertIs(data[name], self.data[name])
+
+        compact = COMPACT_POLICY.apply(self.data)
+        self.assertTrue((compact['price'].dtypes == np.float32).all())
+        self.assertTrue((compact['fundamental'].dtypes == np.float32).all())
+        self.assertEqual(self.data['price'].values.dtype, np.float64)
+
+        prices = pd.DataFrame({'a': [1, 2, 3]})
+        self.assertEqual(DtypePolicy().apply({'price': prices})['price']['a'].dtype,
+                np.float64)
+
+    def test_CompactFeed(self):
+        data = COMPACT_POLICY.apply(self.data)
+        feed = MarketDataFeed(data, dtype_policy=COMPACT_POLICY)
+        self.assertEqual(feed.price_values.dtype, np.float32)
+        for panel in feed.fundamental_panels.values():
+            self.assertEqual(panel.dtype, np.float32)
+
+    def test_CompactRunMatchesDefault(self):
+        mtms = []
+        for policy in (DEFAULT_POLICY, COMPACT_POLICY):
+            engine = Engine(universe=list(self.data['price'].columns),
+                    start_date=date(2001, 3, 1), end_date=date(2001, 11, 30),
+                    generate_report=False, dtype_policy=policy)
+            engine.run(SimpleMACD(), {'price': self.data['price']})
+            self.assertEqual(engine.mtm.dtype, np.float64)
+            mtms.append(engine.mtm)
+        np.testing.assert_allclose(mtms[1].values, mtms[0].values, rtol=1e-4)
+
+    def test_MemoryReport(self):
+        reports = []
+        for policy in (DEFAULT_POLICY, COMPACT_POLICY):
+            data_manager = DataManager(dtype_policy=policy)
+            data_manager.set_dataframes(self.data)
+            data_manager.create_feed()
+            reports.append(data_manager.memory_report())
+        default, compact = reports
+        price = self.data['price']
+        self.assertEqual(default.loc['price', 'bytes'] - compact.loc['price', 'bytes'],
+                price.size * 4)
+        # the feed reads the price dataframe values in place
+        self.assertEqual(default.loc['feed.price_values', 'bytes'], 0)
+        self.assertEqual(default.loc['total', 'bytes'], default['bytes'].iloc[:-1].sum())
+        self.assertEqual(list(memory_report({}).index), ['total'])
+
+    def test_BatchMetricsFloat32(self):
+        values = self.data['price'].dropna().values
+        expected = compute_metrics(values)
+        result = compute_metrics(values.astype(np.float32))
+        np.testing.assert_allclose(result.values, expected.values, rtol=1e-3, atol=1e-5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.order import Order
+from strategies.strategy import Strategy
+
+
+class OffsettingOrderStrategy(Strategy):
+
+    def digest(self, data, current_date, position, cash):
+        if current_date.date() != date(2015, 1, 5):
+            return []
+        cancelled = Order('googl', 1000, current_date)
+        cancelled.cancel()
+        return [Order('aapl', 100, current_date), Order('aapl', -40, current_date),
+                Order('googl', -10, current_date), Order('aapl', -60, current_date),
+                Order('googl', 25, current_date), cancelled]
+
+
+class TestBatchedExecution(unittest.TestCase):
+
+    def setUp(self):
+        dates = pd.bdate_range(date(2014, 12, 1), date(2015, 1, 31))
+        self.prices = pd.DataFrame({'aapl': np.linspace(100, 110, len(dates)),
+                'googl': np.linspace(500, 450, len(dates))}, index=dates)
+        self.bt = Engine(universe=['aapl', 'googl'], start_date=date(2015, 1, 2),
+                end_date=date(2015, 1, 30), initial_cash=100000, generate_report=False)
+        self.bt.run(OffsettingOrderStrategy(), {'price': self.prices})
+
+    def test_FillsRecordedIndividually(self):
+        self.assertEqual([(t.ticker, t.quantity) for t in self.bt.trades],
+                [('aapl', 100), ('aapl', -40), ('googl', -10), ('aapl', -60), ('googl', 25)])
+        self.assertTrue(all(t.trade_date == pd.Timestamp(date(2015, 1, 6))
+                for t in self.bt.trades))
+        self.assertEqual(len(self.bt.orders['filled']), 5)
+        self.assertEqual(len(self.bt.orders['cancelled']), 1)
+
+    def test_PositionsAndCashNetted(self):
+        fill_prices = self.prices.loc[pd.Timestamp(2015, 1, 6)]
+        self.assertEqual(self.bt.position, {'googl': 15})
+        self.assertAlmostEqual(self.bt.cash, 100000 - 15 * fill_prices['googl'], places=8)
+
+
+if __name__ == '__main__':
+    unittest.main()
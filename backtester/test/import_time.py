@@ -0,0 +1,32 @@
+import unittest
+
+from benchmark.import_time import measure_import, parse_import_times, \
+        summarize_import
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_ParseImportTimes(self):
+        output = '\n'.join([
+                'import time: self [us] | cumulative | imported package',
+                'import time:       100 |        100 |     numpy.core',
+                'import time:       200 |        300 |   numpy',
+                'import time:       400 |        400 |   pymysql',
+                'import time:        50 |        750 | core.engine'])
+        import_times = parse_import_times(output)
+        self.assertEqual(list(import_times['module']),
+                ['numpy.core', 'numpy', 'pymysql', 'core.engine'])
+        self.assertEqual(list(import_times['level']), [2, 1, 1, 0])
+        summary = summarize_import(import_times)
+        self.assertAlmostEqual(summary['total'], 750e-6)
+        self.assertAlmostEqual(summary['own'], 450e-6)
+        self.assertEqual(summary['deferred_imported'], ['pymysql'])
+
+    def test_EngineDefersOptionalDependencies(self):
+        import_times = measure_import('core.engine')
+        self.assertTrue((import_times['module'] == 'core.ledger').any())
+        self.assertEqual(summarize_import(import_times)['deferred_imported'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.indicators import EMA, MACD, RSI, RollingMax, RollingMean, \
+    RollingMin, RollingStd
+from strategies.strategy import Strategy
+
+
+class RecordingStrategy(Strategy):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ema = self.register_indicator('ema', EMA(span=10))
+        self.recorded = {}
+
+    def digest(self, data, current_date, position, cash):
+        self.recorded[current_date] = self.ema.get_value()
+        return []
+
+
+class TestIndicators(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.prices = pd.DataFrame(100 * np.exp(np.cumsum(
+                random_state.normal(0, .02, (400, 4)), axis=0)), columns=list('abcd'))
+        # late listing, a gap and a delisting
+        self.prices.iloc[:50, 1] = np.nan
+        self.prices.iloc[200:205, 2] = np.nan
+        self.prices.iloc[350:, 3] = np.nan
+
+    def run_indicator(self, indicator):
+        indicator.reset(self.prices.columns)
+        return np.array([indicator.update(row) for row in self.prices.values])
+
+    def test_EMA(self):
+        np.testing.assert_array_equal(self.run_indicator(EMA(span=12)),
+                self.prices.ewm(span=12, adjust=False).mean().values)
+        np.testing.assert_array_equal(self.run_indicator(EMA(com=5, adjust=True)),
+                self.prices.ewm(com=5, adjust=True).mean().values)
+
+    def test_MACD(self):
+        macd = self.prices.ewm(span=12, adjust=False).mean() - \
+                self.prices.ewm(span=26, adjust=False).mean()
+        signal = macd.ewm(span=9, adjust=False).mean()
+        indicator = MACD(fast=12, slow=26, signal=9)
+        np.testing.assert_array_equal(self.run_indicator(indicator), (macd - signal).values)
+        np.testing.assert_array_equal(indicator.previous, (macd - signal).values[-2])
+
+    def test_RollingMeanAndStd(self):
+        for min_periods in (None, 1):
+            np.testing.assert_allclose(self.run_indicator(RollingMean(20, min_periods)),
+                    self.prices.rolling(20, min_periods=min_periods).mean().values, rtol=1e-12)
+            np.testing.assert_allclose(self.run_indicator(RollingStd(20, min_periods)),
+                    self.prices.rolling(20, min_periods=min_periods).std().values, rtol=1e-9)
+
+    def test_RollingMinAndMax(self):
+        np.testing.assert_array_equal(self.run_indicator(RollingMax(15)),
+                self.prices.rolling(15).max().values)
+        np.testing.assert_array_equal(self.run_indicator(RollingMin(15, min_periods=3)),
+                self.prices.rolling(15, min_periods=3).min().values)
+
+    def test_RSI(self):
+        change = self.prices.diff()
+        gain = change.clip(lower=0).where(change.notna())
+        loss = (-change).clip(lower=0).where(change.notna())
+        expected = 100 - 100 / (1 + gain.ewm(alpha=1 / 14, adjust=False).mean() /
+                loss.ewm(alpha=1 / 14, adjust=False).mean())
+        np.testing.assert_array_equal(self.run_indicator(RSI(14)), expected.values)
+
+    def test_EngineWarmsUpAndAdvancesIndicators(self):
+        self.prices.index = pd.bdate_range(date(2015, 1, 1), periods=len(self.prices))
+        strategy = RecordingStrategy(rebalance_freq='M')
+        bt = Engine(universe=list(self.prices.columns), start_date=date(2015, 9, 1),
+                end_date=date(2016, 3, 1), generate_report=False)
+        bt.run(strategy, {'price': self.prices})
+
+        expected = self.prices.ewm(span=10, adjust=False).mean()
+        self.assertEqual(len(strategy.recorded), 6)
+        for current_date, value in strategy.recorded.items():
+            np.testing.assert_array_equal(value.values, expected.loc[current_date].values)
+
+
+if __name__ == '__main__':
+    unittest.main()
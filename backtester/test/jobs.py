@@ -0,0 +1,153 @@
+from datetime import date
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.jobs import JobQueue, Worker, expand_jobs, load_strategy_class, make_job, \
+        resolve_universe
+from security_universe import random_four_stocks
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+from strategies.strategy import Strategy
+
+
+def load_synthetic_data(universe, start_date, end_date, strategy):
+    """
+    stand-in of the database, same prices for a ticker whatever the period
+    """
+    date_range = pd.bdate_range(date(2010, 1, 1), date(2016, 12, 31))
+    prices = {}
+    for ticker in universe:
+        random_state = np.random.RandomState(sum(map(ord, ticker)))
+        prices[ticker] = 100 * np.exp(np.cumsum(random_state.normal(0, .01, len(date_range))))
+    price = pd.DataFrame(prices, index=date_range, columns=universe)
+    return {'price': price.loc[start_date: end_date]}
+
+
+class FailingStrategy(Strategy):
+
+    def digest(self, data, current_date, position, cash):
+        raise RuntimeError('failing strategy')
+
+
+def _work(database_path, worker_id):
+    worker = Worker(JobQueue(database_path), worker_id=worker_id,
+            load_data=load_synthetic_data)
+    worker.logger.setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return worker.run()
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.folder, 'queue.db')
+        self.queue = JobQueue(self.database_path)
+        self.date_ranges = [(date(2014, 1, 2), date(2014, 12, 31)),
+                (date(2015, 1, 2), date(2015, 12, 31))]
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def make_worker(self, worker_id='worker', **kwargs):
+        calls = []
+
+        def load_data(*args):
+            calls.append(args[1:3])
+            return load_synthetic_data(*args)
+
+        worker = Worker(JobQueue(self.database_path, **kwargs), worker_id=worker_id,
+                load_data=load_data)
+        worker.logger.setLevel(logging.ERROR)
+        return worker, calls
+
+    def test_JobSpec(self):
+        spec = make_job(EqualWeightQuarterly, {'rebalance_freq': 'M'}, 'random_four_stocks',
+                date(2015, 1, 2), date(2015, 12, 31), universe_slice=(1, 3))
+        spec = json.loads(json.dumps(spec))
+        self.assertIs(load_strategy_class(spec['strategy']), EqualWeightQuarterly)
+        self.assertEqual(resolve_universe(spec['universe'], spec['universe_slice']),
+                random_four_stocks[1: 3])
+
+        specs = expand_jobs(EqualWeightQuarterly, {'rebalance_freq': ['M', 'Q']},
+                'random_four_stocks', self.date_ranges, n_slices=2)
+        self.assertEqual(len(specs), 2 * 2 * 2)
+        self.assertEqual([spec['universe_slice'] for spec in specs[:2]], [[0, 2], [2, 4]])
+
+    def test_SubmitIsIdempotent(self):
+        specs = expand_jobs(EqualWeightQuarterly, {'rebalance_freq': ['M', 'Q']},
+                'random_four_stocks', self.date_ranges)
+        job_ids = self.queue.submit(specs)
+        self.assertEqual(self.queue.submit(specs[::-1]), job_ids[::-1])
+        self.assertEqual(self.queue.status()['pending'], 4)
+
+    def test_WorkerRunsJobsWithWarmCache(self):
+        specs = expand_jobs(EqualWeightQuarterly, {'rebalance_freq': ['M', 'Q']},
+                'random_four_stocks', self.date_ranges)
+        job_ids = self.queue.submit(specs)
+        worker, calls = self.make_worker()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(worker.run(), 4)
+        # the second period widens the first load, later jobs reuse it
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.queue.status()['done'], 4)
+
+        results = self.queue.results()
+        self.assertEqual(list(results.index), job_ids)
+        self.assertEqual(list(results['rebalance_freq']), ['M', 'M', 'Q', 'Q'])
+        spec = specs[3]
+        engine = Engine(universe=random_four_stocks, start_date=date(2015, 1, 2),
+                end_date=date(2015, 12, 31))
+        engine.logger.setLevel(logging.WARNING)
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.run(EqualWeightQuarterly(**spec['params']), load_synthetic_data(
+                    random_four_stocks, date(2014, 1, 1), date(2015, 12, 31), None))
+        self.assertAlmostEqual(results.loc[job_ids[3], 'final_value'], engine.mtm.iloc[-1])
+        pd.testing.assert_series_equal(self.queue.get_mtm(job_ids[3]), engine.mtm)
+
+    def test_RetriesAndLease(self):
+        job_id, = self.queue.submit([make_job(FailingStrategy, {}, 'random_four_stocks',
+                date(2015, 1, 2), date(2015, 3, 31))], max_attempts=2)
+        worker, _ = self.make_worker()
+        self.assertEqual(worker.run(), 2)
+        jobs = self.queue.jobs()
+        self.assertEqual(jobs.loc[job_id, 'status'], 'failed')
+        self.assertEqual(jobs.loc[job_id, 'attempts'], 2)
+        self.assertIn('failing strategy', jobs.loc[job_id, 'error'])
+
+        job_id, = self.queue.submit([make_job(EqualWeightQuarterly, {}, 'random_four_stocks',
+                date(2015, 1, 2), date(2015, 3, 31))])
+        self.assertEqual(self.queue.claim('lost worker')[0], job_id)
+        self.assertIsNone(self.queue.claim('other worker'))
+        # the lease of the lost worker expired, its job is handed over
+        worker, _ = self.make_worker(lease_seconds=0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(worker.run(max_jobs=1), 1)
+        self.assertFalse(self.queue.complete(job_id, 'lost worker', {}))
+        self.assertEqual(self.queue.results().loc[job_id, 'worker'], 'worker')
+
+    def test_ParallelWorkers(self):
+        specs = expand_jobs(EqualWeightQuarterly, {'rebalance_freq': ['M', 'Q', 'Y']},
+                'random_four_stocks', self.date_ranges, n_slices=2)
+        self.queue.submit(specs)
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(2) as pool:
+            counts = pool.starmap(_work, [(self.database_path, 'a'), (self.database_path, 'b')])
+        self.assertEqual(sum(counts), len(specs))
+        self.assertEqual(self.queue.status()['done'], len(specs))
+        self.assertTrue((self.queue.jobs()['attempts'] == 1).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
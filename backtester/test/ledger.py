@@ -0,0 +1,72 @@
+from datetime import date
+import contextlib
+import io
+import logging
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.ledger import Ledger
+from strategies.simple_macd import SimpleMACD
+
+
+class TestLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = Ledger(['aapl', 'googl', 'fb'], initial_cash=1000., size=2)
+
+    def test_AddAndAddManyNetted(self):
+        self.ledger.add('aapl', 10, 5.)
+        self.ledger.add('aapl', -4, 6.)
+        # two googl fills and one fb fill booked at once
+        self.ledger.add_many(np.array([1, 2, 1]), np.array([3., 2., -1.]),
+                np.array([10., 20., 11.]))
+        self.assertEqual(self.ledger.get_position(), {'aapl': 6, 'googl': 2, 'fb': 2})
+        self.assertAlmostEqual(self.ledger.cash, 1000. - 50. + 24. - 30. - 40. + 11.)
+
+        self.ledger.add('fb', -2, 20.)
+        self.assertNotIn('fb', self.ledger.get_position())
+
+    def test_MarkToMarketIgnoresUnheldNan(self):
+        self.ledger.add('aapl', 10, 5.)
+        # fb is not listed yet
+        mtm = self.ledger.mark_to_market(date(2015, 1, 2), np.array([6., 10., np.nan]))
+        self.assertEqual(mtm, 1000. - 50. + 60.)
+        # a held ticker without a price makes the value unknown
+        mtm = self.ledger.mark_to_market(date(2015, 1, 5), np.array([np.nan, 10., 20.]))
+        self.assertTrue(np.isnan(mtm))
+
+    def test_MtmBufferGrowsPastPreallocation(self):
+        dates = pd.bdate_range(date(2015, 1, 1), periods=7)
+        for as_of_date in dates:
+            self.ledger.add('aapl', 1, 1.)
+            self.ledger.mark_to_market(as_of_date, np.array([2., 1., 1.]))
+        mtm = self.ledger.get_mtm()
+        self.assertGreaterEqual(self.ledger.mtm_values.shape[0], len(dates))
+        pd.testing.assert_index_equal(mtm.index, dates, check_names=False)
+        np.testing.assert_array_equal(mtm.values, 1000. + np.arange(1, 8))
+
+    def test_MtmSeriesBuiltOnceOverSimulatedDates(self):
+        random_state = np.random.RandomState(5)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2015, 12, 31))
+        prices = pd.DataFrame(100 * np.exp(np.cumsum(random_state.normal(0, .01,
+                (len(date_range), 2)), axis=0)), index=date_range, columns=['a', 'b'])
+        engine = Engine(universe=['a', 'b'], start_date=date(2015, 1, 2),
+                end_date=date(2015, 6, 30))
+        engine.logger.setLevel(logging.WARNING)
+        with mock.patch.object(Ledger, 'get_mtm', autospec=True,
+                side_effect=Ledger.get_mtm) as get_mtm:
+            with contextlib.redirect_stdout(io.StringIO()):
+                engine.run(SimpleMACD(), {'price': prices})
+        self.assertEqual(get_mtm.call_count, 1)
+        # the run stops before end_date
+        simulated_dates = date_range[(date_range >= '2015-01-02') & (date_range < '2015-06-30')]
+        pd.testing.assert_index_equal(engine.mtm.index, simulated_dates, check_names=False)
+        self.assertEqual(engine.ledger.mtm_count, len(simulated_dates))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data.config import FUNDAMENTAL_PUBLISH_DELAY
+from data.feed import MarketDataFeed
+
+
+class TestMarketDataFeed(unittest.TestCase):
+
+    def setUp(self):
+        date_range = pd.bdate_range(date(2012, 1, 2), date(2013, 12, 31))
+        self.prices = pd.DataFrame(index=date_range)
+        self.prices['aapl'] = np.linspace(100, 200, len(date_range))
+        self.prices['googl'] = np.linspace(300, 100, len(date_range))
+        # ipo in the middle of the price history
+        self.prices['fb'] = np.nan
+        self.prices.loc[pd.Timestamp(2012, 5, 18):, 'fb'] = 38.
+        self.window_size = 30
+        self.feed = MarketDataFeed({'price': self.prices}, window_size=self.window_size)
+
+    def expected_window(self, as_of_date):
+        as_of_date = pd.Timestamp(as_of_date)
+        window = self.prices[(self.prices.index <= as_of_date) & (self.prices.index
+                    >= as_of_date - timedelta(days=self.window_size))]
+        listed = self.prices[self.prices.index <= as_of_date].notna().any()
+        return window.loc[:, listed]
+
+    def test_WindowMatchesFilteredHistory(self):
+        for as_of_date in (date(2012, 3, 1), date(2012, 5, 18), date(2012, 5, 20),
+                date(2013, 12, 31)):
+            self.feed.seek(as_of_date)
+            window = self.feed.get_market_data()['price']
+            pd.testing.assert_frame_equal(window, self.expected_window(as_of_date))
+
+    def test_SeekBackward(self):
+        self.feed.seek(date(2013, 6, 3))
+        self.feed.seek(date(2012, 2, 1))
+        self.assertEqual(self.feed.get_price_window().index[-1], pd.Timestamp(date(2012, 2, 1)))
+        self.assertEqual(list(self.feed.get_price_window().columns), ['aapl', 'googl'])
+
+    def test_WindowIsZeroCopy(self):
+        self.feed.seek(date(2013, 1, 2))
+        window = self.feed.get_price_window()
+        self.assertTrue(np.shares_memory(window.values, self.feed.price_values))
+        # the listed tickers are contiguous before fb lists
+        self.feed.seek(date(2012, 3, 1))
+        window = self.feed.get_price_window()
+        self.assertEqual(list(window.columns), ['aapl', 'googl'])
+        self.assertTrue(np.shares_memory(window.values, self.feed.price_values))
+
+    def test_UnlistedTickerBetweenListed(self):
+        prices = self.prices[['aapl', 'fb', 'googl']]
+        feed = MarketDataFeed({'price': prices}, window_size=self.window_size)
+        feed.seek(date(2012, 3, 1))
+        pd.testing.assert_frame_equal(feed.get_price_window(),
+                self.expected_window(date(2012, 3, 1))[['aapl', 'googl']])
+
+    def test_WindowIsReadOnly(self):
+        feed = MarketDataFeed({'price': self.prices}, read_only=True)
+        feed.seek(date(2013, 1, 2))
+        with self.assertRaises(ValueError):
+            feed.get_price_window().values[0, 0] = 0
+
+    def test_RejectsNonDatetimeIndex(self):
+        prices = self.prices.copy()
+        prices.index = prices.index.date
+        with self.assertRaises(ValueError):
+            MarketDataFeed({'price': prices})
+
+    def test_TickerPrice(self):
+        self.feed.seek(date(2012, 7, 4))
+        self.assertEqual(self.feed.get_ticker_price('fb'), 38.)
+        self.assertEqual(self.feed.get_prices()['aapl'], self.prices.loc[pd.Timestamp(2012, 7, 4), 'aapl'])
+
+
+class TestFundamentalPanels(unittest.TestCase):
+
+    def setUp(self):
+        date_range = pd.bdate_range(date(2012, 1, 2), date(2013, 12, 31))
+        self.prices = pd.DataFrame(100., index=date_range, columns=['aapl', 'googl', 'fb'])
+        quarter_ends = pd.date_range(date(2011, 3, 31), date(2013, 12, 31), freq='Q')
+        index = pd.MultiIndex.from_product([quarter_ends, ['aapl', 'googl', 'msft']],
+                names=['date', 'fsym_id'])
+        self.fundamentals = pd.DataFrame({'ff_pe': np.arange(len(index), dtype=float)},
+                index=index)
+        # a missing report keeps the previous value of the ticker
+        self.fundamentals.loc[(pd.Timestamp(date(2012, 6, 30)), 'googl'), 'ff_pe'] = np.nan
+        self.feed = MarketDataFeed({'price': self.prices, 'fundamental': self.fundamentals},
+                window_size=30)
+
+    def expected_values(self, as_of_date):
+        visible_date = pd.Timestamp(as_of_date) - timedelta(days=FUNDAMENTAL_PUBLISH_DELAY)
+        visible = self.fundamentals.loc[pd.IndexSlice[:visible_date, :], 'ff_pe']
+        latest = visible.dropna().groupby(level='fsym_id').last()
+        return latest.reindex(self.prices.columns)
+
+    def test_LatestValueMatchesDelayedLongFrame(self):
+        for as_of_date in self.prices.index[::7]:
+            self.feed.seek(as_of_date)
+            np.testing.assert_array_equal(self.feed.get_fundamental_values('ff_pe'),
+                    self.expected_values(as_of_date).values)
+
+    def test_PanelWindowAlignedWithPrices(self):
+        self.feed.seek(date(2012, 8, 1))
+        data = self.feed.get_market_data()
+        window = data['fundamental_panel']['ff_pe']
+        self.assertTrue(window.index.equals(data['price'].index))
+        self.assertTrue(window.columns.equals(data['price'].columns))
+        np.testing.assert_array_equal(window.iloc[-1].values,
+                self.expected_values(date(2012, 8, 1)).values)
+        self.assertTrue(window['fb'].isnull().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from datetime import date
+import contextlib
+import io
+import logging
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.multi_engine import MultiStrategyEngine, _CombinedRequirements
+from data.feed import MarketDataFeed
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+from strategies.simple_macd import SimpleMACD
+from strategies.simple_pe import SimplePE
+
+
+class TestMultiStrategyEngine(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(7)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2015, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 4))
+        self.data = {'price': pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c', 'd'])}
+        self.start_date, self.end_date = date(2015, 1, 2), date(2015, 12, 31)
+
+    def strategies(self):
+        return {'macd': SimpleMACD(),
+                'monthly': EqualWeightQuarterly(rebalance_freq='M', data_window_size=30),
+                'quarterly': EqualWeightQuarterly(rebalance_freq='Q', data_window_size=30)}
+
+    def run_multi(self, allocations=None):
+        engine = MultiStrategyEngine(universe=list(self.data['price'].columns),
+                start_date=self.start_date, end_date=self.end_date, initial_cash=3000000.0)
+        engine.logger.setLevel(logging.WARNING)
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.run(self.strategies(), self.data, allocations=allocations)
+        return engine
+
+    def test_MatchesSeparateRuns(self):
+        multi = self.run_multi(allocations={'macd': .5, 'monthly': .25, 'quarterly': .25})
+        self.assertEqual(list(multi.mtm.columns), ['macd', 'monthly', 'quarterly', 'total'])
+        for name, strategy in self.strategies().items():
+            engine = Engine(universe=list(self.data['price'].columns),
+                    start_date=self.start_date, end_date=self.end_date,
+                    initial_cash=multi.engines[name].initial_cash)
+            engine.logger.setLevel(logging.WARNING)
+            with contextlib.redirect_stdout(io.StringIO()):
+                engine.run(strategy, self.data)
+            np.testing.assert_allclose(multi.mtm[name].values, engine.mtm.values)
+            self.assertEqual(len(multi.engines[name].blotter), len(engine.blotter))
+            self.assertAlmostEqual(multi.engines[name].sharpe, engine.sharpe)
+        np.testing.assert_allclose(multi.mtm['total'],
+                multi.mtm[['macd', 'monthly', 'quarterly']].sum(axis=1))
+        self.assertEqual(list(multi.metrics.index), list(multi.mtm.columns))
+
+    def test_SnapshotBuiltOncePerWindowSize(self):
+        with mock.patch.object(MarketDataFeed, 'get_market_data', autospec=True,
+                side_effect=MarketDataFeed.get_market_data) as get_market_data:
+            engine = self.run_multi(allocations=[.2, .2, .2])
+        dates = engine.mtm.index
+        month_ends = engine.engines['monthly'].scheduler.is_rebalance_dates(dates).sum()
+        # daily for SimpleMACD, once on month ends for both equal weight strategies
+        self.assertEqual(get_market_data.call_count, len(dates) + month_ends)
+        # the unallocated cash is part of the total
+        np.testing.assert_allclose(engine.mtm['total'].iloc[0], 3000000.0)
+        self.assertEqual(len(engine.feeds), 2)
+        # both equal weight strategies share the 30 days window feed
+        self.assertIs(engine.engines['monthly'].data_manager,
+                engine.engines['quarterly'].data_manager)
+        self.assertIs(engine.feeds[0].price_values, engine.feeds[1].price_values)
+
+    def test_Allocations(self):
+        names = ['a', 'b']
+        self.assertEqual(MultiStrategyEngine.get_allocations(names), {'a': .5, 'b': .5})
+        self.assertEqual(MultiStrategyEngine.get_allocations(names, [.7, .2]),
+                {'a': .7, 'b': .2})
+        with self.assertRaises(ValueError):
+            MultiStrategyEngine.get_allocations(names, [.7, .4])
+        with self.assertRaises(ValueError):
+            MultiStrategyEngine.get_allocations(names, {'a': 1.})
+
+    def test_CombinedRequirements(self):
+        requirements = _CombinedRequirements([SimplePE(), SimpleMACD(benchmark='SPX')])
+        self.assertEqual(requirements.required_fields(), ['ff_pe'])
+        self.assertEqual(requirements.benchmark, 'SPX')
+        with self.assertRaises(ValueError):
+            _CombinedRequirements([SimpleMACD(benchmark='SPX'), SimpleMACD(benchmark='NDX')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+from datetime import date
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.matching import OrderBook
+from core.order import Order
+from strategies.strategy import Strategy
+
+
+class LimitOrderStrategy(Strategy):
+
+    def digest(self, data, current_date, position, cash):
+        if current_date.date() == date(2015, 1, 20):
+            # the resting sell order is withdrawn
+            self.ask.cancel()
+        if current_date.date() != date(2015, 1, 5):
+            return []
+        self.ask = Order('aapl', -50, current_date, order_type='lmt', price=120.)
+        return [Order('aapl', 100, current_date, order_type='lmt', price=95.), self.ask,
+                Order('googl', 10, current_date, order_type='lmt', price=90.,
+                        expiry_date=date(2015, 1, 9))]
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook(['aapl', 'googl', 'fb'])
+        self.order_date = date(2015, 1, 2)
+
+    def order(self, ticker, quantity, price, **kwargs):
+        order = Order(ticker, quantity, self.order_date, order_type='lmt', price=price, **kwargs)
+        self.book.add(order)
+        return order
+
+    def test_CrossedOrdersFillAtPrice(self):
+        cheap_bid = self.order('aapl', 10, 98.)
+        best_bid = self.order('aapl', 20, 101.)
+        ask = self.order('googl', -5, 50.)
+        trades, filled = self.book.match(np.array([100., 49., np.nan]), date(2015, 1, 5))
+        self.assertEqual([(t.ticker, t.quantity, t.price) for t in trades],
+                [('aapl', 20, 100.)])
+        self.assertEqual(filled, [best_bid])
+        self.assertEqual(cheap_bid.status, 'pending')
+        self.assertEqual(ask.status, 'pending')
+        self.assertEqual(self.book.best_bid[0], 98.)
+
+        trades, filled = self.book.match(np.array([97., 51., 10.]), date(2015, 1, 6))
+        self.assertEqual([(t.ticker, t.quantity, t.price) for t in trades],
+                [('aapl', 10, 97.), ('googl', -5, 51.)])
+        self.assertEqual(len(self.book), 0)
+
+    def test_TimePriorityAndPartialFills(self):
+        self.book.max_fill_quantity = 15
+        first = self.order('fb', -10, 30.)
+        second = self.order('fb', -10, 30.)
+        trades, filled = self.book.match(np.array([np.nan, np.nan, 31.]), date(2015, 1, 5))
+        self.assertEqual([t.quantity for t in trades], [-10, -5])
+        self.assertEqual(filled, [first])
+        self.assertEqual(second.remaining_quantity, -5)
+        self.assertEqual(second.status, 'pending')
+        trades, filled = self.book.match(np.array([np.nan, np.nan, 30.]), date(2015, 1, 6))
+        self.assertEqual([t.quantity for t in trades], [-5])
+        self.assertEqual(second.status, 'filled')
+
+    def test_CancelAndExpiry(self):
+        cancelled = self.order('aapl', 10, 100.)
+        expiring = self.order('googl', 10, 100., expiry_date=date(2015, 1, 6))
+        cancelled.cancel()
+        self.assertEqual(self.book.expire(date(2015, 1, 6)), [])
+        self.assertEqual(self.book.expire(date(2015, 1, 7)), [expiring])
+        self.assertEqual(expiring.status, 'expired')
+        trades, filled = self.book.match(np.array([90., 90., 90.]), date(2015, 1, 7))
+        self.assertEqual(trades, [])
+        self.assertEqual(len(self.book), 0)
+        self.assertEqual(self.book.pop_cancelled(), [cancelled])
+        self.assertEqual(self.book.pop_cancelled(), [])
+
+    def test_CancelThroughBook(self):
+        best_bid = self.order('aapl', 10, 100.)
+        self.order('aapl', 10, 95.)
+        self.book.cancel(best_bid)
+        self.assertEqual(self.book.best_bid[0], 95.)
+        self.assertEqual(self.book.pop_cancelled(), [best_bid])
+        trades, _ = self.book.match(np.array([97., np.nan, np.nan]), date(2015, 1, 5))
+        self.assertEqual(trades, [])
+
+    def test_OnlyCrossedTickersAreVisited(self):
+        random_state = np.random.RandomState(0)
+        tickers = ['T%03d' % idx for idx in range(200)]
+        book = OrderBook(tickers)
+        for idx in range(20000):
+            ticker = tickers[idx % 200]
+            book.add(Order(ticker, 1, self.order_date, order_type='lmt',
+                    price=round(random_state.uniform(50, 90), 2)))
+        prices = np.full(200, 100.)
+        prices[:3] = 60.
+        trades, filled = book.match(prices, date(2015, 1, 5))
+        self.assertEqual({t.ticker for t in trades}, set(tickers[:3]))
+        self.assertTrue(all(t.price == 60. for t in trades))
+        self.assertEqual(len(book), 20000 - len(trades))
+
+    def test_LimitOrdersInEngine(self):
+        dates = pd.bdate_range(date(2014, 12, 1), date(2015, 1, 31))
+        prices = pd.DataFrame({'aapl': 100., 'googl': 100.}, index=dates)
+        prices.loc[pd.Timestamp(2015, 1, 8), 'aapl'] = 94.
+        prices.loc[pd.Timestamp(2015, 1, 12), 'googl'] = 89.
+        bt = Engine(universe=['aapl', 'googl'], start_date=date(2015, 1, 2),
+                end_date=date(2015, 1, 30), generate_report=False, max_fill_quantity=60)
+        bt.run(LimitOrderStrategy(), {'price': prices})
+
+        self.assertEqual([(t.ticker, t.quantity, t.price, t.trade_date.date()) for t in bt.trades],
+                [('aapl', 60, 94., date(2015, 1, 8))])
+        self.assertEqual(bt.position, {'aapl': 60})
+        # the expired googl bid, then the withdrawn ask never reached
+        self.assertEqual([(order.ticker, order.status) for order in bt.orders['cancelled']],
+                [('googl', 'expired'), ('aapl', 'cancelled')])
+        self.assertEqual(len(bt.order_book), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+from datetime import date
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from data.connection import ConnectionPool, connect_sqlite_price_database, \
+    create_sqlite_price_database
+from benchmark.adjustment import adjust_one_ticker_at_a_time, make_raw_prices
+from data.util import adjust_prices, load_adjusted_price, load_adjusted_prices, \
+        load_raw_prices, pivot_adjusted_prices
+
+
+def populate_price_database(database_path, tickers, start_date, end_date, seed=0):
+    random_state = np.random.RandomState(seed)
+    create_sqlite_price_database(database_path)
+    conn = connect_sqlite_price_database(database_path)
+    date_range = pd.bdate_range(start_date, end_date)
+    with conn:
+        for ticker in tickers:
+            prices = 50 * np.exp(np.cumsum(random_state.normal(0, .01, len(date_range))))
+            conn.executemany('INSERT INTO eod.fp_v2_fp_basic_prices VALUES (?, ?, ?)',
+                [(ticker, d.date().isoformat(), round(p, 2)) for d, p in zip(date_range, prices)])
+            for d in random_state.choice(date_range, 4, replace=False):
+                conn.execute('INSERT INTO eod.fp_v2_fp_basic_dividends VALUES (?, ?, ?)',
+                    (ticker, pd.Timestamp(d).date().isoformat(), round(random_state.uniform(.1, 1), 2)))
+            split_date = pd.Timestamp(random_state.choice(date_range))
+            conn.execute('INSERT INTO eod.fp_v2_fp_basic_splits VALUES (?, ?, ?)',
+                    (ticker, split_date.date().isoformat(), 2.))
+    conn.close()
+
+
+class TestPriceLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.database_path = os.path.join(self.folder, 'eod.sqlite')
+        self.tickers = ['T%02d-R' % idx for idx in range(12)]
+        self.start_date, self.end_date = date(2015, 1, 1), date(2016, 6, 30)
+        populate_price_database(self.database_path, self.tickers,
+                self.start_date, self.end_date)
+        self.pool = ConnectionPool(
+                lambda: connect_sqlite_price_database(self.database_path), size=3)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.folder)
+
+    def assert_matches_single_ticker_loader(self, adjustment_method):
+        panel = load_adjusted_prices(self.tickers + ['MISSING-R'], self.start_date,
+                self.end_date, adjustment_method=adjustment_method,
+                connection_pool=self.pool, chunk_size=5, max_workers=3)
+        self.assertEqual(list(panel.columns), self.tickers + ['MISSING-R'])
+        self.assertTrue(panel['MISSING-R'].isnull().all())
+
+        with self.pool.connection() as conn:
+            for ticker in self.tickers:
+                expected = load_adjusted_price(ticker, self.start_date, self.end_date,
+                        adjustment_method=adjustment_method, connection=conn)
+                expected.index = pd.to_datetime(expected.index)
+                np.testing.assert_array_equal(panel.loc[expected.index, ticker].values,
+                        expected[ticker].values)
+
+    def test_ForwardAdjustment(self):
+        self.assert_matches_single_ticker_loader('f')
+
+    def test_BackwardAdjustment(self):
+        self.assert_matches_single_ticker_loader('b')
+
+    def test_OwnPoolClosed(self):
+        connections = []
+
+        def connect():
+            connections.append(connect_sqlite_price_database(self.database_path))
+            return connections[-1]
+
+        with mock.patch('data.util.connect_price_database', side_effect=connect):
+            price, _, _ = load_raw_prices(self.tickers, self.start_date, self.end_date,
+                    chunk_size=4, max_workers=2)
+        self.assertEqual(price['fsym_id'].nunique(), len(self.tickers))
+        self.assertTrue(connections)
+        for connection in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                connection.execute('SELECT 1')
+
+
+class TestVectorizedAdjustment(unittest.TestCase):
+
+    def setUp(self):
+        self.price, self.dividend, self.split = make_raw_prices(n_tickers=6, n_years=2)
+        # a ticker without events and a missing price
+        self.dividend = self.dividend[self.dividend['fsym_id'] != 'T0005-R']
+        self.split = self.split[self.split['fsym_id'] != 'T0005-R']
+        self.price.loc[10, 'price'] = np.nan
+
+    def assert_matches_per_ticker(self, price, dividend, split):
+        for adjustment_method in ('f', 'b'):
+            expected = adjust_one_ticker_at_a_time(price, dividend, split, adjustment_method)
+            result = adjust_prices(price, dividend, split, adjustment_method)
+            self.assertEqual(list(result['fsym_id']), list(expected['fsym_id']))
+            np.testing.assert_array_equal(result['date'].values, expected['date'].values)
+            np.testing.assert_array_equal(result['total_factor'].values,
+                    expected['total_factor'].values)
+            np.testing.assert_array_equal(result['adjusted_price'].values,
+                    expected['adjusted_price'].values)
+
+    def test_MatchesPerTickerAdjustment(self):
+        self.assert_matches_per_ticker(self.price, self.dividend, self.split)
+
+    def test_InterleavedRows(self):
+        price = self.price.sort_values('date', kind='mergesort').reset_index(drop=True)
+        self.assert_matches_per_ticker(price, self.dividend, self.split)
+
+    def test_SameDateEventsAggregated(self):
+        # two dividends and two splits of a ticker on the same exdate
+        dividend = pd.concat([self.dividend, self.dividend.iloc[[3]]], ignore_index=True)
+        split = pd.concat([self.split, self.split.iloc[[0]]], ignore_index=True)
+        tickers = list(self.price['fsym_id'].unique())
+        for adjustment_method in ('f', 'b'):
+            result = adjust_prices(self.price, dividend, split, adjustment_method)
+            self.assertEqual(len(result), len(self.price))
+            panel = pivot_adjusted_prices(result, tickers)
+
+            aggregated_dividend = self.dividend.copy()
+            aggregated_dividend.loc[aggregated_dividend.index[3], 'dividend'] *= 2
+            aggregated_split = self.split.copy()
+            aggregated_split.loc[aggregated_split.index[0], 'split_factor'] **= 2
+            expected = adjust_one_ticker_at_a_time(self.price, aggregated_dividend,
+                    aggregated_split, adjustment_method)
+            np.testing.assert_array_equal(result['adjusted_price'].values,
+                    expected['adjusted_price'].values)
+            self.assertEqual(panel.shape, (self.price['date'].nunique(), len(tickers)))
+
+
+if __name__ == '__main__':
+    unittest.main()
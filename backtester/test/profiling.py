@@ -0,0 +1,98 @@
+from datetime import date
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.profiling import RunStats, timed
+from core.sweep import run_parameter_sweep
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+from strategies.simple_macd import SimpleMACD
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(5)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2015, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 3))
+        self.prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c'])
+
+    def run_engine(self, **kwargs):
+        engine = Engine(universe=list(self.prices.columns), start_date=date(2015, 1, 2),
+                end_date=date(2015, 12, 31), generate_report=False, **kwargs)
+        engine.run(SimpleMACD(), {'price': self.prices})
+        return engine
+
+    def test_DisabledByDefault(self):
+        engine = self.run_engine()
+        self.assertIsNone(engine.stats)
+        self.assertIsNone(engine.data_manager.stats)
+
+    def test_PhaseCountsAndPerDay(self):
+        engine = self.run_engine(profile=True)
+        summary = engine.stats.to_dataframe()
+        days = len(engine.mtm)
+        for phase in ('seek', 'update_indicators', 'execute_trades', 'post_trade',
+                'get_market_data', 'digest', 'submit_orders'):
+            self.assertEqual(summary.loc[phase, 'calls'], days)
+        for phase in ('create_feed', 'warm_up_indicators', 'post_run'):
+            self.assertEqual(summary.loc[phase, 'calls'], 1)
+        self.assertTrue((summary['max'] <= summary['total']).all())
+        self.assertFalse(engine.stats.events)
+
+        per_day = engine.stats.per_day_dataframe()
+        self.assertEqual(per_day.shape[0], days)
+        self.assertEqual(per_day.index[0], pd.Timestamp(date(2015, 1, 2)))
+        np.testing.assert_allclose(per_day['digest'].sum(), summary.loc['digest', 'total'])
+
+    def test_ChromeTrace(self):
+        engine = self.run_engine(trace=True)
+        folder = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(folder, 'trace.json')
+            engine.stats.export_chrome_trace(file_path)
+            with open(file_path) as trace_file:
+                events = json.load(trace_file)['traceEvents']
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        self.assertEqual(len(events), engine.stats.to_dataframe()['calls'].sum())
+        self.assertEqual({event['ph'] for event in events}, {'X'})
+        self.assertTrue(all(event['dur'] >= 0 for event in events))
+
+    def test_TimedAndCombine(self):
+        stats = RunStats(per_day=False)
+        with timed(stats, 'load'):
+            pass
+        with timed(None, 'load'):
+            pass
+        stats.wrap('step', len)([1, 2])
+        other = RunStats()
+        other.add('load', 1., 3.)
+        combined = RunStats.combine([stats, other])
+        self.assertEqual(list(combined.index), ['load', 'step'])
+        self.assertEqual(combined.loc['load', 'calls'], 2)
+        self.assertEqual(combined.loc['load', 'max'], 2.)
+        self.assertEqual(stats.per_day_dataframe().shape[0], 0)
+
+    def test_SweepStats(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_parameter_sweep(EqualWeightQuarterly,
+                    {'rebalance_freq': ['M', 'Q']}, start_date=date(2015, 1, 2),
+                    end_date=date(2015, 12, 31), data={'price': self.prices},
+                    n_workers=1, profile=True)
+        combined = RunStats.combine(results['stats'])
+        # the run stops before the end date, the last month end is not digested
+        self.assertEqual(combined.loc['digest', 'calls'], 11 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+from datetime import date
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from core.order import Order
+from core.report import Report, load_results, save_results, summarize_trades
+from strategies.strategy import Strategy
+
+
+class DailyTradingStrategy(Strategy):
+
+    def digest(self, data, current_date, position, cash):
+        return [Order(ticker, 1 if current_date.day % 2 else -1, current_date)
+                for ticker in data['price'].columns]
+
+
+class TestReport(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        dates = pd.bdate_range(date(2015, 1, 1), date(2015, 12, 31))
+        prices = pd.DataFrame({'aapl': np.linspace(100, 120, len(dates)),
+                'googl': np.linspace(50, 40, len(dates))}, index=dates)
+        self.engine = Engine(universe=['aapl', 'googl'], start_date=date(2015, 2, 2),
+                end_date=date(2015, 12, 31), generate_report=True,
+                report=Report(folder=self.folder, report_format='json'))
+        self.engine.run(DailyTradingStrategy(), {'price': prices})
+        self.results = self.engine.get_results()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_LazyPlottingImports(self):
+        # pandas 0.25 imports matplotlib itself when installed, not pyplot
+        code = ('import sys, core.engine; '
+                'print("matplotlib.pyplot" in sys.modules, "fpdf" in sys.modules)')
+        output = subprocess.check_output([sys.executable, '-c', code],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(output.split(), [b'False', b'False'])
+
+    def test_SummarizeTrades(self):
+        trades = pd.DataFrame({'ticker': ['a', 'b', 'a', 'a'],
+                'quantity': [10., -5., -4., 2.], 'price': [1., 2., 3., 4.]})
+        summary = summarize_trades(trades)
+        self.assertEqual(list(summary.index), ['a', 'b'])
+        self.assertEqual(summary.loc['a', 'trades'], 3)
+        self.assertEqual(summary.loc['a', 'bought'], 12.)
+        self.assertEqual(summary.loc['a', 'sold'], 4.)
+        self.assertEqual(summary.loc['a', 'net_quantity'], 8.)
+        self.assertAlmostEqual(summary.loc['a', 'vwap'], 30. / 16.)
+        self.assertEqual(summary.loc['b', 'traded_value'], 10.)
+        self.assertEqual(len(summarize_trades(trades.iloc[:0])), 0)
+
+    def test_Summaries(self):
+        report = Report(folder=self.folder)
+        with open(self.engine.report_future.result()) as file:
+            summary = json.load(file)
+        self.assertEqual(summary['number_of_trades'], len(self.engine.trades))
+        self.assertEqual(sorted(summary['trade_summary']), ['aapl', 'googl'])
+        self.assertEqual(summary['fields']['start_date'], '2015-02-02')
+        self.assertEqual(len(summary['total_return_trend']['dates']), len(self.engine.mtm))
+
+        with open(report.generate_summary(self.results, 'html')) as file:
+            self.assertIn('<table', file.read())
+        self.assertRaises(ValueError, Report(report_format='xml').generate, self.results)
+
+    def test_BackgroundPaginatedReport(self):
+        results_path = os.path.join(self.folder, 'results.pkl')
+        save_results(self.results, results_path)
+        report = Report(folder=self.folder, max_trade_rows=20)
+        future = report.submit(load_results(results_path))
+        other = report.submit(self.results)
+        file_path = future.result()
+        self.assertNotEqual(file_path, other.result())
+        self.assertTrue(file_path.endswith('.pdf'))
+        self.assertGreater(os.path.getsize(file_path), 0)
+        # chart pictures are removed once embedded
+        self.assertEqual(len([name for name in os.listdir(self.folder)
+                if name.endswith('.png')]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+from datetime import date
+import unittest
+
+from pandas.tseries.holiday import get_calendar
+import pandas as pd
+
+from core.calendar import Calendar
+from core.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        holiday_calendar = get_calendar('USFederalHolidayCalendar')
+        self.time_index = pd.date_range(start='1/1/2013', end='12/31/2013',
+                freq=pd.offsets.CDay(calendar=holiday_calendar))
+        self.calendar = Calendar(self.time_index)
+
+    def rebalance_dates(self, scheduler):
+        return [d for d in self.time_index if scheduler.is_rebalance_date(d)]
+
+    def test_DailySchedule(self):
+        self.assertEqual(len(self.rebalance_dates(Scheduler(self.calendar))),
+                len(self.time_index))
+
+    def test_QuarterlySchedule(self):
+        expected = [pd.Timestamp(d) for d in
+                (date(2013, 3, 29), date(2013, 6, 28), date(2013, 9, 30))]
+        # the last calendar date has no next business date to compare with
+        self.assertEqual(self.rebalance_dates(Scheduler(self.calendar, 'Q')), expected)
+
+    def test_CustomSchedule(self):
+        schedule = [date(2013, 2, 1), date(2013, 7, 4), date(2013, 11, 15)]
+        expected = [pd.Timestamp(date(2013, 2, 1)), pd.Timestamp(date(2013, 11, 15))]
+        self.assertEqual(self.rebalance_dates(Scheduler(self.calendar, schedule)), expected)
+        predicate = lambda d: d.day == 15
+        self.assertTrue(all(d.day == 15 for d in
+                self.rebalance_dates(Scheduler(self.calendar, predicate))))
+
+    def test_UnknownFrequency(self):
+        self.assertRaises(ValueError, Scheduler, self.calendar, '2Q')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+from datetime import date
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data.store import convert_csv_cache, is_stored, read_frame, write_frame
+
+
+class TestColumnarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        date_range = pd.bdate_range(date(2015, 1, 1), date(2015, 12, 31), name='date')
+        self.prices = pd.DataFrame(np.random.RandomState(0).rand(len(date_range), 3),
+                index=date_range, columns=['aapl', 'googl', 'fb']).round(2)
+        self.prices.iloc[:20, 2] = np.nan
+        quarter_ends = pd.date_range(date(2014, 3, 31), date(2015, 12, 31), freq='Q')
+        index = pd.MultiIndex.from_product([quarter_ends, ['aapl', 'googl']],
+                names=['date', 'fsym_id'])
+        self.fundamentals = pd.DataFrame({'ff_pe': np.arange(len(index), dtype=float),
+                'ff_eps': np.arange(len(index), dtype=float) / 10}, index=index)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_FrameRoundTrip(self):
+        store_folder = os.path.join(self.folder, 'price')
+        write_frame(store_folder, self.prices)
+        self.assertTrue(is_stored(store_folder))
+        pd.testing.assert_frame_equal(read_frame(store_folder), self.prices,
+                check_names=False)
+        subset = read_frame(store_folder, start_date=date(2015, 3, 1),
+                end_date=date(2015, 3, 31), columns=['fb', 'aapl'])
+        pd.testing.assert_frame_equal(subset,
+                self.prices.loc['2015-03-01': '2015-03-31', ['fb', 'aapl']], check_names=False)
+        self.assertEqual(subset.index.name, 'date')
+        self.assertEqual(subset.index.freq, self.prices.index.freq)
+
+    def test_MultiIndexRoundTrip(self):
+        store_folder = os.path.join(self.folder, 'fundamental')
+        write_frame(store_folder, self.fundamentals)
+        pd.testing.assert_frame_equal(read_frame(store_folder), self.fundamentals)
+        subset = read_frame(store_folder, start_date=date(2015, 1, 1), columns=['googl'])
+        expected = self.fundamentals.loc[pd.IndexSlice['2015-01-01':, ['googl']], :]
+        np.testing.assert_array_equal(subset.values, expected.values)
+        self.assertEqual(list(subset.index.get_level_values('fsym_id').unique()), ['googl'])
+
+    def test_ConvertCsvCache(self):
+        folders = {name: os.path.join(self.folder, name) for name in
+                ('price', 'fundamental', 'benchmark')}
+        for folder in folders.values():
+            os.makedirs(folder)
+        self.prices.to_csv(os.path.join(folders['price'], 'key.csv'))
+        self.fundamentals.to_csv(os.path.join(folders['fundamental'], 'key.csv'))
+        self.prices[['aapl']].to_csv(os.path.join(folders['benchmark'], 'SPX Index.csv'))
+
+        converted = convert_csv_cache(folders)
+        self.assertEqual(len(converted), 3)
+        np.testing.assert_array_equal(read_frame(os.path.join(
+                folders['price'], 'key')).values, self.prices.values)
+        np.testing.assert_array_equal(read_frame(os.path.join(
+                folders['fundamental'], 'key')).values, self.fundamentals.values)
+        benchmark = read_frame(os.path.join(folders['benchmark'], 'SPX Index'),
+                start_date=date(2015, 6, 1))
+        np.testing.assert_array_equal(benchmark['aapl'].values,
+                self.prices.loc['2015-06-01':, 'aapl'].values)
+
+
+if __name__ == '__main__':
+    unittest.main()
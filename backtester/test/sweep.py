@@ -0,0 +1,60 @@
+from datetime import date
+import contextlib
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core import sweep
+from core.sweep import expand_grid, load_sweep_data, run_parameter_sweep, task_pool
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+from strategies.simple_macd import SimpleMACD
+
+
+class TestParameterSweep(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(3)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2016, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 4))
+        prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c', 'd'])
+        self.data = {'price': prices}
+        self.param_grid = {'rebalance_freq': ['M', 'Q', 'Y'], 'data_window_size': [30, 60]}
+
+    def sweep(self, n_workers):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run_parameter_sweep(EqualWeightQuarterly, self.param_grid,
+                    start_date=date(2015, 1, 2), end_date=date(2016, 12, 1),
+                    data=self.data, n_workers=n_workers, seed=1)
+
+    def test_ExpandGrid(self):
+        grid = expand_grid(self.param_grid)
+        self.assertEqual(len(grid), 6)
+        self.assertEqual(grid[1], {'rebalance_freq': 'M', 'data_window_size': 60})
+
+    def test_DifferentBenchmarksRejected(self):
+        # only one benchmark is loaded for the whole grid
+        with self.assertRaises(ValueError):
+            load_sweep_data(SimpleMACD, {'benchmark': ['SPX', 'NDX']}, ['a', 'b'],
+                    date(2015, 1, 2), date(2015, 12, 31))
+
+    def test_ParallelSweepMatchesSerialSweep(self):
+        serial = self.sweep(n_workers=1)
+        parallel = self.sweep(n_workers=2)
+        self.assertEqual(list(serial['rebalance_freq']), ['M', 'M', 'Q', 'Q', 'Y', 'Y'])
+        columns = ['sharpe', 'max_drawdown', 'final_value']
+        pd.testing.assert_frame_equal(serial[columns], parallel[columns])
+        self.assertTrue(serial['information_ratio'].isnull().all())
+
+    def test_SerialPoolReleasesData(self):
+        with self.assertRaises(RuntimeError):
+            with task_pool(self.data, n_workers=1):
+                self.assertIs(sweep._WORKER_DATA['price'], self.data['price'])
+                raise RuntimeError('sweep interrupted')
+        self.assertIsNone(sweep._WORKER_DATA)
+
+
+if __name__ == '__main__':
+    unittest.main()
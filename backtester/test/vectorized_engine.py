@@ -0,0 +1,63 @@
+from datetime import date
+import contextlib
+import io
+import logging
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.engine import Engine
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+from strategies.price_weight_quarterly import PriceWeightQuarterly
+
+
+class TestVectorizedEngine(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(7)
+        date_range = pd.bdate_range(date(2014, 1, 1), date(2016, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 5))
+        self.prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c', 'd', 'e']).round(2)
+        # listed in the middle of the backtest
+        self.prices.iloc[:350, 4] = np.nan
+        self.start_date = date(2015, 1, 2)
+        self.end_date = date(2016, 12, 1)
+
+    def run_engine(self, strategy, vectorized):
+        engine = Engine(universe=list(self.prices.columns), start_date=self.start_date,
+                end_date=self.end_date, initial_cash=100000, generate_report=False)
+        engine.logger.setLevel(logging.WARNING)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if vectorized:
+                engine.run_vectorized(strategy, {'price': self.prices})
+            else:
+                engine.run(strategy, {'price': self.prices})
+        return engine
+
+    def assert_same_results(self, strategy_class):
+        looped = self.run_engine(strategy_class(), vectorized=False)
+        vectorized = self.run_engine(strategy_class(), vectorized=True)
+
+        np.testing.assert_allclose(vectorized.mtm.values, looped.mtm.values, atol=1e-3)
+        self.assertTrue(vectorized.mtm.index.equals(looped.mtm.index))
+        self.assertEqual(len(vectorized.trades), len(looped.trades))
+        for expected, trade in zip(looped.trades, vectorized.trades):
+            self.assertEqual(trade.ticker, expected.ticker)
+            self.assertEqual(pd.Timestamp(trade.trade_date), pd.Timestamp(expected.trade_date))
+            self.assertAlmostEqual(trade.price, expected.price)
+            self.assertAlmostEqual(trade.quantity, expected.quantity, places=6)
+        self.assertAlmostEqual(vectorized.sharpe, looped.sharpe, places=6)
+        self.assertAlmostEqual(vectorized.max_drawdown, looped.max_drawdown, places=6)
+        self.assertAlmostEqual(vectorized.cash, looped.cash, places=4)
+
+    def test_EqualWeightQuarterly(self):
+        self.assert_same_results(EqualWeightQuarterly)
+
+    def test_PriceWeightQuarterly(self):
+        self.assert_same_results(PriceWeightQuarterly)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from datetime import date
+import contextlib
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.sweep import make_task
+from core.walk_forward import run_walk_forward, stitch_equity_curves, walk_forward_windows
+from strategies.equal_weight_quarterly import EqualWeightQuarterly
+
+
+class TestWalkForward(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(3)
+        date_range = pd.bdate_range(date(2013, 1, 1), date(2016, 12, 31))
+        returns = random_state.normal(0, .01, (len(date_range), 4))
+        prices = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                index=date_range, columns=['a', 'b', 'c', 'd'])
+        self.data = {'price': prices}
+        self.param_grid = {'rebalance_freq': ['M', 'Q'], 'data_window_size': [30, 60]}
+
+    def walk_forward(self, n_workers):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run_walk_forward(EqualWeightQuarterly, self.param_grid,
+                    start_date=date(2014, 1, 2), end_date=date(2016, 12, 30),
+                    in_sample=250, out_of_sample=125, data=self.data,
+                    n_workers=n_workers, seed=1)
+
+    def test_Windows(self):
+        dates = pd.bdate_range(date(2015, 1, 1), periods=10)
+        windows = walk_forward_windows(dates, in_sample=4, out_of_sample=2)
+        self.assertEqual(list(windows['in_sample_start']), [dates[0], dates[2]])
+        self.assertTrue((windows['in_sample_end'] == windows['out_of_sample_start']).all())
+        self.assertEqual(windows['out_of_sample_end'].iloc[-1], dates[8])
+
+        anchored = walk_forward_windows(dates, in_sample=4, out_of_sample=2, anchored=True)
+        self.assertTrue((anchored['in_sample_start'] == dates[0]).all())
+        self.assertTrue(walk_forward_windows(dates, in_sample=8, out_of_sample=2).empty)
+
+    def test_StitchEquityCurves(self):
+        first = pd.Series([110., 121.], index=pd.bdate_range(date(2015, 1, 1), periods=2))
+        second = pd.Series([90., 99.], index=pd.bdate_range(date(2015, 1, 5), periods=2))
+        curve = stitch_equity_curves([first, second], 100.)
+        np.testing.assert_allclose(curve.values, [110., 121., 108.9, 119.79])
+
+    def test_TaskSeedIsPlainInt(self):
+        # argmax positions are numpy integers, random.seed only takes int
+        task = make_task(EqualWeightQuarterly, {}, date(2015, 1, 2), date(2015, 6, 30),
+                seed=np.int64(1) + np.argmax([0, 1]))
+        self.assertIs(type(task['seed']), int)
+
+    def test_WalkForward(self):
+        serial = self.walk_forward(n_workers=1)
+        windows, in_sample = serial['windows'], serial['in_sample']
+        self.assertEqual(len(windows), 4)
+        self.assertEqual(len(in_sample), 4 * 4)
+
+        # each window keeps the parameters with the best in sample sharpe
+        for row, window in windows.iterrows():
+            runs = in_sample[in_sample['window'] == row]
+            best = runs.loc[runs['sharpe'].idxmax()]
+            self.assertEqual(window['rebalance_freq'], best['rebalance_freq'])
+            self.assertEqual(window['in_sample_sharpe'], best['sharpe'])
+
+        # out of sample segments follow each other without overlap
+        mtm = serial['mtm']
+        self.assertTrue(mtm.index.is_unique and mtm.index.is_monotonic_increasing)
+        self.assertEqual(mtm.index[0], windows['out_of_sample_start'].iloc[0])
+        self.assertLess(mtm.index[-1], windows['out_of_sample_end'].iloc[-1])
+        total_return = np.prod(windows['out_of_sample_final_value'] / 1000000.0)
+        self.assertAlmostEqual(mtm.iloc[-1] / 1000000.0, total_return)
+        self.assertAlmostEqual(serial['metrics']['max_drawdown'],
+                (mtm / mtm.cummax() - 1).min())
+
+        parallel = self.walk_forward(n_workers=2)
+        pd.testing.assert_series_equal(serial['mtm'], parallel['mtm'])
+        pd.testing.assert_frame_equal(windows, parallel['windows'])
+
+
+if __name__ == '__main__':
+    unittest.main()